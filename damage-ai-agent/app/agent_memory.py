@@ -7,6 +7,8 @@ import json
 import time
 from pathlib import Path
 
+from app.jsonl_writer import append_jsonl, flush
+
 MEMORY_DIR = Path(r"D:\Rushikesh\project\AI Agent\damage-ai-agent\data/agent_memory")
 MEMORY_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -20,8 +22,7 @@ CORRECT_FILE = MEMORY_DIR / "corrections.jsonl"
 def _append_jsonl(path: Path, data: dict):
     data = dict(data)
     data["timestamp"] = time.time()
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(data) + "\n")
+    append_jsonl(path, data)
 
 
 # ------------------------------------------------------------
@@ -45,6 +46,7 @@ def record_correction(damage_type: str, image: str = None):
 
 def read_memory(limit=200):
     records = []
+    flush()
     for p in [CONFIRM_FILE, CORRECT_FILE]:
         if not p.exists():
             continue
@@ -62,6 +64,7 @@ def bias_penalty(damage_type: str) -> float:
     Returns a penalty factor [0.0 – 0.5] based on past mistakes.
     Used to reduce confidence for frequently misclassified classes.
     """
+    flush(CORRECT_FILE)
     if not CORRECT_FILE.exists():
         return 0.0
 
@@ -1,22 +1,153 @@
-from pathlib import Path
 import json
+import os
+import time
 from collections import Counter
 
-META = Path(r"D:\Rushikesh\project\AI Agent\damage-ai-agent\data\feedback_meta")
+from app.file_lock import file_lock
+from app.feedback_store import DATA_DIR, LATEST_SQL, get_store, on_commit
+
+# Counters maintained by a feedback store commit hook so stats() never
+# queries the store.
+# Each image counts once, with its latest label (re-labeling replaces the
+# earlier record everywhere, buckets included).
+# Windowed views count feedback records in fixed-size buckets:
+# 60 x 1-minute, 24 x 1-hour.
+# `last_id` is the newest store row counted. A batch that doesn't start
+# right after it (file missing, rows imported by the JSON migration, a
+# batch that was counted but rolled back) rebuilds from the store.
+STATS_FILE = DATA_DIR / "feedback_stats.json"
+MINUTE = 60
+HOUR = 3600
+
+
+def _empty():
+    return {"total": 0, "correct": 0, "classes": {}, "minutes": {}, "hours": {}}
+
+
+def _load():
+    try:
+        return json.loads(STATS_FILE.read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _save(agg):
+    # atomic: readers see either the old or the new file, never a partial one
+    STATS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = STATS_FILE.with_suffix(f".tmp{os.getpid()}")
+    tmp.write_text(json.dumps(agg))
+    os.replace(tmp, STATS_FILE)
+
+
+def _bump(buckets, key, correct, keep):
+    b = buckets.setdefault(str(key), {"n": 0, "c": 0})
+    b["n"] += 1
+    b["c"] += int(correct)
+    for k in [k for k in buckets if int(k) <= key - keep]:
+        del buckets[k]
+
+
+def _drop(buckets, key, correct):
+    """Undo _bump; a bucket already pruned out of the window stays gone."""
+    b = buckets.get(str(key))
+    if b is None:
+        return
+    b["n"] -= 1
+    b["c"] -= int(correct)
+    if b["n"] <= 0:
+        del buckets[str(key)]
+
+
+def _apply(agg, user_label, model_label, ts):
+    correct = user_label == model_label
+    agg["total"] += 1
+    agg["correct"] += int(correct)
+    agg["classes"][user_label] = agg["classes"].get(user_label, 0) + 1
+    _bump(agg["minutes"], int(ts // MINUTE), correct, 60)
+    _bump(agg["hours"], int(ts // HOUR), correct, 24)
+
+
+def _unapply(agg, user_label, model_label, ts):
+    correct = user_label == model_label
+    agg["total"] -= 1
+    agg["correct"] -= int(correct)
+    agg["classes"][user_label] = agg["classes"].get(user_label, 1) - 1
+    if agg["classes"][user_label] <= 0:
+        del agg["classes"][user_label]
+    _drop(agg["minutes"], int(ts // MINUTE), correct)
+    _drop(agg["hours"], int(ts // HOUR), correct)
+
+
+def _build(rows, now=None):
+    """Counters for `rows` (each image's latest store row)."""
+    agg = _empty()
+    agg["last_id"] = 0
+    now = time.time() if now is None else now
+    for r in rows:
+        _apply(agg, r["user_label"], r["model_label"], r["ts"])
+        agg["last_id"] = max(agg["last_id"], r["id"])
+    # _bump only prunes relative to the newest key seen; prune relative to now
+    for name, width, keep in (("minutes", MINUTE, 60), ("hours", HOUR, 24)):
+        cutoff = int(now // width) - keep
+        agg[name] = {k: v for k, v in agg[name].items() if int(k) > cutoff}
+    return agg
+
+
+def _on_commit(conn, events):
+    """Feedback store hook: apply a batch inside its transaction, each row
+    replacing the image's previous one. Runs under the stats lock."""
+    agg = _load()
+    first = events[0][0]["id"]
+    counted = conn.execute("SELECT MAX(id) FROM feedback WHERE id < ?", (first,)).fetchone()[0] or 0
+    if agg is None or agg.get("last_id") != counted:
+        cur = conn.execute(LATEST_SQL, (0.0,))
+        names = [d[0] for d in cur.description]
+        agg = _build(dict(zip(names, r)) for r in cur)
+    else:
+        for row, previous in events:
+            if previous:
+                _unapply(agg, previous["user_label"], previous["model_label"], previous["ts"])
+            _apply(agg, row["user_label"], row["model_label"], row["ts"])
+        agg["last_id"] = events[-1][0]["id"]
+    _save(agg)
+
+
+on_commit(_on_commit, lock=lambda: file_lock(STATS_FILE))
+
+
+def rebuild():
+    """Recompute the counters from scratch from the committed feedback rows."""
+    with file_lock(STATS_FILE):
+        # no flush: that would take the stats lock again; pending rows are
+        # applied by their own commit
+        agg = _build(get_store().label_rows(latest_only=True, flush=False))
+        _save(agg)
+    return agg
+
+
+def _window(buckets, width, span, now):
+    start = int(now // width) - span
+    n = c = 0
+    for k, b in buckets.items():
+        if int(k) > start:
+            n += b["n"]
+            c += b["c"]
+    return {"total": n, "accuracy": round(c/n, 3) if n else 0}
+
 
 def stats():
-    total, correct = 0, 0
-    classes = Counter()
+    agg = _load()
+    if agg is None:
+        agg = rebuild()
 
-    for f in META.glob("*.json"):
-        d = json.loads(f.read_text())
-        total += 1
-        classes[d["user_label"]] += 1
-        if d["user_label"] == d["model_label"]:
-            correct += 1
+    total, correct = agg["total"], agg["correct"]
+    classes = Counter(agg["classes"])
+    now = time.time()
 
     return {
         "total": total,
         "accuracy": round(correct/total, 3) if total else 0,
-        "class_distribution": dict(classes)
+        "class_distribution": dict(classes),
+        "last_hour": _window(agg["minutes"], MINUTE, 60, now),
+        "last_day": _window(agg["hours"], HOUR, 24, now),
     }
@@ -1,9 +1,10 @@
 from pathlib import Path
 
+from app.retrain_manager import note_new_samples, place_sample
+
 def auto_accept_save(image_path, yolo_boxes, classes, W, H, dataset_img, dataset_lbl):
-    dataset_img.joinpath(Path(image_path).name).write_bytes(
-        open(image_path, "rb").read()
-    )
+    if place_sample(image_path, dataset_img.joinpath(Path(image_path).name)):
+        note_new_samples()
 
     label_file = dataset_lbl / f"{Path(image_path).stem}.txt"
     with open(label_file, "w") as f:
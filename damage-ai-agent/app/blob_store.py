@@ -0,0 +1,136 @@
+# app/blob_store.py
+# ============================================================
+# CONTENT-ADDRESSED IMAGE STORE
+# Each unique image is written once to data/blobs/<ab>/<sha256>.<ext>.
+# incoming/, feedback/<label>/, errors/, dataset/ are populated with
+# hardlinks to the blob (copy only if the filesystem can't link).
+#
+# Views are always replaced via temp link + os.replace, never written
+# in place, so a hardlinked view can't modify the shared blob. New blobs
+# are copied in (never linked to the caller's file), so rewriting a
+# source file in place can't reach the store either.
+#
+# sha256_file() remembers digests by (path, mtime, size): re-placing an
+# unchanged file on every Streamlit rerun doesn't re-read it.
+# ============================================================
+
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from app.metrics import cache_hit
+
+BLOB_DIR = Path(r"D:\Rushikesh\project\AI Agent\damage-ai-agent\data\blobs")
+
+_CHUNK = 1 << 20
+DIGEST_CACHE_SIZE = 4096
+
+_digests = OrderedDict()      # (abs path, mtime_ns, size) -> sha256
+_digests_lock = threading.Lock()
+
+
+def sha256_file(path) -> str:
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    with _digests_lock:
+        digest = _digests.get(key)
+        if digest is not None:
+            _digests.move_to_end(key)
+            return digest
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _digests_lock:
+        _digests[key] = digest
+        while len(_digests) > DIGEST_CACHE_SIZE:
+            _digests.popitem(last=False)
+    return digest
+
+
+def blob_path(digest: str, suffix: str = "") -> Path:
+    return BLOB_DIR / digest[:2] / f"{digest}{suffix.lower()}"
+
+
+def _tmp_for(path: Path) -> Path:
+    return path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+
+def _copy_hashed(src, dest) -> str:
+    """Copy src -> dest, returning the sha256 of what was written."""
+    h = hashlib.sha256()
+    with open(src, "rb") as fin, open(dest, "wb") as fout:
+        for chunk in iter(lambda: fin.read(_CHUNK), b""):
+            h.update(chunk)
+            fout.write(chunk)
+    return h.hexdigest()
+
+
+def put_file(src):
+    """Store `src` (if new). Returns (digest, blob path)."""
+    src = Path(src)
+    digest = sha256_file(src)
+    blob = blob_path(digest, src.suffix)
+    exists = blob.exists()
+    cache_hit("blob", exists)
+    if not exists:
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        tmp = _tmp_for(blob)
+        if _copy_hashed(src, tmp) != digest:
+            # src changed between hashing and copying
+            os.unlink(tmp)
+            return put_file(src)
+        os.replace(tmp, blob)
+    return digest, blob
+
+
+def put_bytes(data: bytes, suffix: str = ""):
+    """Store raw bytes (if new). Returns (digest, blob path)."""
+    digest = hashlib.sha256(data).hexdigest()
+    blob = blob_path(digest, suffix)
+    exists = blob.exists()
+    cache_hit("blob", exists)
+    if not exists:
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        tmp = _tmp_for(blob)
+        tmp.write_bytes(data)
+        os.replace(tmp, blob)
+    return digest, blob
+
+
+def link(blob, dest):
+    """Make `dest` a view of `blob` (hardlink, falling back to a copy)."""
+    blob, dest = Path(blob), Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        if dest.exists() and os.path.samefile(blob, dest):
+            return dest
+    except OSError:
+        pass
+    tmp = _tmp_for(dest)
+    try:
+        os.link(blob, tmp)
+    except OSError:
+        # different volume / no hardlink support
+        shutil.copyfile(blob, tmp)
+    os.replace(tmp, dest)
+    return dest
+
+
+def place_file(src, dest) -> str:
+    """Replacement for shutil.copy(src, dest): one blob write per unique image."""
+    digest, blob = put_file(src)
+    link(blob, dest)
+    return digest
+
+
+def place_bytes(data: bytes, dest) -> str:
+    """Write `data` to `dest` through the blob store. Returns the digest."""
+    dest = Path(dest)
+    digest, blob = put_bytes(data, dest.suffix)
+    link(blob, dest)
+    return digest
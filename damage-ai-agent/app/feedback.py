@@ -1,21 +1,22 @@
 from pathlib import Path
-import json, shutil
 from PIL import Image
 from datetime import datetime
 
+import app.analytics  # noqa: F401  (registers the stats commit hook)
+from app.feedback_store import get_store
+from app.blob_store import place_file
+
 CLASS_MAP = {"dent": 0, "hole": 1, "rust": 2}
 
 FB = Path(r"D:\Rushikesh\project\AI Agent\damage-ai-agent\data\feedback")
-META = Path(r"D:\Rushikesh\project\AI Agent\damage-ai-agent\data\feedback_meta")
 YOLO = Path(r"D:\Rushikesh\project\AI Agent\damage-ai-agent\data\yolo_labels")
 ERR = Path(r"D:\Rushikesh\project\AI Agent\damage-ai-agent\data\errors")
 
 def save_class_feedback(image_path, user_label, model_label, confidence):
     (FB / user_label).mkdir(parents=True, exist_ok=True)
-    META.mkdir(exist_ok=True)
 
     name = Path(image_path).name
-    shutil.copy(image_path, FB / user_label / name)
+    place_file(image_path, FB / user_label / name)
 
     meta = {
         "image": name,
@@ -24,8 +25,9 @@ def save_class_feedback(image_path, user_label, model_label, confidence):
         "confidence": confidence,
         "time": datetime.utcnow().isoformat()
     }
-    with open(META / f"{name}.json", "w") as f:
-        json.dump(meta, f, indent=2)
+    # one row per feedback event in data/feedback.db (batched, WAL); the
+    # analytics counters are updated in the same transaction
+    get_store().add(meta)
 
 def save_yolo_boxes(image_path, boxes, label):
     if label not in CLASS_MAP:
@@ -47,4 +49,4 @@ def log_error(image_path, model_label, user_label):
     if model_label == user_label:
         return
     (ERR / "mismatch").mkdir(parents=True, exist_ok=True)
-    shutil.copy(image_path, ERR / "mismatch" / Path(image_path).name)
+    place_file(image_path, ERR / "mismatch" / Path(image_path).name)
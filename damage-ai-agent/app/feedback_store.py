@@ -0,0 +1,331 @@
+# app/feedback_store.py
+# ============================================================
+# FEEDBACK STORE (SQLite, WAL)
+# Replaces the per-image JSON files in data/feedback_meta.
+# Every feedback event is one row; writes are buffered and
+# committed in batches. Indexed on image, user_label,
+# model_label and time.
+#
+# on_commit(callback, lock) hooks run inside each batch's transaction,
+# after its inserts, with every row paired with the image's previous
+# row. Derived data (analytics counters) stays in step with the table
+# without a query per save.
+#
+# The review queue's claims live here too (table `review`): one row per
+# image, leased to one annotator session at a time and marked done when
+# reviewed, so sessions never get the same image and finished images stay
+# finished across restarts.
+#
+# One-shot import of the old JSON files:
+#     python -m app.feedback_store --migrate
+# (also runs automatically the first time the store is opened)
+# ============================================================
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from pathlib import Path
+
+DATA_DIR = Path(r"D:\Rushikesh\project\AI Agent\damage-ai-agent\data")
+DB_PATH = DATA_DIR / "feedback.db"
+LEGACY_META = DATA_DIR / "feedback_meta"
+
+BATCH_SIZE = 50
+FLUSH_INTERVAL = 1.0
+REVIEW_LEASE = 600.0      # seconds an idle annotator keeps its claimed image
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    image       TEXT NOT NULL,
+    user_label  TEXT NOT NULL,
+    model_label TEXT,
+    confidence  REAL,
+    time        TEXT,
+    ts          REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_feedback_image ON feedback(image);
+CREATE INDEX IF NOT EXISTS idx_feedback_user_label ON feedback(user_label);
+CREATE INDEX IF NOT EXISTS idx_feedback_model_label ON feedback(model_label);
+CREATE INDEX IF NOT EXISTS idx_feedback_ts ON feedback(ts);
+CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS review (
+    image       TEXT PRIMARY KEY,
+    owner       TEXT NOT NULL,
+    claimed_at  REAL NOT NULL,
+    done_at     REAL
+);
+CREATE INDEX IF NOT EXISTS idx_review_owner ON review(owner);
+"""
+
+COLUMNS = ("image", "user_label", "model_label", "confidence", "time", "ts")
+INSERT_SQL = f"INSERT INTO feedback ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+PREVIOUS_SQL = "SELECT * FROM feedback WHERE image = ? ORDER BY id DESC LIMIT 1"
+LATEST_SQL = ("SELECT f.id, f.user_label, f.model_label, f.ts FROM feedback f "
+              "JOIN (SELECT MAX(id) AS id FROM feedback GROUP BY image) l ON f.id = l.id "
+              "WHERE f.ts >= ?")
+
+_HOOKS = []     # [(callback(conn, events), lock factory or None)]
+
+
+def on_commit(callback, lock=None):
+    """Run callback(conn, [(row, previous row or None)]) inside every flush
+    transaction. `lock()` returns a context manager held around it."""
+    _HOOKS.append((callback, lock))
+
+
+def _iso_to_ts(iso):
+    try:
+        return datetime.fromisoformat(iso).replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class FeedbackStore:
+    def __init__(self, path=DB_PATH, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = Path(path)
+        self.batch_size = batch_size
+
+        self._conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._db_lock = threading.Lock()
+
+        self._pending = []
+        self._cv = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, args=(flush_interval,), name="feedback-store", daemon=True)
+        self._thread.start()
+
+    # --------------------------------------------------------
+    # Writes
+    # --------------------------------------------------------
+    def add(self, meta: dict):
+        """Queue one feedback record (same keys as the old meta JSON)."""
+        row = dict(meta)
+        row.setdefault("ts", _iso_to_ts(row.get("time")) or time.time())
+        with self._cv:
+            self._pending.append(tuple(row.get(c) for c in COLUMNS))
+            if len(self._pending) >= self.batch_size:
+                self._cv.notify()
+
+    def flush(self):
+        with self._cv:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return
+        try:
+            with ExitStack() as stack:
+                for _, lock in _HOOKS:
+                    if lock is not None:
+                        stack.enter_context(lock())
+                with self._db_lock:
+                    self._conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        events = []
+                        for row in rows:
+                            previous = self._previous(row[0])
+                            cur = self._conn.execute(INSERT_SQL, row)
+                            events.append((dict(zip(COLUMNS, row), id=cur.lastrowid), previous))
+                        for callback, _ in _HOOKS:
+                            callback(self._conn, events)
+                        self._conn.commit()
+                    except Exception:
+                        self._conn.rollback()
+                        raise
+        except Exception:
+            # keep the batch for the next flush
+            with self._cv:
+                self._pending = rows + self._pending
+            raise
+
+    def _previous(self, image):
+        cur = self._conn.execute(PREVIOUS_SQL, (image,))
+        row = cur.fetchone()
+        return dict(zip([d[0] for d in cur.description], row)) if row else None
+
+    def close(self):
+        with self._cv:
+            self._closed = True
+            self._cv.notify()
+        self._thread.join(timeout=5)
+        self.flush()
+        self._conn.close()
+
+    def _run(self, interval):
+        while True:
+            with self._cv:
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._cv.wait(interval)
+                closed = self._closed
+            try:
+                self.flush()
+            except Exception as e:
+                print("feedback_store flush error:", e)
+            if closed:
+                return
+
+    # --------------------------------------------------------
+    # Queries (all flush pending rows first)
+    # --------------------------------------------------------
+    def _query(self, sql, args=(), flush=True):
+        if flush:
+            self.flush()
+        with self._db_lock:
+            cur = self._conn.execute(sql, args)
+            names = [d[0] for d in cur.description]
+            return [dict(zip(names, r)) for r in cur.fetchall()]
+
+    def for_image(self, image):
+        return self._query("SELECT * FROM feedback WHERE image = ? ORDER BY ts", (image,))
+
+    def latest_for_image(self, image):
+        rows = self._query(PREVIOUS_SQL, (image,))
+        return rows[0] if rows else None
+
+    def images_with_label(self, user_label):
+        rows = self._query("SELECT DISTINCT image FROM feedback WHERE user_label = ?", (user_label,))
+        return [r["image"] for r in rows]
+
+    def mismatches(self, since_ts=0.0):
+        return self._query(
+            "SELECT * FROM feedback WHERE ts >= ? AND user_label != model_label ORDER BY ts", (since_ts,)
+        )
+
+    def label_rows(self, since_ts=0.0, latest_only=False, flush=True):
+        """(id, user_label, model_label, ts) for every event since `since_ts`,
+        or with `latest_only` just each image's most recent one. `flush=False`
+        reads only what is committed."""
+        if latest_only:
+            return self._query(LATEST_SQL, (since_ts,), flush=flush)
+        return self._query("SELECT id, user_label, model_label, ts FROM feedback WHERE ts >= ?", (since_ts,),
+                           flush=flush)
+
+    # --------------------------------------------------------
+    # Review claims (written directly, not batched)
+    # --------------------------------------------------------
+    def claim_review(self, images, owner, lease_s=REVIEW_LEASE):
+        """Claim the first of `images` (in order) that isn't done or leased to
+        another owner; renews `owner`'s current claim if it is still listed.
+        Returns the claimed image or None."""
+        now = time.time()
+        listed = set(images)
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                mine = self._conn.execute(
+                    "SELECT image FROM review WHERE owner = ? AND done_at IS NULL AND claimed_at >= ? "
+                    "ORDER BY claimed_at DESC", (owner, now - lease_s)).fetchall()
+                order = [r[0] for r in mine if r[0] in listed] + list(images)
+                claimed = None
+                for image in order:
+                    cur = self._conn.execute(
+                        "INSERT INTO review (image, owner, claimed_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(image) DO UPDATE SET owner = excluded.owner, claimed_at = excluded.claimed_at "
+                        "WHERE review.done_at IS NULL AND (review.owner = excluded.owner OR review.claimed_at < ?)",
+                        (image, owner, now, now - lease_s))
+                    if cur.rowcount:
+                        claimed = image
+                        break
+                # one open claim per owner
+                self._conn.execute("DELETE FROM review WHERE owner = ? AND done_at IS NULL AND image != ?",
+                                   (owner, claimed or ""))
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return claimed
+
+    def complete_review(self, image, owner):
+        with self._db_lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO review (image, owner, claimed_at, done_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(image) DO UPDATE SET owner = excluded.owner, done_at = excluded.done_at",
+                (image, owner, time.time(), time.time()))
+
+    def reviewed_images(self):
+        with self._db_lock:
+            return {r[0] for r in self._conn.execute("SELECT image FROM review WHERE done_at IS NOT NULL")}
+
+    def claimed_by_others(self, owner, lease_s=REVIEW_LEASE):
+        with self._db_lock:
+            return {r[0] for r in self._conn.execute(
+                "SELECT image FROM review WHERE done_at IS NULL AND owner != ? AND claimed_at >= ?",
+                (owner, time.time() - lease_s))}
+
+    # --------------------------------------------------------
+    # Migration
+    # --------------------------------------------------------
+    def migrate_json_dir(self, meta_dir=LEGACY_META, force=False):
+        """Import the legacy feedback_meta/*.json files once. Returns rows imported."""
+        self.flush()
+        with self._db_lock:
+            # IMMEDIATE: a second process migrating at the same time waits, then sees the flag
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                done = self._conn.execute("SELECT value FROM store_meta WHERE key = 'json_migrated'").fetchone()
+                if done and not force:
+                    self._conn.rollback()
+                    return 0
+                rows = []
+                for f in Path(meta_dir).glob("*.json"):
+                    try:
+                        d = json.loads(f.read_text())
+                    except ValueError:
+                        continue
+                    d["ts"] = _iso_to_ts(d.get("time"))
+                    rows.append(tuple(d.get(c) for c in COLUMNS))
+                self._conn.executemany(INSERT_SQL, rows)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO store_meta (key, value) VALUES ('json_migrated', ?)",
+                    (datetime.utcnow().isoformat(),),
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return len(rows)
+
+
+# ------------------------------------------------------------
+# Process-wide store (recreated after fork)
+# ------------------------------------------------------------
+_STORE = None
+_STORE_PID = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_store() -> FeedbackStore:
+    global _STORE, _STORE_PID
+    with _STORE_LOCK:
+        if _STORE is None or _STORE_PID != os.getpid():
+            _STORE = FeedbackStore()
+            _STORE_PID = os.getpid()
+            _STORE.migrate_json_dir()
+        return _STORE
+
+
+@atexit.register
+def _close_at_exit():
+    if _STORE is not None and _STORE_PID == os.getpid():
+        _STORE.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser()
+    p.add_argument("--migrate", action="store_true", help="import data/feedback_meta/*.json")
+    p.add_argument("--force", action="store_true", help="re-import even if already migrated")
+    args = p.parse_args()
+    if args.migrate:
+        store = FeedbackStore()
+        n = store.migrate_json_dir(force=args.force)
+        store.close()
+        print(f"Imported {n} feedback records into {DB_PATH}")
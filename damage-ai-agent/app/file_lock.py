@@ -0,0 +1,62 @@
+# app/file_lock.py
+# ============================================================
+# CROSS-PROCESS FILE LOCK
+# Streamlit, agent_service and realtime_rl all share data/,
+# so writers coordinate through a sidecar "<file>.lock".
+# ============================================================
+
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _try_lock(fd) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(path, blocking=True, poll=0.01):
+    """
+    Exclusive lock on `<path>.lock`.
+    Yields True once held; with blocking=False yields False immediately
+    if another process holds it (the body must check).
+    The OS drops the lock if the holder dies.
+    """
+    lock_path = Path(str(path) + ".lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(str(lock_path), os.O_RDWR | os.O_CREAT, 0o644)
+    held = False
+    try:
+        while True:
+            held = _try_lock(fd)
+            if held or not blocking:
+                break
+            time.sleep(poll)
+        yield held
+    finally:
+        if held:
+            _unlock(fd)
+        os.close(fd)
@@ -0,0 +1,156 @@
+# app/frame_grabber.py
+# ============================================================
+# LATEST-FRAME RTSP GRABBER
+# A background thread calls cap.grab() continuously, so OpenCV's
+# internal buffer never fills with old frames. Only when a caller asks
+# for a frame is the newest grabbed one retrieve()d (converted and
+# copied out), so frames nobody looks at cost as little as possible.
+#
+# Drop-in for the cv2.VideoCapture calls we use:
+#     cap = LatestFrameGrabber(url).start()
+#     ok, frame = cap.read()      # always the freshest frame
+#     cap.release()
+# The connection stays open (and reconnects with backoff) until
+# release(), or until nobody has read for `idle_timeout` seconds, so
+# repeated captures don't pay for a new RTSP handshake.
+# ============================================================
+
+import threading
+import time
+
+import cv2
+
+BACKOFF_MIN, BACKOFF_MAX = 1.0, 30.0
+
+
+class LatestFrameGrabber:
+    def __init__(self, url, reconnect=True, idle_timeout=None):
+        self.url = url
+        self.reconnect = reconnect
+        self.idle_timeout = idle_timeout
+        self.stats = {"grabbed": 0, "retrieved": 0, "reconnects": 0}
+
+        self._cap = None
+        self._lock = threading.Lock()          # guards the capture object (and seq/ts updates)
+        self._cv = threading.Condition()
+        self._seq = 0                          # bumps on every successful grab
+        self._grab_ts = 0.0
+        self._readers = 0                      # callers waiting for the capture lock
+        self._last_read = time.monotonic()
+        self._connected = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --------------------------------------------------------
+    # Connection
+    # --------------------------------------------------------
+    def _open(self):
+        cap = cv2.VideoCapture(self.url)
+        if not cap.isOpened():
+            cap.release()
+            return False
+        try:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)   # honoured by some backends only
+        except Exception:
+            pass
+        with self._lock:
+            self._cap = cap
+        self._connected = True
+        return True
+
+    def _close(self):
+        with self._lock:
+            if self._cap is not None:
+                self._cap.release()
+            self._cap = None
+        self._connected = False
+
+    def start(self):
+        """Connect and start grabbing. Raises ConnectionError if the first open fails."""
+        if not self._open():
+            raise ConnectionError(f"Cannot open stream: {self.url}")
+        self._thread = threading.Thread(target=self._run, name="frame-grabber", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        backoff = BACKOFF_MIN
+        while not self._stop.is_set():
+            if self.idle_timeout and time.monotonic() - self._last_read > self.idle_timeout:
+                break
+            if not self._connected:
+                if not self.reconnect:
+                    break
+                self._stop.wait(backoff)
+                if self._stop.is_set() or not self._open():
+                    backoff = min(backoff * 2, BACKOFF_MAX)
+                    continue
+                self.stats["reconnects"] += 1
+                backoff = BACKOFF_MIN
+
+            if self._readers:
+                time.sleep(0.001)              # let a waiting reader retrieve first
+            with self._lock:
+                ok = self._cap.grab()
+                if ok:
+                    # seq/ts change only with the lock held, so a reader holding
+                    # it retrieves exactly the frame they describe
+                    with self._cv:
+                        self._seq += 1
+                        self._grab_ts = time.time()
+                        self._cv.notify_all()
+            if not ok:
+                self._close()
+                continue
+            self.stats["grabbed"] += 1
+        self._stop.set()
+        self._close()
+        with self._cv:
+            self._cv.notify_all()
+
+    # --------------------------------------------------------
+    # Reading
+    # --------------------------------------------------------
+    def read_latest(self, newer_than=0, timeout=5.0):
+        """(ok, frame, grab_time, seq) for the newest frame with seq > newer_than."""
+        self._last_read = time.monotonic()
+        deadline = time.monotonic() + timeout
+        with self._cv:
+            while self._seq <= newer_than and not self._stop.is_set():
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False, None, 0.0, self._seq
+                self._cv.wait(left)
+            self._readers += 1
+        try:
+            # grab() can block on a stalled stream; don't wait past the deadline
+            if not self._lock.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                return False, None, 0.0, self._seq
+        finally:
+            with self._cv:
+                self._readers -= 1
+        try:
+            with self._cv:
+                seq, ts = self._seq, self._grab_ts
+            if self._cap is None or seq <= newer_than:
+                return False, None, 0.0, seq
+            ok, frame = self._cap.retrieve()
+        finally:
+            self._lock.release()
+        if ok:
+            self.stats["retrieved"] += 1
+        return ok, frame, ts, seq
+
+    def read(self, timeout=5.0):
+        """cv2.VideoCapture.read() compatible: the freshest frame."""
+        ok, frame, _, _ = self.read_latest(newer_than=0, timeout=timeout)
+        return ok, frame
+
+    def isOpened(self):
+        return self._connected and not self._stop.is_set()
+
+    def release(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._close()
@@ -0,0 +1,142 @@
+# app/intake.py
+# ============================================================
+# EVENT-DRIVEN INTAKE FOR data/incoming
+# Files are queued once they are complete:
+#   - inotify (Linux, `pip install inotify_simple`): IN_CLOSE_WRITE or
+#     IN_MOVED_TO, i.e. the writer closed the file or renamed it in
+#     (blob_store.place_* always renames a finished temp file in)
+#   - fallback: scandir polling; a file is queued only after its size
+#     and mtime stayed the same across two polls
+# The existing backlog is scanned once at start().
+#
+# Usage:
+#     watcher = IntakeWatcher(INCOMING).start()
+#     while True:
+#         path = watcher.get()          # blocks until a file is ready
+# ============================================================
+
+import os
+import queue
+import threading
+from pathlib import Path
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:   # Windows / macOS / not installed
+    INotify = None
+
+IMG_EXTS = (".jpg", ".png")
+
+
+class IntakeWatcher:
+    def __init__(self, directory, exts=IMG_EXTS, poll_interval=1.0, use_inotify=True):
+        self.directory = Path(directory)
+        self.exts = tuple(e.lower() for e in exts)
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify and INotify is not None
+        self.mode = "inotify" if self.use_inotify else "poll"
+
+        self._q = queue.Queue()
+        self._queued = {}         # name -> stat signature when queued
+        self._pending = {}        # name -> signature seen on the last poll
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _wanted(self, name):
+        return not name.startswith(".") and name.lower().endswith(self.exts)
+
+    @staticmethod
+    def _sig(st):
+        return st.st_size, st.st_mtime_ns, st.st_ino
+
+    def _put(self, name, sig=None):
+        with self._lock:
+            if name in self._queued and self._queued[name] == sig:
+                return
+            self._queued[name] = sig
+        self._q.put(self.directory / name)
+
+    # --------------------------------------------------------
+    # Startup
+    # --------------------------------------------------------
+    def start(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        ino = None
+        if self.use_inotify:
+            # watch before scanning so nothing lands in between
+            ino = INotify()
+            ino.add_watch(str(self.directory), inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO)
+
+        with os.scandir(self.directory) as it:
+            backlog = sorted((e.name, self._sig(e.stat())) for e in it if e.is_file() and self._wanted(e.name))
+        for name, sig in backlog:
+            self._put(name, sig if not ino else None)
+
+        target = (lambda: self._watch_inotify(ino)) if ino else self._watch_poll
+        self._thread = threading.Thread(target=target, name=f"intake-{self.mode}", daemon=True)
+        self._thread.start()
+        print(f"📥 Intake: {len(backlog)} backlog files, watching {self.directory} ({self.mode})")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    # --------------------------------------------------------
+    # Watchers
+    # --------------------------------------------------------
+    def _watch_inotify(self, ino):
+        try:
+            while not self._stop.is_set():
+                for ev in ino.read(timeout=500):
+                    if ev.name and self._wanted(ev.name):
+                        self._put(ev.name)
+        finally:
+            ino.close()
+
+    def _watch_poll(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                with os.scandir(self.directory) as it:
+                    entries = {e.name: e for e in it if self._wanted(e.name)}
+            except FileNotFoundError:
+                continue
+
+            with self._lock:
+                # consumed (moved away) -> may be queued again if it reappears
+                for name in self._queued.keys() - entries.keys():
+                    del self._queued[name]
+                queued = dict(self._queued)
+            pending = {}
+            for name, e in entries.items():
+                try:
+                    sig = self._sig(e.stat())
+                except FileNotFoundError:
+                    continue
+                if queued.get(name) == sig:
+                    continue                 # same file, already queued
+                if self._pending.get(name) == sig:
+                    self._put(name, sig)     # unchanged for one poll -> complete
+                else:
+                    pending[name] = sig
+            self._pending = pending
+
+    # --------------------------------------------------------
+    # Consumer side
+    # --------------------------------------------------------
+    def get(self, timeout=None):
+        """Next ready file (Path), or None on timeout."""
+        try:
+            path = self._q.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if self.use_inotify:
+            # events are edge-triggered; the same name may arrive again later
+            with self._lock:
+                self._queued.pop(path.name, None)
+        return path
+
+    def qsize(self):
+        return self._q.qsize()
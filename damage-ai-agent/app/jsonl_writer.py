@@ -0,0 +1,211 @@
+# app/jsonl_writer.py
+# ============================================================
+# WRITE-BEHIND JSONL LOGGER (group commit)
+# Records are buffered in memory and appended in batches by a
+# background thread. Each batch is written under a cross-process
+# file lock, so lines from Streamlit / agent_service / realtime_rl
+# never interleave.
+#
+# Config (env):
+#   JSONL_FLUSH_INTERVAL  seconds between group commits (0 = write-through)
+#   JSONL_FSYNC           "commit" (fsync every group commit) | "never"
+#   JSONL_MAX_BUFFER      pending records that force an early flush
+#
+# A failed commit keeps its records buffered; the background thread
+# retries with exponential backoff (up to RETRY_MAX seconds).
+# ============================================================
+
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from app.file_lock import file_lock
+
+FLUSH_INTERVAL = float(os.environ.get("JSONL_FLUSH_INTERVAL", 0.5))
+FSYNC_POLICY = os.environ.get("JSONL_FSYNC", "never")
+MAX_BUFFER = int(os.environ.get("JSONL_MAX_BUFFER", 1000))
+RETRY_MIN, RETRY_MAX = 0.5, 30.0
+
+
+class GroupCommitWriter:
+    def __init__(self, flush_interval=FLUSH_INTERVAL, fsync=FSYNC_POLICY, max_buffer=MAX_BUFFER, hooks=None):
+        if fsync not in ("commit", "never"):
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.max_buffer = max_buffer
+
+        self._buf = {}          # path -> [(record, encoded line)]
+        self._depth = 0
+        self._cv = threading.Condition()
+        self._flush_lock = threading.RLock()
+        self._hooks = {} if hooks is None else hooks   # path -> callback([(offset, record)])
+        self._closed = False
+
+        self._stats = {
+            "flushes": 0,
+            "records_written": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+        }
+
+        self._thread = None
+        if flush_interval > 0:
+            self._thread = threading.Thread(target=self._run, name="jsonl-writer", daemon=True)
+            self._thread.start()
+
+    # --------------------------------------------------------
+    # Public API
+    # --------------------------------------------------------
+    def append(self, path, record: dict):
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        key = str(path)
+        with self._cv:
+            self._buf.setdefault(key, []).append((record, line))
+            self._depth += 1
+            if self._depth >= self.max_buffer:
+                self._cv.notify()
+        if self._thread is None:
+            self.flush(key)
+
+    def on_commit(self, path, callback):
+        """Register callback([(byte_offset, record)]) run after each commit to `path`."""
+        self._hooks[str(path)] = callback
+
+    def flush(self, path=None):
+        """Commit pending records (all paths, or only `path`). Each path is
+        committed on its own: a failing one is kept buffered without
+        holding back the others, and the first error is re-raised at the end."""
+        error = None
+        with self._flush_lock:
+            with self._cv:
+                if path is None:
+                    pending, self._buf = self._buf, {}
+                else:
+                    entries = self._buf.pop(str(path), [])
+                    pending = {str(path): entries} if entries else {}
+                self._depth -= sum(len(v) for v in pending.values())
+
+            for key, entries in pending.items():
+                t0 = time.perf_counter()
+                try:
+                    offsets = self._commit(key, entries)
+                except Exception as e:
+                    # keep the batch for the next flush
+                    with self._cv:
+                        self._buf[key] = entries + self._buf.get(key, [])
+                        self._depth += len(entries)
+                    error = error or e
+                    continue
+                ms = (time.perf_counter() - t0) * 1000.0
+
+                self._stats["flushes"] += 1
+                self._stats["records_written"] += len(entries)
+                self._stats["last_flush_ms"] = round(ms, 3)
+                self._stats["max_flush_ms"] = round(max(self._stats["max_flush_ms"], ms), 3)
+
+                hook = self._hooks.get(key)
+                if hook:
+                    try:
+                        hook(offsets)
+                    except Exception as e:
+                        error = error or e
+        if error is not None:
+            raise error
+
+    def stats(self) -> dict:
+        with self._cv:
+            depth = self._depth
+        return dict(self._stats, queue_depth=depth, flush_interval=self.flush_interval, fsync=self.fsync)
+
+    def close(self):
+        with self._cv:
+            self._closed = True
+            self._cv.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    # --------------------------------------------------------
+    # Internals
+    # --------------------------------------------------------
+    def _commit(self, path, entries):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        data = b"".join(line for _, line in entries)
+        offsets = []
+        with file_lock(path):
+            with open(path, "ab") as f:
+                f.seek(0, os.SEEK_END)
+                pos = f.tell()
+                f.write(data)
+                f.flush()
+                if self.fsync == "commit":
+                    os.fsync(f.fileno())
+        for record, line in entries:
+            offsets.append((pos, record))
+            pos += len(line)
+        return offsets
+
+    def _run(self):
+        backoff = 0.0
+        while True:
+            with self._cv:
+                if backoff:
+                    # a full buffer notifies on every append; still wait out the backoff
+                    deadline = time.monotonic() + backoff
+                    while not self._closed and deadline > time.monotonic():
+                        self._cv.wait(deadline - time.monotonic())
+                elif not self._closed and self._depth < self.max_buffer:
+                    self._cv.wait(self.flush_interval)
+                closed = self._closed
+            try:
+                self.flush()
+                backoff = 0.0
+            except Exception as e:
+                backoff = min(max(backoff * 2, RETRY_MIN), RETRY_MAX)
+                print(f"jsonl_writer flush error (retrying in {backoff:.1f}s):", e)
+            if closed:
+                return
+
+
+# ------------------------------------------------------------
+# Process-wide writer (recreated after fork)
+# ------------------------------------------------------------
+_WRITER = None
+_WRITER_PID = None
+_WRITER_LOCK = threading.Lock()
+_HOOKS = {}
+
+
+def get_writer() -> GroupCommitWriter:
+    global _WRITER, _WRITER_PID
+    with _WRITER_LOCK:
+        if _WRITER is None or _WRITER_PID != os.getpid():
+            _WRITER = GroupCommitWriter(hooks=_HOOKS)
+            _WRITER_PID = os.getpid()
+        return _WRITER
+
+
+def append_jsonl(path, record: dict):
+    get_writer().append(path, record)
+
+
+def on_commit(path, callback):
+    _HOOKS[str(path)] = callback
+
+
+def flush(path=None):
+    get_writer().flush(path)
+
+
+def stats() -> dict:
+    return get_writer().stats()
+
+
+@atexit.register
+def _flush_at_exit():
+    if _WRITER is not None and _WRITER_PID == os.getpid():
+        _WRITER.close()
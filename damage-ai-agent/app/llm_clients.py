@@ -4,6 +4,8 @@ import json
 from PIL import Image
 import io
 
+from app.metrics import llm_call
+
 # =====================================================
 # Vision LLM (Qwen-VL) → PORT 8080
 # =====================================================
@@ -31,9 +33,10 @@ def call_vl(prompt, image_path, temperature=0.2):
             "temperature": temperature
         }
 
-        r = requests.post(VL_URL, json=payload, timeout=120)
-        r.raise_for_status()
-        return r.json()["choices"][0]["message"]["content"]
+        with llm_call("vl"):
+            r = requests.post(VL_URL, json=payload, timeout=120)
+            r.raise_for_status()
+            return r.json()["choices"][0]["message"]["content"]
 
     except Exception as e:
         return json.dumps({
@@ -68,9 +71,10 @@ def call_vl(prompt, image_path, temperature=0.2):
             "temperature": temperature
         }
 
-        r = requests.post(VL_URL, json=payload, timeout=120)
-        r.raise_for_status()
-        return r.json()["choices"][0]["message"]["content"]
+        with llm_call("vl"):
+            r = requests.post(VL_URL, json=payload, timeout=120)
+            r.raise_for_status()
+            return r.json()["choices"][0]["message"]["content"]
 
     except Exception as e:
         return json.dumps({
@@ -99,9 +103,10 @@ def call_thinker(prompt, temperature=0.2):
             "temperature": temperature
         }
 
-        r = requests.post(THINK_URL, json=payload, timeout=120)
-        r.raise_for_status()
-        return r.json()["choices"][0]["message"]["content"]
+        with llm_call("thinker"):
+            r = requests.post(THINK_URL, json=payload, timeout=120)
+            r.raise_for_status()
+            return r.json()["choices"][0]["message"]["content"]
 
     except Exception as e:
         # SAFE FALLBACK
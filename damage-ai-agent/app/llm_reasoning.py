@@ -1,6 +1,8 @@
 import requests
 import json
 
+from app.metrics import llm_call
+
 LLM_URL = "http://127.0.0.1:8081/v1/chat/completions"
 
 def call_llm(prompt):
@@ -15,6 +17,7 @@ def call_llm(prompt):
         "temperature": 0.2
     }
 
-    r = requests.post(LLM_URL, json=payload, timeout=120)
-    r.raise_for_status()
-    return r.json()["choices"][0]["message"]["content"]
+    with llm_call("reasoning"):
+        r = requests.post(LLM_URL, json=payload, timeout=120)
+        r.raise_for_status()
+        return r.json()["choices"][0]["message"]["content"]
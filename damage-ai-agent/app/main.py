@@ -7,9 +7,13 @@
 import sys
 from pathlib import Path
 import base64
+import io
 import json
-import tempfile
+import mimetypes
+import threading
 import time
+import uuid
+from collections import OrderedDict
 
 import streamlit as st
 from PIL import Image
@@ -27,24 +31,47 @@ except Exception:
 ROOT = Path(__file__).resolve().parent.parent
 sys.path.append(str(ROOT))
 
+# app.* modules are importable only from here on (streamlit puts app/, not
+# the project root, on sys.path)
+if cv2 is not None:
+    from app.frame_grabber import LatestFrameGrabber
+
+# Optional whole-video analysis (its own flag: a problem there shouldn't
+# disable RTSP capture)
+try:
+    from app.video_analysis import analyze_video, damage_segments, temp_video
+    VIDEO_ANALYSIS_AVAILABLE = True
+except Exception as e:
+    print("Video analysis unavailable:", e)
+    analyze_video = damage_segments = temp_video = None
+    VIDEO_ANALYSIS_AVAILABLE = False
+
 # ------------------------------------------------------------
 # Internal imports (your existing modules)
 # ------------------------------------------------------------
-from app.model import detect_damage
+from app.model import detect_damage, active_model_version
 from app.agent import agent_decision
 from app.agent_core import autonomous_agent
 from app.auto_accept import auto_accept_save
 from app.feedback import save_class_feedback, log_error
-from app.retrain_manager import should_retrain, trigger_retrain
+from app.retrain_manager import should_retrain, trigger_retrain, note_new_samples, place_sample
+from app.blob_store import place_bytes, place_file, sha256_file
+from app.metrics import cache_hit
+from app.prefetch import PrefetchQueue, PREFETCH_DEPTH, list_pending
+from app.feedback_store import get_store
+from app.phash_index import check_duplicate, remember
 
 # RL & memory imports (robust)
 try:
-    from app.rl_memory import log_rl_step, read_all as read_rl_log
+    from app.rl_memory import log_rl_step, attach_reward, read_all as read_rl_log
 except Exception:
-    # log_rl_step is required; read_rl_log optional
+    # log_rl_step is required; read_rl_log / attach_reward optional
     from app.rl_memory import log_rl_step
     read_rl_log = None
 
+    def attach_reward(*a, **k):
+        return None
+
 try:
     from app.agent_memory import record_confirmation, record_correction
 except Exception:
@@ -66,27 +93,61 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 DATASET_IMG.mkdir(parents=True, exist_ok=True)
 DATASET_LBL.mkdir(parents=True, exist_ok=True)
 
+VIDEO_DIR = Path(r"D:\Rushikesh\project\AI Agent\damage-ai-agent\data\video_analysis")
+
 CLASSES = ["dent", "hole", "rust", "not_damaged"]
 
+# editor gets a downscaled JPEG; labels are saved in original pixels
+PREVIEW_MAX_SIDE = 1280
+PREVIEW_QUALITY = 85
+
+# images whose YOLO / agent results are kept per browser session
+INFERENCE_CACHE_SIZE = 16
+
+# open RTSP connections kept between captures; an unused one closes itself
+MAX_RTSP_GRABBERS = 4
+RTSP_IDLE_SECONDS = 120
+
 # ------------------------------------------------------------
 # Helpers: RTSP capture & video frame extraction
 # ------------------------------------------------------------
+@st.cache_resource(show_spinner=False)
+def _rtsp_grabbers():
+    """Open connections shared across reruns: url -> grabber, least recently used first."""
+    return {"lock": threading.Lock(), "open": OrderedDict()}
+
+
+def _rtsp_grabber(rtsp_url):
+    """One open, continuously drained connection per URL. Grabbers close
+    themselves after RTSP_IDLE_SECONDS without a read; the least recently
+    used one is released when more than MAX_RTSP_GRABBERS are open."""
+    pool = _rtsp_grabbers()
+    with pool["lock"]:
+        conns = pool["open"]
+        for url, g in list(conns.items()):
+            if not g.isOpened():
+                g.release()
+                del conns[url]
+        if rtsp_url in conns:
+            conns.move_to_end(rtsp_url)
+            return conns[rtsp_url]
+        grabber = LatestFrameGrabber(rtsp_url, idle_timeout=RTSP_IDLE_SECONDS).start()
+        conns[rtsp_url] = grabber
+        while len(conns) > MAX_RTSP_GRABBERS:
+            conns.popitem(last=False)[1].release()
+        return grabber
+
+
 def capture_from_rtsp(rtsp_url, timeout_seconds=6):
     """Capture a single frame from RTSP and save to UPLOAD_DIR, return Path or None."""
     if cv2 is None:
         return None
-    cap = cv2.VideoCapture(rtsp_url)
-    start = time.time()
-    frame = None
-    while time.time() - start < timeout_seconds:
-        ok, img = cap.read()
-        if not ok:
-            time.sleep(0.15)
-            continue
-        frame = img
-        break
-    cap.release()
-    if frame is None:
+    try:
+        grabber = _rtsp_grabber(rtsp_url)
+    except ConnectionError:
+        return None
+    ok, frame = grabber.read(timeout=timeout_seconds)
+    if not ok or frame is None:
         return None
     tmp_path = UPLOAD_DIR / f"rtsp_capture_{int(time.time())}.jpg"
     try:
@@ -96,19 +157,22 @@ def capture_from_rtsp(rtsp_url, timeout_seconds=6):
     Image.fromarray(img_rgb).save(tmp_path)
     return tmp_path
 
+def _video_suffix(uploaded_video_file):
+    return Path(uploaded_video_file.name).suffix or ".mp4"
+
+
 def extract_frame_from_video(uploaded_video_file, sec=1.0):
-    """Save uploaded video to temp, extract a frame at sec seconds, return Path or None."""
-    if cv2 is None:
+    """Extract a frame at sec seconds from an uploaded video, return Path or None."""
+    if cv2 is None or temp_video is None:
         return None
-    tfile = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-    tfile.write(uploaded_video_file.read())
-    tfile.flush()
-    path = tfile.name
-    cap = cv2.VideoCapture(path)
-    fps = cap.get(cv2.CAP_PROP_FPS) or 25
-    cap.set(cv2.CAP_PROP_POS_MSEC, int(sec * 1000))
-    ok, frame = cap.read()
-    cap.release()
+    # temp copy for OpenCV, removed as soon as the frame is read
+    with temp_video(uploaded_video_file.getvalue(), _video_suffix(uploaded_video_file)) as path:
+        cap = cv2.VideoCapture(str(path))
+        try:
+            cap.set(cv2.CAP_PROP_POS_MSEC, int(sec * 1000))
+            ok, frame = cap.read()
+        finally:
+            cap.release()
     if not ok or frame is None:
         return None
     try:
@@ -119,6 +183,137 @@ def extract_frame_from_video(uploaded_video_file, sec=1.0):
     Image.fromarray(frame).save(frame_path)
     return frame_path
 
+
+def analyze_uploaded_video(uploaded_video_file, stride):
+    """Whole-video timeline (see app/video_analysis.py), cached per upload + stride."""
+    key = (uploaded_video_file.name, uploaded_video_file.size, stride)
+    cached = st.session_state.get("video_report")
+    if cached and cached[0] == key:
+        return cached[1]
+    bar = st.progress(0.0, text="Analyzing video...")
+
+    def progress(done_s, duration_s):
+        if duration_s:
+            bar.progress(min(done_s / duration_s, 1.0), text=f"Analyzing video... {done_s:.0f}s / {duration_s:.0f}s")
+
+    with temp_video(uploaded_video_file.getvalue(), _video_suffix(uploaded_video_file)) as path:
+        report = analyze_video(path, stride=stride, out_dir=VIDEO_DIR / Path(uploaded_video_file.name).stem,
+                               progress=progress)
+    bar.empty()
+    report["video"] = uploaded_video_file.name
+    st.session_state["video_report"] = (key, report)
+    st.session_state.pop("video_pick", None)
+    return report
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def editor_preview(path_str, mtime_ns, file_size, max_side=PREVIEW_MAX_SIDE):
+    """(base64 JPEG, width, height, scale) of a size-capped preview.
+    mtime/size are part of the cache key so a replaced file is re-rendered."""
+    img = Image.open(path_str).convert("RGB")
+    scale = min(1.0, max_side / max(img.size))
+    if scale < 1.0:
+        img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.LANCZOS)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=PREVIEW_QUALITY)
+    return base64.b64encode(buf.getvalue()).decode(), img.width, img.height, scale
+
+# ------------------------------------------------------------
+# Helpers: inference, memoized per session
+# ------------------------------------------------------------
+def run_inference(image_path):
+    """YOLO -> autonomous agent -> compact YOLO decision for one image.
+    A near-duplicate of an earlier image (pHash index) reuses its result.
+    No st.* calls: this also runs in prefetch threads."""
+    version = active_model_version()
+    try:
+        dup = check_duplicate(image_path, version)
+    except Exception:
+        dup = {"phash": None, "duplicate_of": None, "distance": None, "result": None}
+    if dup["result"]:
+        r = dup["result"]
+        return {"yolo_preds": r["preds"], "yolo_boxes": r["boxes"], "yolo_error": None,
+                "agent_thought": r["agent_out"], "yolo_decision": agent_decision(r["preds"]), "dup": dup}
+
+    yolo_error = None
+    try:
+        yolo_preds, yolo_boxes = detect_damage(str(image_path))
+    except Exception as e:
+        yolo_error = str(e)
+        yolo_preds, yolo_boxes = {}, []
+
+    # small wrapper to safely call agent
+    try:
+        agent_thought = autonomous_agent(
+            image_path=str(image_path),
+            yolo_preds=yolo_preds,
+            yolo_boxes=yolo_boxes
+        )
+    except Exception as e:
+        # safe fallback
+        agent_thought = {
+            "action": "ASK_HUMAN",
+            "reason": f"Agent error: {str(e)}",
+            "confidence": "low",
+            "damage_type": "unknown"
+        }
+
+    # Also get a compact yolo decision for UI
+    try:
+        yolo_decision = agent_decision(yolo_preds)
+    except Exception:
+        yolo_decision = {"label": "unknown", "confidence": 0.0}
+    result = {"yolo_preds": yolo_preds, "yolo_boxes": yolo_boxes, "yolo_error": yolo_error,
+              "agent_thought": agent_thought, "yolo_decision": yolo_decision, "dup": dup}
+    if dup["phash"] and not _inference_failed(result):
+        remember(dup["phash"], image_path, version,
+                 {"preds": yolo_preds, "boxes": yolo_boxes, "model_version": version, "agent_out": agent_thought},
+                 digest=dup.get("digest"))
+    return result
+
+
+def _inference_cache():
+    return st.session_state.setdefault("inference_cache", OrderedDict())
+
+
+def cached_inference(image_path, digest=None, compute=None):
+    """run_inference() memoized by image content (sha256) + model version, so
+    reruns from button clicks / typing don't repeat YOLO and the VL call.
+    `compute` replaces run_inference on a miss (e.g. take from the prefetcher)."""
+    digest = digest or sha256_file(image_path)
+    cache = _inference_cache()
+    key = (digest, active_model_version())
+    hit = key in cache
+    cache_hit("session", hit)
+    if hit:
+        cache.move_to_end(key)
+        return cache[key]
+    result = compute() if compute else run_inference(image_path)
+    if _inference_failed(result):
+        return result          # not cached: the next rerun tries again
+    cache[key] = result
+    while len(cache) > INFERENCE_CACHE_SIZE:
+        cache.popitem(last=False)
+    return result
+
+
+def _inference_failed(result):
+    """YOLO raised, or the agent fell back to an error answer (its own, or
+    agent_core's when the VL model fails)."""
+    reason = str((result.get("agent_thought") or {}).get("reason", ""))
+    return bool(result.get("yolo_error")) or reason.startswith("Agent error") or reason == "Vision model failed"
+
+
+@st.cache_resource(show_spinner=False)
+def _prefetcher():
+    """One prefetch pool per server process; each session fills its own window."""
+    return PrefetchQueue(run_inference)
+
+
+def forget_inference(digest):
+    cache = _inference_cache()
+    for key in [k for k in cache if k[0] == digest]:
+        del cache[key]
+
 # ------------------------------------------------------------
 # Streamlit page layout & input mode controls (top)
 # ------------------------------------------------------------
@@ -127,7 +322,7 @@ st.title("🧠 Damage Labeling Studio")
 st.caption("YOLO Pre-labeling + Autonomous AI Agent + Human-in-the-loop Learning + RL")
 
 st.sidebar.header("Input & Controls")
-input_mode = st.sidebar.radio("Input source", ["Upload Image", "RTSP Camera", "Upload Video"])
+input_mode = st.sidebar.radio("Input source", ["Upload Image", "RTSP Camera", "Upload Video", "Review Queue"])
 st.sidebar.markdown("---")
 
 # Simple system control buttons (placeholders / UI)
@@ -153,19 +348,20 @@ with col_d:
     st.metric("Auto-Accept Rate", "Improving")
 
 st.sidebar.markdown("---")
-st.sidebar.caption("RTSP: provide rtsp://user:pass@ip:port/stream\nVideo: extract a single frame for annotation")
+st.sidebar.caption("RTSP: provide rtsp://user:pass@ip:port/stream\n"
+                   "Video: extract a single frame, or analyze the whole video")
 
 # ------------------------------------------------------------
 # Input handling (upload / rtsp / video) — produce image_path
 # ------------------------------------------------------------
 image_path = None
+image_digest = None   # sha256 when already known (blob store), else computed on demand
 
 if input_mode == "Upload Image":
     uploaded = st.file_uploader("Upload image (jpg, png)", type=["jpg", "jpeg", "png"])
     if uploaded:
         image_path = UPLOAD_DIR / uploaded.name
-        with open(image_path, "wb") as f:
-            f.write(uploaded.read())
+        image_digest = place_bytes(uploaded.getvalue(), image_path)
 
 elif input_mode == "RTSP Camera":
     st.subheader("RTSP Camera Capture")
@@ -183,9 +379,14 @@ elif input_mode == "RTSP Camera":
                     st.error("Failed to capture frame (check RTSP URL and network)")
 
 elif input_mode == "Upload Video":
-    st.subheader("Upload Video (we'll extract a frame)")
+    st.subheader("Upload Video")
     video_file = st.file_uploader("Upload video (mp4/avi/mov)", type=["mp4", "avi", "mov"])
-    if video_file:
+    video_mode = st.radio("Mode", ["Extract single frame", "Analyze whole video"], horizontal=True)
+    if video_file and cv2 is None:
+        st.error("OpenCV is not installed; video input is unavailable")
+    elif video_file and not VIDEO_ANALYSIS_AVAILABLE:
+        st.error("Video analysis failed to load (see the server log); video input is unavailable")
+    elif video_file and video_mode == "Extract single frame":
         sec = st.number_input("Frame time (seconds)", min_value=0.0, value=1.0, step=0.5)
         if st.button("🖼 Extract Frame"):
             with st.spinner("Extracting frame..."):
@@ -195,6 +396,70 @@ elif input_mode == "Upload Video":
                     st.success(f"Frame extracted: {p.name}")
                 else:
                     st.error("Failed to extract frame")
+    elif video_file:
+        stride = st.number_input("Analyze one frame every (seconds)", min_value=0.1, value=1.0, step=0.5)
+        cached = st.session_state.get("video_report")
+        if st.button("🎞 Analyze Video") or (cached and cached[0] == (video_file.name, video_file.size, stride)):
+            try:
+                report = analyze_uploaded_video(video_file, stride)
+            except Exception as e:
+                st.error(f"Video analysis failed: {e}")
+                st.stop()
+
+            st.caption(f"{report['sampled']} frames analyzed in {report['seconds']}s "
+                       f"({report['duration']}s video) · model {report['model_version']}")
+            labels = sorted({k for p in report["timeline"] for k in p["preds"]})
+            if labels:
+                st.line_chart({lbl: [p["preds"].get(lbl, 0.0) for p in report["timeline"]] for lbl in labels}
+                              | {"t": [p["t"] for p in report["timeline"]]}, x="t")
+                st.dataframe(damage_segments(report["timeline"], gap=stride * 1.5), use_container_width=True)
+            else:
+                st.success("No damage detected in any sampled frame")
+
+            # best frame per label; picking one sends it through the normal labeling flow
+            cols = st.columns(max(1, min(len(report["best"]), 4)))
+            for i, (label, b) in enumerate(sorted(report["best"].items())):
+                with cols[i % len(cols)]:
+                    st.image(b["annotated"], caption=f"{label} {b['confidence']:.2f} @ {b['t']}s",
+                             use_container_width=True)
+                    if st.button("🖍 Label this frame", key=f"video_pick_{label}"):
+                        dest = UPLOAD_DIR / f"video_{Path(report['video']).stem}_{Path(b['path']).name}"
+                        place_file(b["path"], dest)
+                        st.session_state["video_pick"] = str(dest)
+            if st.session_state.get("video_pick"):
+                image_path = Path(st.session_state["video_pick"])
+
+elif input_mode == "Review Queue":
+    st.subheader("Review Queue")
+    depth = st.sidebar.slider("Prefetch depth", 1, 16, PREFETCH_DEPTH,
+                              help="pending images analyzed in the background ahead of you")
+    # claims + completions live in the feedback store: annotators never share
+    # an image, and reviewed images stay reviewed across restarts
+    reviewer = st.session_state.setdefault("review_owner", uuid.uuid4().hex)
+    store = get_store()
+    pending = list_pending(UPLOAD_DIR, exclude=store.reviewed_images())
+    if not pending:
+        st.success("🎉 No pending images in data/incoming")
+        st.stop()
+
+    current = store.claim_review([str(p) for p in pending], reviewer)
+    if current is None:
+        st.info("All pending images are being reviewed by other annotators")
+        st.stop()
+    # current image first, then the next `depth` in line nobody else holds
+    taken = store.claimed_by_others(reviewer)
+    upcoming = [Path(current)] + [p for p in pending if str(p) != current and str(p) not in taken]
+    prefetcher = _prefetcher()
+    prefetcher.fill(upcoming, depth=depth + 1, owner=reviewer)
+
+    q1, q2, q3 = st.columns([2, 1, 1])
+    q1.caption(f"{len(pending)} pending · {prefetcher.ready()} ready · {Path(current).name}")
+    if q2.button("⏭ Next image", use_container_width=True):
+        store.complete_review(current, reviewer)
+        st.rerun()
+    if q3.button("🔄 Refresh queue", use_container_width=True):
+        st.rerun()
+    image_path = Path(current)
 
 # If no image path yet, stop and wait
 if image_path is None:
@@ -211,46 +476,41 @@ except Exception as e:
     st.stop()
 
 W, H = image.size
-# safely read image bytes for base64
-with open(image_path, "rb") as f:
-    _img_bytes = f.read()
-img_b64 = base64.b64encode(_img_bytes).decode()
+_st = Path(image_path).stat()
+preview_b64, PW, PH, preview_scale = editor_preview(str(image_path), _st.st_mtime_ns, _st.st_size)
 
 # ------------------------------------------------------------
-# YOLO inference
+# YOLO + agent inference (memoized per image content)
 # ------------------------------------------------------------
-try:
-    yolo_preds, yolo_boxes = detect_damage(str(image_path))
-except Exception as e:
-    st.error(f"YOLO inference failed: {e}")
-    yolo_preds, yolo_boxes = {}, []
-
-# small wrapper to safely call agent
-try:
-    agent_thought = autonomous_agent(
-        image_path=str(image_path),
-        yolo_preds=yolo_preds,
-        yolo_boxes=yolo_boxes
-    )
-except Exception as e:
-    # safe fallback
-    agent_thought = {
-        "action": "ASK_HUMAN",
-        "reason": f"Agent error: {str(e)}",
-        "confidence": "low",
-        "damage_type": "unknown"
-    }
-
-# Also get a compact yolo decision for UI
-try:
-    yolo_decision = agent_decision(yolo_preds)
-except Exception:
-    yolo_decision = {"label": "unknown", "confidence": 0.0}
+if st.sidebar.button("🔄 Re-run inference"):
+    forget_inference(image_digest or sha256_file(image_path))
+if input_mode == "Review Queue":
+    inference = cached_inference(image_path, image_digest, compute=lambda: _prefetcher().take(image_path, owner=reviewer))
+else:
+    inference = cached_inference(image_path, image_digest)
+if inference.get("yolo_error"):
+    st.error(f"YOLO inference failed: {inference['yolo_error']}")
+dup = inference.get("dup") or {}
+duplicate_of = dup.get("duplicate_of")
+if duplicate_of:
+    reuse = "reusing its result" if dup.get("result") else "re-analyzed (older model)"
+    st.info(f"♻️ Near-duplicate of {Path(duplicate_of).name} ({dup['distance']} bits): {reuse}; "
+            f"kept out of the training set")
+yolo_preds, yolo_boxes = inference["yolo_preds"], inference["yolo_boxes"]
+agent_thought = inference["agent_thought"]
+yolo_decision = inference["yolo_decision"]
 
 # ------------------------------------------------------------
 # AUTO_ACCEPT (skip UI if confident)
 # ------------------------------------------------------------
 if agent_thought.get("action") == "AUTO_ACCEPT":
+    if duplicate_of:
+        st.success("🤖 AUTO_ACCEPT (near-duplicate: nothing new to save)")
+        st.stop()
+    if inference.get("auto_saved"):
+        # rerun of an image already saved this session: don't write / log it twice
+        st.success("🤖 AUTO_ACCEPT: Labels saved automatically")
+        st.stop()
     try:
         auto_accept_save(
             image_path=str(image_path),
@@ -261,6 +521,7 @@ if agent_thought.get("action") == "AUTO_ACCEPT":
             dataset_img=DATASET_IMG,
             dataset_lbl=DATASET_LBL
         )
+        inference["auto_saved"] = True
         st.success("🤖 AUTO_ACCEPT: Labels saved automatically")
         # log & feedback
         save_class_feedback(
@@ -271,8 +532,10 @@ if agent_thought.get("action") == "AUTO_ACCEPT":
         )
         log_error(str(image_path), yolo_decision.get("label", "unknown"), "auto_accepted")
         if should_retrain():
-            trigger_retrain()
-            st.info("🔁 Background retraining triggered")
+            if trigger_retrain() == "started":
+                st.info("🔁 Background retraining triggered")
+            else:
+                st.info("🔁 Retraining already running — follow-up run queued")
     except Exception as e:
         st.error(f"Auto-accept save failed: {e}")
     st.stop()
@@ -323,11 +586,20 @@ canvas {position:absolute; left:0; top:0; z-index:2;}
 let IMG_B64 = "IMG_B64_REPLACE";
 let W = IMG_W_REPLACE;
 let H = IMG_H_REPLACE;
+let SCALE = SCALE_REPLACE;   // preview px / original px
 let INIT = INIT_REPLACE;
 let CLASS_LIST = CLASSLIST_REPLACE;
 
+// INIT and the copied JSON are in original pixels; drawing is in preview pixels
+function scaleAnn(a, s){
+    let b = Object.assign({}, a);
+    if(a.bbox) b.bbox = a.bbox.map(v=>Math.round(v*s));
+    if(a.points) b.points = a.points.map(p=>({x:Math.round(p.x*s), y:Math.round(p.y*s)}));
+    return b;
+}
+
 let bg = document.getElementById("bg");
-bg.src = "data:image/png;base64," + IMG_B64;
+bg.src = "data:image/jpeg;base64," + IMG_B64;
 bg.width = W; bg.height = H;
 
 let wrap = document.getElementById("wrap");
@@ -346,7 +618,7 @@ CLASS_LIST.forEach((c,i)=>{
     clsSel.appendChild(o);
 });
 
-let annotations = INIT || [];
+let annotations = (INIT || []).map(a=>scaleAnn(a, SCALE));
 let mode="select", down=false, sx=0, sy=0, poly=[], selected=-1;
 
 function setMode(m){ mode=m; selected=-1; drawAll(); }
@@ -412,7 +684,7 @@ function undo(){ annotations.pop(); drawAll(); }
 function clearAll(){ annotations=[]; poly=[]; drawAll(); }
 
 function copyJSON(){
-    navigator.clipboard.writeText(JSON.stringify(annotations,null,2));
+    navigator.clipboard.writeText(JSON.stringify(annotations.map(a=>scaleAnn(a, 1/SCALE)),null,2));
     alert("Copied annotations JSON");
 }
 
@@ -422,9 +694,10 @@ drawAll();
 
 editor_html = (
     editor_html
-    .replace("IMG_B64_REPLACE", img_b64)
-    .replace("IMG_W_REPLACE", str(W))
-    .replace("IMG_H_REPLACE", str(H))
+    .replace("IMG_B64_REPLACE", preview_b64)
+    .replace("IMG_W_REPLACE", str(PW))
+    .replace("IMG_H_REPLACE", str(PH))
+    .replace("SCALE_REPLACE", repr(preview_scale))
     .replace("INIT_REPLACE", json.dumps(init_annotations))
     .replace("CLASSLIST_REPLACE", json.dumps(CLASSES))
 )
@@ -435,7 +708,9 @@ editor_html = (
 left, right = st.columns([3.5, 1.5])
 
 with left:
-    components.html(editor_html, height=min(H + 140, 1200))
+    components.html(editor_html, height=min(PH + 140, 1200))
+    if preview_scale < 1.0:
+        st.caption(f"Preview {PW}×{PH} of {W}×{H}; copied JSON is in original pixels")
 
 with right:
     st.subheader("📋 YOLO Decision")
@@ -450,12 +725,10 @@ with right:
     if st.button("🚨 Mark for Review"):
         st.warning("Marked for supervisor review")
 
-    if st.button("📁 Download Image"):
-        # prepare download link
-        with open(image_path, "rb") as f:
-            b = f.read()
-            href = f"data:application/octet-stream;base64,{base64.b64encode(b).decode()}"
-            st.markdown(f"[Download image]({href})")
+    # served from Streamlit's media endpoint, not inlined into the page
+    with open(image_path, "rb") as f:
+        st.download_button("📁 Download Image", data=f, file_name=Path(image_path).name,
+                           mime=mimetypes.guess_type(str(image_path))[0] or "application/octet-stream")
 
     st.divider()
 
@@ -463,15 +736,22 @@ with right:
     # NEW: RL feedback buttons (reward / penalize)
     # -----------------------
     st.subheader("🎯 Agent Feedback (RL)")
-    if st.button("❌ Wrong Detection (Penalize Agent)", use_container_width=True):
-        # negative reward (safe logging)
-        try:
+
+    def reward_agent(reward, reason):
+        """Join the human reward onto the step logged when this image was
+        processed; log a step only if there is none, so it's counted once."""
+        if attach_reward(image_path.name, reward, info={"reason": reason}) is None:
             log_rl_step(
                 state={"yolo": yolo_preds, "agent": agent_thought},
                 action=agent_thought.get("action"),
-                reward=-2.0,
-                info={"reason": "human_marked_wrong", "image": str(image_path)}
+                reward=reward,
+                info={"reason": reason, "image": image_path.name}
             )
+
+    if st.button("❌ Wrong Detection (Penalize Agent)", use_container_width=True):
+        # negative reward (safe logging)
+        try:
+            reward_agent(-2.0, "human_marked_wrong")
         except Exception as e:
             st.error(f"RL log failed: {e}")
 
@@ -501,12 +781,7 @@ with right:
     if st.button("✅ Correct Detection (Reward Agent)", use_container_width=True):
         # positive reward (safe logging)
         try:
-            log_rl_step(
-                state={"yolo": yolo_preds, "agent": agent_thought},
-                action=agent_thought.get("action"),
-                reward=+1.0,
-                info={"reason": "human_confirmed", "image": str(image_path)}
-            )
+            reward_agent(+1.0, "human_confirmed")
         except Exception as e:
             st.error(f"RL log failed: {e}")
 
@@ -521,9 +796,14 @@ with right:
 
     st.subheader("📥 Paste Annotation JSON")
     ann_json = st.text_area("Paste copied JSON here", height=260, placeholder='Click "Copy JSON" → paste here')
+    save_dup = False
+    if duplicate_of:
+        save_dup = st.checkbox(f"Save anyway (near-duplicate of {duplicate_of})")
 
     if st.button("💾 Save to Training Dataset", use_container_width=True):
-        if not ann_json.strip():
+        if duplicate_of and not save_dup:
+            st.warning("Near-duplicate images are kept out of the training set")
+        elif not ann_json.strip():
             st.warning("No annotation JSON provided")
         else:
             try:
@@ -535,7 +815,8 @@ with right:
             if anns:
                 # save image
                 try:
-                    DATASET_IMG.joinpath(image_path.name).write_bytes(open(image_path, "rb").read())
+                    if place_sample(image_path, DATASET_IMG.joinpath(image_path.name)):
+                        note_new_samples()
                 except Exception as e:
                     st.error(f"Failed to save image to dataset: {e}")
 
@@ -547,7 +828,8 @@ with right:
                             if a.get("type") != "rect":
                                 continue
                             cls = int(a.get("class_id", 0))
-                            x1,y1,x2,y2 = a["bbox"]
+                            # original pixels (the editor scales back from the preview); clamp rounding
+                            x1,y1,x2,y2 = [min(max(v, 0), lim) for v, lim in zip(a["bbox"], (W, H, W, H))]
                             xc = ((x1+x2)/2)/W
                             yc = ((y1+y2)/2)/H
                             bw = (x2-x1)/W
@@ -574,8 +856,10 @@ with right:
 
                 try:
                     if should_retrain():
-                        trigger_retrain()
-                        st.info("🔁 Background retraining triggered")
+                        if trigger_retrain() == "started":
+                            st.info("🔁 Background retraining triggered")
+                        else:
+                            st.info("🔁 Retraining already running — follow-up run queued")
                 except Exception:
                     pass
 
@@ -0,0 +1,297 @@
+# app/metrics.py
+# ============================================================
+# IN-PROCESS METRICS (OpenMetrics text format)
+# Tiny Counter / Gauge / Histogram registry plus an HTTP endpoint,
+# so Prometheus (or curl) can scrape agent_service / realtime_rl.
+# The endpoint is opt-in (DAMAGE_METRICS_PORT, DAMAGE_RT_METRICS_PORT,
+# --metrics-port); a port that can't be bound only logs a warning:
+#
+#     DAMAGE_METRICS_PORT=9108 python service/agent_service.py
+#     curl http://127.0.0.1:9108/metrics
+#
+# No prometheus_client dependency; every metric is cheap enough to
+# update on the hot path (one lock + dict update).
+# ============================================================
+
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# seconds; spans a cached lookup up to a slow VL call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_REGISTRY = []
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _fmt_value(v):
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+# ------------------------------------------------------------
+# Metric types
+# ------------------------------------------------------------
+class _Metric:
+    kind = "unknown"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _REGISTRY_LOCK:
+            _REGISTRY.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _header(self):
+        return [f"# TYPE {self.name} {self.kind}", f"# HELP {self.name} {_escape(self.documentation)}"]
+
+
+class Counter(_Metric):
+    """Monotonic count; exposed as <name>_total."""
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, v in items:
+            lines.append(f"{self.name}_total{_fmt_labels(self.labelnames, key)} {_fmt_value(v)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Current value; set directly or computed at scrape time via set_function()."""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._fn = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn):
+        """fn() -> value (unlabelled gauges only); evaluated on every scrape."""
+        self._fn = fn
+
+    def render(self):
+        lines = self._header()
+        if self._fn is not None:
+            try:
+                lines.append(f"{self.name} {_fmt_value(self._fn())}")
+            except Exception:
+                pass
+            return lines
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, v in items:
+            lines.append(f"{self.name}{_fmt_labels(self.labelnames, key)} {_fmt_value(v)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            st = self._values.get(key)
+            if st is None:
+                st = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    st[0][i] += 1
+                    break
+            st[1] += value
+            st[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block (also when it raises)."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = sorted((k, ([*c], s, n)) for k, (c, s, n) in self._values.items())
+        for key, (counts, total, n) in items:
+            cum = 0
+            for b, c in zip(self.buckets, counts):
+                cum += c
+                le = 'le="%s"' % _fmt_value(b if b == math.inf else float(b))
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, (le,))} {cum}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_value(total)}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+# ------------------------------------------------------------
+# Damage pipeline metrics
+# ------------------------------------------------------------
+STAGE_SECONDS = Histogram("damage_stage_seconds", "Time spent per pipeline stage", ["stage"])
+IMAGES_PROCESSED = Counter("damage_images_processed", "Images fully processed, by action taken", ["action"])
+PROCESSING_ERRORS = Counter("damage_processing_errors", "Images that failed processing, by stage", ["stage"])
+INCOMING_BACKLOG = Gauge("damage_incoming_backlog", "Images waiting in data/incoming")
+
+FRAMES = Counter("damage_frames", "RTSP frames, by outcome", ["result"])
+
+CAMERA_FRAMES = Counter("damage_camera_frames", "Camera frames, by camera and outcome", ["camera", "result"])
+CAMERA_LATENCY = Histogram("damage_camera_latency_seconds", "Capture-to-logged latency per camera", ["camera"])
+INFERENCE_BATCH = Histogram("damage_inference_batch_size", "Frames per batched detect call", [],
+                            buckets=(1, 2, 4, 8, 16, 32, 64))
+
+LLM_REQUESTS = Counter("damage_llm_requests", "LLM HTTP requests", ["model"])
+LLM_ERRORS = Counter("damage_llm_errors", "Failed LLM requests (timeouts included)", ["model"])
+LLM_TIMEOUTS = Counter("damage_llm_timeouts", "LLM requests that timed out", ["model"])
+LLM_SECONDS = Histogram("damage_llm_request_seconds", "LLM request latency", ["model"])
+
+CACHE_REQUESTS = Counter("damage_cache_requests", "Cache lookups, by cache and hit/miss", ["cache", "result"])
+
+JSONL_QUEUE_DEPTH = Gauge("damage_jsonl_queue_depth", "Log records waiting for group commit")
+
+
+def cache_hit(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+@contextmanager
+def stage(name):
+    """Time one pipeline stage; an exception escaping it is counted against the stage."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        PROCESSING_ERRORS.inc(stage=name)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - t0, stage=name)
+
+
+@contextmanager
+def llm_call(model):
+    """Count / time one LLM request; errors and timeouts are recorded and re-raised."""
+    LLM_REQUESTS.inc(model=model)
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        LLM_ERRORS.inc(model=model)
+        # requests.Timeout / ReadTimeout / ConnectTimeout, socket timeouts
+        if isinstance(e, TimeoutError) or any(c.__name__ == "Timeout" for c in type(e).__mro__):
+            LLM_TIMEOUTS.inc(model=model)
+        raise
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - t0, model=model)
+
+
+def count_files(directory, exts=(".jpg", ".jpeg", ".png")):
+    """Cheap backlog count (one scandir, no sort)."""
+    try:
+        with os.scandir(directory) as it:
+            return sum(1 for e in it if e.name.lower().endswith(exts) and e.is_file())
+    except FileNotFoundError:
+        return 0
+
+
+def _jsonl_depth():
+    from app.jsonl_writer import stats
+    return stats()["queue_depth"]
+
+
+JSONL_QUEUE_DEPTH.set_function(_jsonl_depth)
+
+
+# ------------------------------------------------------------
+# Exposition
+# ------------------------------------------------------------
+def render() -> str:
+    with _REGISTRY_LOCK:
+        metrics = list(_REGISTRY)
+    lines = []
+    for m in metrics:
+        lines.extend(m.render())
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_SERVER = None
+
+
+def start_http_server(port, addr="127.0.0.1"):
+    """Serve /metrics from a daemon thread (once per process). Returns the
+    server, or None if the port can't be bound (the caller keeps running)."""
+    global _SERVER
+    if _SERVER is None:
+        try:
+            _SERVER = ThreadingHTTPServer((addr, port), _MetricsHandler)
+        except OSError as e:
+            print(f"⚠️  Metrics exporter disabled: can't bind {addr}:{port} ({e})")
+            return None
+        _SERVER.daemon_threads = True
+        threading.Thread(target=_SERVER.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"📈 Metrics on http://{addr}:{_SERVER.server_address[1]}/metrics")
+    return _SERVER
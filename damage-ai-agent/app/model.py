@@ -1,9 +1,75 @@
+import threading
+import time
+
+import numpy as np
 from ultralytics import YOLO
 
-model = YOLO(r"D:\Rushikesh\project\AI Agent\damage-ai-agent\models\best.pt")
+from app.model_registry import active_weights, registry_mtime
 
-def detect_damage(image_path):
-    results = model(image_path)[0]
+# How often detect_damage() stats registry.json for a newly promoted version
+RELOAD_CHECK_INTERVAL = 2.0
+
+_version, _weights = active_weights()
+model = YOLO(str(_weights))
+# (model, version) swapped as one object so a request never mixes the two
+_current = (model, _version)
+
+_state_lock = threading.Lock()
+_seen_mtime = registry_mtime()
+_last_check = time.monotonic()
+_loading = False
+_tls = threading.local()
+# one forward pass at a time per process: the ultralytics predictor keeps
+# per-call state and isn't safe to share between threads (studio prefetch)
+_infer_lock = threading.Lock()
+
+
+def _load(version, weights, mtime):
+    global model, _current, _loading, _seen_mtime
+    try:
+        new = YOLO(str(weights))
+        new(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)  # warm up off the request path
+        model = new
+        _current = (new, version)
+        # only a successful swap marks the registry as seen; a failed load
+        # is retried on the next check
+        with _state_lock:
+            _seen_mtime = mtime
+        print(f"Model hot-reloaded: {version}")
+    except Exception as e:
+        print(f"Model reload failed ({version}): {e}")
+    finally:
+        _loading = False
+
+
+def _maybe_reload():
+    global _last_check, _seen_mtime, _loading
+    now = time.monotonic()
+    if now - _last_check < RELOAD_CHECK_INTERVAL:
+        return
+    with _state_lock:
+        _last_check = now
+        mtime = registry_mtime()
+        if mtime == _seen_mtime or _loading:
+            return
+        version, weights = active_weights()
+        if version == _current[1]:
+            _seen_mtime = mtime
+            return
+        _loading = True
+    threading.Thread(target=_load, args=(version, weights, mtime), name="model-reload", daemon=True).start()
+
+
+def active_model_version():
+    return _current[1]
+
+
+def last_model_version():
+    """Version that served the last detect_damage() call on this thread."""
+    return getattr(_tls, "version", _current[1])
+
+
+def _parse(results, names):
     preds = {}
     boxes = []
 
@@ -13,7 +79,7 @@ def detect_damage(image_path):
     for b in results.boxes:
         cls = int(b.cls[0])
         conf = float(b.conf[0])
-        label = model.names[cls]
+        label = names[cls]
         x1, y1, x2, y2 = map(int, b.xyxy[0])
 
         preds[label] = max(preds.get(label, 0), conf)
@@ -24,3 +90,29 @@ def detect_damage(image_path):
         })
 
     return preds, boxes
+
+
+def detect_damage(image_path):
+    _maybe_reload()
+    m, version = _current   # in-flight calls keep the model they started with
+    _tls.version = version
+
+    with _infer_lock:
+        results = m(image_path)[0]
+    return _parse(results, m.names)
+
+
+def detect_damage_batch(images, batch_size=16):
+    """detect_damage() for a list of paths / BGR arrays in one forward pass per chunk."""
+    _maybe_reload()
+    m, version = _current
+    _tls.version = version
+
+    out = []
+    for i in range(0, len(images), batch_size):
+        chunk = list(images[i:i + batch_size])
+        with _infer_lock:
+            batch = m(chunk, verbose=False)
+        for results in batch:
+            out.append(_parse(results, m.names))
+    return out
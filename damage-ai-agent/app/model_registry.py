@@ -0,0 +1,155 @@
+# app/model_registry.py
+# ============================================================
+# VERSIONED MODEL REGISTRY
+#   models/registry/v0001/best.pt ...   immutable versions
+#   models/registry/registry.json       {"active", "previous", "versions"}
+#   models/best.pt                      copy of the active version
+#
+# promote() / rollback() swap registry.json atomically (os.replace);
+# app/model.py notices the change and hot-reloads in the background.
+#
+# Usage:
+#     python -m app.model_registry register runs/detect/train/weights/best.pt --promote
+#     python -m app.model_registry rollback
+#     python -m app.model_registry list
+# ============================================================
+
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+from app.blob_store import sha256_file
+from app.file_lock import file_lock
+
+MODEL_DIR = Path(r"D:\Rushikesh\project\AI Agent\damage-ai-agent\models")
+REGISTRY_DIR = MODEL_DIR / "registry"
+REGISTRY_FILE = REGISTRY_DIR / "registry.json"
+ACTIVE_COPY = MODEL_DIR / "best.pt"
+
+
+def _read():
+    try:
+        return json.loads(REGISTRY_FILE.read_text())
+    except (FileNotFoundError, ValueError):
+        return {"active": None, "previous": None, "versions": []}
+
+
+def _write(reg):
+    REGISTRY_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = REGISTRY_FILE.with_suffix(f".tmp{os.getpid()}")
+    tmp.write_text(json.dumps(reg, indent=2))
+    os.replace(tmp, REGISTRY_FILE)
+
+
+def _atomic_copy(src, dest):
+    tmp = Path(dest).with_name(f".{Path(dest).name}.{os.getpid()}.tmp")
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+
+
+def version_path(version: str) -> Path:
+    return REGISTRY_DIR / version / "best.pt"
+
+
+def active_version():
+    return _read()["active"]
+
+
+def active_weights():
+    """(version, path) of the weights to serve; falls back to models/best.pt."""
+    version = active_version()
+    if version and version_path(version).exists():
+        return version, version_path(version)
+    return None, ACTIVE_COPY
+
+
+def registry_mtime():
+    try:
+        return REGISTRY_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def register(weights, note=""):
+    """Copy `weights` into a new immutable version. Returns the version id."""
+    digest = sha256_file(weights)
+    with file_lock(REGISTRY_FILE):
+        reg = _read()
+        for v in reg["versions"]:
+            if v["sha256"] == digest:
+                return v["version"]
+        version = f"v{len(reg['versions']) + 1:04d}"
+        version_path(version).parent.mkdir(parents=True, exist_ok=True)
+        _atomic_copy(weights, version_path(version))
+        reg["versions"].append({
+            "version": version,
+            "sha256": digest,
+            "source": str(weights),
+            "registered": time.time(),
+            "note": note,
+        })
+        _write(reg)
+    return version
+
+
+def _promote_locked(reg, version):
+    """promote() body; the caller holds the registry lock."""
+    if not version_path(version).exists():
+        raise FileNotFoundError(version_path(version))
+    if reg["active"] == version:
+        return reg
+    reg["previous"], reg["active"] = reg["active"], version
+    for v in reg["versions"]:
+        if v["version"] == version:
+            v["promoted"] = time.time()
+    # keep models/best.pt in step for tools that read it directly
+    _atomic_copy(version_path(version), ACTIVE_COPY)
+    _write(reg)
+    return reg
+
+
+def promote(version):
+    """Make `version` active; the old active version is kept for rollback."""
+    with file_lock(REGISTRY_FILE):
+        return _promote_locked(_read(), version)
+
+
+def rollback():
+    # read `previous` and promote it in one critical section, so a concurrent
+    # promote can't slip in between
+    with file_lock(REGISTRY_FILE):
+        reg = _read()
+        if not reg["previous"]:
+            raise RuntimeError("No previous model version to roll back to")
+        return _promote_locked(reg, reg["previous"])
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser()
+    sub = p.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("register")
+    r.add_argument("weights")
+    r.add_argument("--note", default="")
+    r.add_argument("--promote", action="store_true")
+    pr = sub.add_parser("promote")
+    pr.add_argument("version")
+    sub.add_parser("rollback")
+    sub.add_parser("list")
+    args = p.parse_args()
+
+    if args.cmd == "register":
+        v = register(args.weights, note=args.note)
+        print(f"Registered {v}")
+        if args.promote:
+            promote(v)
+            print(f"Promoted {v}")
+    elif args.cmd == "promote":
+        promote(args.version)
+        print(f"Promoted {args.version}")
+    elif args.cmd == "rollback":
+        print(f"Rolled back to {rollback()['active']}")
+    else:
+        print(json.dumps(_read(), indent=2))
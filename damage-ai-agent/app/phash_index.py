@@ -0,0 +1,278 @@
+# app/phash_index.py
+# ============================================================
+# PERCEPTUAL-HASH NEAR-DUPLICATE INDEX (SQLite, WAL)
+# "IMG_x - Copy.jpg", .trashed-* leftovers and consecutive video frames
+# are the same picture to the model. Each analyzed image is stored with
+# its 64-bit DCT pHash (+ the detection / agent result); a new image
+# within MAX_DISTANCE bits of an earlier one reuses that result and is
+# kept out of the training set.
+#
+# Lookup is multi-index hashing: the hash is split into four 16-bit
+# chunks, each an indexed column. Two hashes within r bits agree to
+# within r // 4 bits on at least one chunk (pigeonhole), so a query
+# only visits rows whose chunk is one of the few values that close --
+# a handful of index seeks instead of a scan, at any archive size.
+#
+# A row is one file: full path + sha256 of its content. A lookup skips
+# only the file's own earlier entry (same path, same content), so an
+# unrelated image that happens to share a name is still matched and a
+# copy elsewhere is still a duplicate.
+#
+#     python -m app.phash_index --stats
+#     python -m app.phash_index --scan data/incoming   # report duplicate groups
+# ============================================================
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from itertools import combinations
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from app.blob_store import sha256_file
+from app.metrics import cache_hit
+
+DATA_DIR = Path(r"D:\Rushikesh\project\AI Agent\damage-ai-agent\data")
+DB_PATH = DATA_DIR / "phash_index.db"
+
+MAX_DISTANCE = int(os.environ.get("DAMAGE_PHASH_DISTANCE", 6))   # of 64 bits
+CHUNKS = 4
+CHUNK_BITS = 64 // CHUNKS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS phashes (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    image         TEXT NOT NULL,
+    digest        TEXT,
+    hash          INTEGER NOT NULL,
+    c0            INTEGER NOT NULL,
+    c1            INTEGER NOT NULL,
+    c2            INTEGER NOT NULL,
+    c3            INTEGER NOT NULL,
+    model_version TEXT,
+    result        TEXT,
+    ts            REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_phash_c0 ON phashes(c0);
+CREATE INDEX IF NOT EXISTS idx_phash_c1 ON phashes(c1);
+CREATE INDEX IF NOT EXISTS idx_phash_c2 ON phashes(c2);
+CREATE INDEX IF NOT EXISTS idx_phash_c3 ON phashes(c3);
+CREATE INDEX IF NOT EXISTS idx_phash_image ON phashes(image);
+"""
+# rows written before the digest column existed keep digest NULL and the
+# bare file name in `image`
+MIGRATIONS = [
+    ("digest", "ALTER TABLE phashes ADD COLUMN digest TEXT"),
+]
+
+
+# ------------------------------------------------------------
+# Hashing
+# ------------------------------------------------------------
+def phash(image) -> int:
+    """64-bit DCT perceptual hash of a path, PIL image or BGR array."""
+    if isinstance(image, np.ndarray):
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    else:
+        img = image if isinstance(image, Image.Image) else Image.open(image)
+        gray = np.asarray(img.convert("L"))
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    bits = low > np.median(low[1:])          # DC term skews the median
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _chunks(h):
+    mask = (1 << CHUNK_BITS) - 1
+    return [(h >> (CHUNK_BITS * i)) & mask for i in range(CHUNKS)]
+
+
+def _signed(h):
+    """SQLite INTEGER is signed 64-bit."""
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+
+def _near(value, radius):
+    """All CHUNK_BITS-bit values within `radius` bits of `value`."""
+    out = [value]
+    for r in range(1, radius + 1):
+        for bits in combinations(range(CHUNK_BITS), r):
+            v = value
+            for b in bits:
+                v ^= 1 << b
+            out.append(v)
+    return out
+
+
+# ------------------------------------------------------------
+# Index
+# ------------------------------------------------------------
+class PHashIndex:
+    def __init__(self, path=None, max_distance=MAX_DISTANCE):
+        path = Path(path or DB_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_distance = max_distance
+        self._conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        cols = {r[1] for r in self._conn.execute("PRAGMA table_info(phashes)")}
+        for col, sql in MIGRATIONS:
+            if col not in cols:
+                self._conn.execute(sql)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_phash_digest ON phashes(digest)")
+        self._db_lock = threading.Lock()
+
+    def add(self, h, image, model_version=None, result=None, digest=None):
+        """Index `image` (one row per file: re-adding the same path + content
+        replaces its old entry)."""
+        row = (str(image), digest, _signed(h), *_chunks(h), model_version,
+               json.dumps(result) if result is not None else None, time.time())
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM phashes WHERE image = ? AND digest IS ?", (str(image), digest))
+                cur = self._conn.execute(
+                    "INSERT INTO phashes (image, digest, hash, c0, c1, c2, c3, model_version, result, ts) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return cur.lastrowid
+
+    def lookup(self, h, max_distance=None, model_version=None, exclude=None):
+        """Nearest stored entry within max_distance bits, or None. `exclude` is
+        (image, digest) of the querying file, whose own entry is skipped. With
+        `model_version`, an entry with a result from that version wins over a
+        closer one that can't be reused."""
+        own = _own_entry(exclude)
+        max_distance = self.max_distance if max_distance is None else max_distance
+        radius = max_distance // CHUNKS
+        best = None
+        seen = set()
+        with self._db_lock:
+            for i, chunk in enumerate(_chunks(h)):
+                values = _near(chunk, radius)
+                rows = self._conn.execute(
+                    f"SELECT id, image, digest, hash, model_version, result FROM phashes "
+                    f"WHERE c{i} IN ({','.join('?' * len(values))})", values).fetchall()
+                for row_id, image, digest, stored, version, result in rows:
+                    if row_id in seen or own(image, digest):
+                        continue
+                    seen.add(row_id)
+                    d = hamming(h, stored & ((1 << 64) - 1))
+                    stale = result is None or (model_version is not None and version != model_version)
+                    rank = (stale, d, row_id) if model_version is not None else (d, result is None, row_id)
+                    if d <= max_distance and (best is None or rank < best[0]):
+                        best = (rank, {"id": row_id, "image": image, "distance": d,
+                                       "model_version": version, "result": result})
+        if best is None:
+            return None
+        match = best[1]
+        match["result"] = json.loads(match["result"]) if match["result"] else None
+        return match
+
+    def count(self):
+        with self._db_lock:
+            return self._conn.execute("SELECT COUNT(*) FROM phashes").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+def _own_entry(exclude):
+    """Predicate for the querying file's own rows (see lookup)."""
+    if exclude is None:
+        return lambda image, digest: False
+    path, digest = exclude
+    name = Path(path).name
+    # legacy rows: bare name, no digest
+    return lambda i, d: (i == path and d == digest) or (d is None and i == name)
+
+
+_INDEX = None
+_INDEX_PID = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_index():
+    """Process-wide index (re-opened after fork)."""
+    global _INDEX, _INDEX_PID
+    with _INDEX_LOCK:
+        if _INDEX is None or _INDEX_PID != os.getpid():
+            _INDEX = PHashIndex()
+            _INDEX_PID = os.getpid()
+        return _INDEX
+
+
+# ------------------------------------------------------------
+# Intake helpers (JSON-safe, so they can be stored as queue stages)
+# ------------------------------------------------------------
+def check_duplicate(image, model_version=None):
+    """{"phash", "digest", "duplicate_of", "distance", "result"}. `result` is
+    the earlier image's stored result, only if it came from the same model version."""
+    h = phash(image)
+    digest = exclude = None
+    if isinstance(image, (str, Path)):
+        # never our own earlier entry (re-run of the same file)
+        digest = sha256_file(image)
+        exclude = (os.path.abspath(image), digest)
+    match = get_index().lookup(h, model_version=model_version, exclude=exclude)
+    reusable = match is not None and match["result"] is not None and match["model_version"] == model_version
+    cache_hit("phash", reusable)
+    if match is None:
+        return {"phash": f"{h:016x}", "digest": digest, "duplicate_of": None, "distance": None, "result": None}
+    return {"phash": f"{h:016x}", "digest": digest, "duplicate_of": match["image"], "distance": match["distance"],
+            "result": match["result"] if reusable else None}
+
+
+def remember(phash_hex, image, model_version=None, result=None, digest=None):
+    """Index an analyzed image so later near-duplicates can reuse `result`."""
+    return get_index().add(int(phash_hex, 16), os.path.abspath(image), model_version, result,
+                           digest=digest or sha256_file(image))
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser()
+    p.add_argument("--stats", action="store_true")
+    p.add_argument("--scan", help="hash a directory and report near-duplicate groups (read-only)")
+    p.add_argument("--distance", type=int, default=MAX_DISTANCE)
+    args = p.parse_args()
+
+    if args.scan:
+        scratch = PHashIndex(path=":memory:", max_distance=args.distance)
+        groups = {}
+        files = sorted(f for f in Path(args.scan).iterdir()
+                       if f.suffix.lower() in (".jpg", ".jpeg", ".png"))
+        for f in files:
+            try:
+                h = phash(f)
+            except Exception as e:
+                print(f"skip {f.name}: {e}")
+                continue
+            m = scratch.lookup(h)
+            if m:
+                groups.setdefault(m["image"], []).append((f.name, m["distance"]))
+            else:
+                scratch.add(h, f.name)
+        dups = sum(len(v) for v in groups.values())
+        print(f"{len(files)} images, {dups} near-duplicates in {len(groups)} groups")
+        for original, copies in groups.items():
+            print(f"  {original}")
+            for name, d in copies:
+                print(f"    ~ {name} ({d} bits)")
+    else:
+        print(json.dumps({"entries": get_index().count(), "db": str(DB_PATH),
+                          "max_distance": MAX_DISTANCE}, indent=2))
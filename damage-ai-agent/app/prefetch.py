@@ -0,0 +1,111 @@
+# app/prefetch.py
+# ============================================================
+# BACKGROUND PREFETCH FOR THE REVIEW QUEUE
+# While an annotator works on one image, a small thread pool already
+# runs YOLO + the agent on the next `depth` pending images, so the next
+# image opens with its results ready.
+#
+#     pf = PrefetchQueue(run_inference, depth=4)
+#     pf.fill(next_paths, owner=session_id)   # call on every rerun; cheap
+#     result = pf.take(path, owner=session_id) # ready result, or waits / runs inline
+#
+# Entries are keyed by (path, mtime, size), so a file replaced under the
+# same name is recomputed. One queue serves every session: each owner
+# has its own window, and only paths outside all live windows are
+# dropped. A window not refreshed for WINDOW_TTL seconds (closed tab)
+# no longer counts. A path an owner has take()n isn't prefetched for it
+# again while it stays in that owner's list (the caller keeps the result).
+# ============================================================
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from app.metrics import cache_hit
+
+PREFETCH_DEPTH = int(os.environ.get("DAMAGE_PREFETCH_DEPTH", 4))
+PREFETCH_WORKERS = 2     # YOLO is serialized by app.model; VL calls overlap
+WINDOW_TTL = 300.0
+
+
+def _key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return str(path), st.st_mtime_ns, st.st_size
+
+
+def list_pending(directory, exts=(".jpg", ".jpeg", ".png"), exclude=()):
+    """Images in `directory`, oldest first, minus `exclude` (paths as str)."""
+    items = []
+    with os.scandir(directory) as it:
+        for e in it:
+            if e.is_file() and e.name.lower().endswith(exts) and not e.name.startswith(".") \
+                    and e.path not in exclude:
+                items.append((e.stat().st_mtime, e.path))
+    return [Path(p) for _, p in sorted(items)]
+
+
+class PrefetchQueue:
+    def __init__(self, fn, depth=PREFETCH_DEPTH, workers=PREFETCH_WORKERS):
+        self.fn = fn
+        self.depth = depth
+        self.stats = {"submitted": 0, "ready": 0, "waited": 0, "inline": 0, "dropped": 0}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._futures = {}        # key -> Future
+        self._windows = {}        # owner -> (keys, last fill time)
+        self._taken = {}          # owner -> keys already handed out
+        self._lock = threading.Lock()
+
+    def fill(self, paths, depth=None, owner=None):
+        """Prefetch the first `depth` of `paths` for `owner`; forget anything
+        that is in no owner's window."""
+        depth = self.depth if depth is None else depth
+        window = [k for k in map(_key, paths[:depth]) if k is not None]
+        now = time.monotonic()
+        with self._lock:
+            taken = self._taken.get(owner, set()) & set(window)
+            self._taken[owner] = taken
+            wanted = [k for k in window if k not in taken]
+            self._windows[owner] = (set(wanted), now)
+            for o, (_, seen) in list(self._windows.items()):
+                if now - seen > WINDOW_TTL:
+                    del self._windows[o]
+                    self._taken.pop(o, None)
+            keep = set().union(*(keys for keys, _ in self._windows.values()))
+            for key in set(self._futures) - keep:
+                self._futures.pop(key).cancel()     # no-op if already running
+                self.stats["dropped"] += 1
+            for key in wanted:
+                if key not in self._futures:
+                    self._futures[key] = self._pool.submit(self.fn, Path(key[0]))
+                    self.stats["submitted"] += 1
+
+    def ready(self):
+        with self._lock:
+            return sum(1 for f in self._futures.values() if f.done())
+
+    def take(self, path, owner=None):
+        """Result for `path`: prefetched if possible, otherwise computed now."""
+        key = _key(path)
+        with self._lock:
+            fut = self._futures.pop(key, None)
+            self._taken.setdefault(owner, set()).add(key)
+        if fut is None or fut.cancelled():
+            self.stats["inline"] += 1
+            cache_hit("prefetch", False)
+            return self.fn(Path(path))
+        done = fut.done()
+        self.stats["ready" if done else "waited"] += 1
+        cache_hit("prefetch", done)
+        return fut.result()
+
+    def shutdown(self):
+        with self._lock:
+            for fut in self._futures.values():
+                fut.cancel()
+            self._futures.clear()
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,199 @@
+# app/profiling.py
+# ============================================================
+# OPT-IN PROFILING FOR THE PROCESSING LOOPS
+# Profiles every Nth decide_and_act() / frame and writes one file per
+# profiled call into a rotating directory:
+#     sample   -> <ts>_<name>_<n>.folded  (collapsed stacks; feed to
+#                 flamegraph.pl / speedscope)
+#     cprofile -> <ts>_<name>_<n>.prof    (python -m pstats / snakeviz)
+#
+# Config (env):
+#   DAMAGE_PROFILE_EVERY        profile every Nth call (0 = off)
+#   DAMAGE_PROFILE_MODE         "sample" | "cprofile"
+#   DAMAGE_PROFILE_DIR          output directory
+#   DAMAGE_PROFILE_KEEP         newest files kept
+#   DAMAGE_PROFILE_INTERVAL_MS  sampling period
+#
+# Toggling at runtime:
+#   POSIX    kill -USR1 <pid>
+#   Windows  Ctrl+Break in the process's console (SIGBREAK)
+#   any OS   create <DAMAGE_PROFILE_DIR>/toggle.<pid>; it is polled every
+#            TOGGLE_POLL seconds and deleted once applied
+# When off, a profiled() block costs one counter increment.
+# ============================================================
+
+import cProfile
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+PROFILE_EVERY = int(os.environ.get("DAMAGE_PROFILE_EVERY", 0))
+PROFILE_MODE = os.environ.get("DAMAGE_PROFILE_MODE", "sample")
+PROFILE_DIR = Path(os.environ.get("DAMAGE_PROFILE_DIR",
+                                  r"D:\Rushikesh\project\AI Agent\damage-ai-agent\data\profiles"))
+PROFILE_KEEP = int(os.environ.get("DAMAGE_PROFILE_KEEP", 50))
+SAMPLE_INTERVAL = float(os.environ.get("DAMAGE_PROFILE_INTERVAL_MS", 5)) / 1000.0
+
+# used when profiling is switched on at runtime with DAMAGE_PROFILE_EVERY=0
+SIGNAL_EVERY = 10
+TOGGLE_POLL = 1.0
+
+_every = PROFILE_EVERY
+_mode = PROFILE_MODE
+_calls = Counter()
+_calls_lock = threading.Lock()
+_poller_pid = None
+
+
+def enabled():
+    return _every > 0
+
+
+def enable(every=None, mode=None):
+    global _every, _mode
+    _every = every or PROFILE_EVERY or SIGNAL_EVERY
+    if mode:
+        _mode = mode
+
+
+def disable():
+    global _every
+    _every = 0
+
+
+def toggle():
+    disable() if enabled() else enable()
+    print(f"🔬 Profiling {'ON (every %d, %s)' % (_every, _mode) if enabled() else 'OFF'}")
+
+
+# ------------------------------------------------------------
+# Sampling profiler
+# ------------------------------------------------------------
+def _collapse(frame):
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{Path(code.co_filename).name}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+class StackSampler:
+    """Samples one thread's Python stack every `interval` s from a helper thread."""
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_collapse(frame)] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+# ------------------------------------------------------------
+# Output rotation
+# ------------------------------------------------------------
+def _rotate(directory, keep):
+    files = sorted((p for p in directory.iterdir() if p.suffix in (".prof", ".folded")),
+                   key=lambda p: p.stat().st_mtime)
+    for p in files[:max(0, len(files) - keep)]:
+        try:
+            p.unlink()
+        except OSError:
+            pass
+
+
+def _out_path(name, n, suffix):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    ts = time.strftime("%Y%m%d-%H%M%S")
+    return PROFILE_DIR / f"{ts}_{name}_{n}{suffix}"
+
+
+# ------------------------------------------------------------
+# Public API
+# ------------------------------------------------------------
+@contextmanager
+def profiled(name):
+    """Profile the with-block if this is the Nth call for `name` and profiling is on."""
+    if not _every:
+        yield
+        return
+    with _calls_lock:
+        _calls[name] += 1
+        n = _calls[name]
+    if n % _every:
+        yield
+        return
+
+    if _mode == "cprofile":
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            prof.dump_stats(str(_out_path(name, n, ".prof")))
+            _rotate(PROFILE_DIR, PROFILE_KEEP)
+    else:
+        sampler = StackSampler()
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            sampler.write(_out_path(name, n, ".folded"))
+            _rotate(PROFILE_DIR, PROFILE_KEEP)
+
+
+def toggle_file(pid=None):
+    """File whose creation toggles profiling in process `pid` (default: this one)."""
+    return PROFILE_DIR / f"toggle.{pid or os.getpid()}"
+
+
+def _poll_toggle_file(path):
+    while True:
+        time.sleep(TOGGLE_POLL)
+        try:
+            path.unlink()
+        except OSError:
+            continue       # not there (or, on Windows, still held open by its creator)
+        toggle()
+
+
+def install_signal_toggle():
+    """SIGUSR1 (POSIX) or SIGBREAK (Windows) toggles profiling, as does
+    creating toggle_file(). Signals are only hooked from the main thread;
+    the file is polled in every process. Returns True if a signal is hooked."""
+    global _poller_pid
+    if _poller_pid != os.getpid():
+        _poller_pid = os.getpid()
+        threading.Thread(target=_poll_toggle_file, args=(toggle_file(),),
+                         name="profile-toggle", daemon=True).start()
+    sig = getattr(signal, "SIGUSR1", None) or getattr(signal, "SIGBREAK", None)
+    if sig is None or threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(sig, lambda *_: toggle())
+    return True
@@ -3,13 +3,18 @@
 Realtime RL loop:
 - Connect to RTSP
 - Capture frames every N seconds
+- Skip frames that barely differ from the last analyzed one (scene_gate),
+  with a forced refresh every --refresh seconds (--refresh off: no gate;
+  --refresh 0: every frame is analyzed, the gate only reports distances,
+  which helps tune --gate-threshold)
 - Run detect_damage() -> autonomous_agent()
-- Log RL step with reward=0 (human feedback expected later)
+- Log RL step with reward=0 (human feedback joined later via attach_reward)
 - Save captured image into data/realtime/
 
 Usage:
     python -m app.realtime_rl --rtsp "rtsp://..." --interval 5
 """
+import os
 import time
 import argparse
 from pathlib import Path
@@ -24,22 +29,55 @@ sys.path.append(str(ROOT))
 from app.model import detect_damage
 from app.agent_core import autonomous_agent
 from app.rl_memory import log_rl_step
+from app import metrics
+from app.metrics import stage
+from app.profiling import profiled, install_signal_toggle
+from app.frame_grabber import LatestFrameGrabber
+from app.scene_gate import SceneGate, REFRESH_SECONDS, refresh_arg
 
 OUT_DIR = Path("data/realtime")
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
-def capture_loop(rtsp_url, interval=5, max_iters=None):
-    cap = cv2.VideoCapture(rtsp_url)
-    if not cap.isOpened():
+# /metrics port (0 = off, the default); pick one that differs from
+# agent_service's (e.g. 9109) so both can run on one host
+METRICS_PORT = int(os.environ.get("DAMAGE_RT_METRICS_PORT", 0))
+
+def capture_loop(rtsp_url, interval=5, max_iters=None, metrics_port=METRICS_PORT,
+                 gate_method="gray", gate_threshold=None, refresh=REFRESH_SECONDS):
+    if metrics_port:
+        metrics.start_http_server(metrics_port)
+    install_signal_toggle()
+    # background grab() keeps the stream drained; read() returns the newest frame
+    try:
+        cap = LatestFrameGrabber(rtsp_url).start()
+    except ConnectionError:
         raise ConnectionError("Cannot open RTSP stream.")
+    # refresh=None disables gating; 0 still runs the gate (distances are
+    # printed) but sends every frame through
+    gate = SceneGate(gate_method, gate_threshold, refresh) if refresh is not None else None
     it = 0
     try:
         while True:
             it += 1
             ret, frame = cap.read()
             if not ret:
+                metrics.FRAMES.inc(result="read_failed")
                 time.sleep(1.0)
                 continue
+
+            # cheap pre-filter: no JPEG, YOLO, VL or RL record for a static scene
+            if gate is not None:
+                analyze, reason, dist = gate.check(frame)
+                if not analyze:
+                    metrics.FRAMES.inc(result="skipped")
+                    print(f"[{it}] Unchanged scene (diff={dist:.3g}); skipped "
+                          f"{gate.stats['skipped']} / analyzed {gate.stats['analyzed']}")
+                    if max_iters and it >= max_iters:
+                        break
+                    time.sleep(interval)
+                    continue
+                print(f"[{it}] Scene {reason}" + (f" (diff={dist:.3g})" if dist is not None else ""))
+
             # Convert BGR -> RGB
             try:
                 frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
@@ -50,34 +88,40 @@ def capture_loop(rtsp_url, interval=5, max_iters=None):
             filename = OUT_DIR / f"realtime_{ts}_{it}.jpg"
             img.save(filename)
 
-            # run detection + agent
-            try:
-                yolo_preds, yolo_boxes = detect_damage(str(filename))
-            except Exception as e:
-                print("YOLO error:", e)
-                yolo_preds, yolo_boxes = {}, []
+            with profiled("frame"):
+                # run detection + agent
+                try:
+                    with stage("detect"):
+                        yolo_preds, yolo_boxes = detect_damage(str(filename))
+                except Exception as e:
+                    print("YOLO error:", e)
+                    yolo_preds, yolo_boxes = {}, []
 
-            try:
-                agent_out = autonomous_agent(
-                    image_path=str(filename),
-                    yolo_preds=yolo_preds,
-                    yolo_boxes=yolo_boxes
-                )
-            except Exception as e:
-                agent_out = {"action": "ASK_HUMAN", "confidence": "low", "damage_type":"unknown", "reason": str(e)}
-
-            # Compose state (keep it small)
-            state = {
-                "yolo": {
-                    "label": yolo_preds.get("label") if isinstance(yolo_preds, dict) else None,
-                    "confidence": float(yolo_preds.get("confidence", 0.0)) if isinstance(yolo_preds, dict) else 0.0
-                },
-                "agent": agent_out,
-                "image": str(filename)
-            }
-
-            # log with reward 0 for now
-            log_rl_step(state=state, action=agent_out.get("action", "ASK_HUMAN"), reward=0.0, info={"realtime": True})
+                try:
+                    with stage("agent"):
+                        agent_out = autonomous_agent(
+                            image_path=str(filename),
+                            yolo_preds=yolo_preds,
+                            yolo_boxes=yolo_boxes
+                        )
+                except Exception as e:
+                    agent_out = {"action": "ASK_HUMAN", "confidence": "low", "damage_type":"unknown", "reason": str(e)}
+
+                # Compose state (keep it small)
+                state = {
+                    "yolo": {
+                        "label": yolo_preds.get("label") if isinstance(yolo_preds, dict) else None,
+                        "confidence": float(yolo_preds.get("confidence", 0.0)) if isinstance(yolo_preds, dict) else 0.0
+                    },
+                    "agent": agent_out,
+                    "image": str(filename)
+                }
+
+                # log with reward 0 for now; rl_memory.attach_reward() joins the human reward later
+                with stage("rl_log"):
+                    log_rl_step(state=state, action=agent_out.get("action", "ASK_HUMAN"), reward=0.0, info={"realtime": True, "image": filename.name})
+                metrics.FRAMES.inc(result="analyzed")
+                metrics.IMAGES_PROCESSED.inc(action=agent_out.get("action", "ASK_HUMAN"))
 
             print(f"[{it}] Logged frame {filename.name} action={agent_out.get('action')}")
 
@@ -90,11 +134,21 @@ def capture_loop(rtsp_url, interval=5, max_iters=None):
         print("Interrupted by user, exiting.")
     finally:
         cap.release()
+        if gate is not None:
+            print(f"Scene gate: {gate.stats} ({gate.skip_ratio():.0%} skipped)")
 
 if __name__ == "__main__":
     p = argparse.ArgumentParser()
     p.add_argument("--rtsp", required=True, help="rtsp url")
     p.add_argument("--interval", type=int, default=5)
     p.add_argument("--iters", type=int, default=0)
+    p.add_argument("--metrics-port", type=int, default=METRICS_PORT, help="0 = no /metrics endpoint")
+    p.add_argument("--gate", choices=["gray", "dhash"], default="gray", help="scene-change measure")
+    p.add_argument("--gate-threshold", type=float, default=None,
+                   help="min change to analyze (gray: changed-cell fraction 0-1, dhash: differing bits)")
+    p.add_argument("--refresh", type=refresh_arg, default=REFRESH_SECONDS,
+                   help="analyze at least every N seconds; 0 = every frame (gate distances still shown); "
+                        "off = no gating")
     args = p.parse_args()
-    capture_loop(args.rtsp, interval=args.interval, max_iters=(args.iters or None))
+    capture_loop(args.rtsp, interval=args.interval, max_iters=(args.iters or None), metrics_port=args.metrics_port,
+                 gate_method=args.gate, gate_threshold=args.gate_threshold, refresh=args.refresh)
@@ -1,10 +1,209 @@
+# app/retrain_manager.py
+# ============================================================
+# RETRAIN SCHEDULER
+# - persistent "new samples since last training" counter (O(1) check)
+# - at most one training job at a time, across processes: jobs run in
+#   a detached runner process that holds data/retrain/job.lock, and the
+#   training pid is recorded so an orphaned job is still seen as running
+# - a trigger while a job runs queues exactly one follow-up run
+# - job status and durations recorded in data/retrain/state.json
+# ============================================================
+
 from pathlib import Path
+import json
+import os
 import subprocess
+import sys
+import time
+
+from app.blob_store import place_file, sha256_file
+from app.file_lock import file_lock
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+RETRAIN_SCRIPT = PROJECT_ROOT / "retraining" / "retrain.py"
+# incremental = few epochs from best.pt on new samples + replay (see retrain.py)
+RETRAIN_MODE = os.environ.get("RETRAIN_MODE", "incremental")
+RETRAIN_PROFILE = os.environ.get("RETRAIN_PROFILE", "auto")
+
+STATE_DIR = Path(r"D:\Rushikesh\project\AI Agent\damage-ai-agent\data\retrain")
+STATE_FILE = STATE_DIR / "state.json"
+JOB_LOCK = STATE_DIR / "job"
+RUNNER_LOG = STATE_DIR / "runner.log"
+HISTORY_LEN = 50
+
+
+def _empty():
+    return {"new_samples": 0, "queued": False, "active": None, "history": []}
+
+
+def _read():
+    try:
+        return json.loads(STATE_FILE.read_text())
+    except (FileNotFoundError, ValueError):
+        return _empty()
+
+
+def _update(fn):
+    with file_lock(STATE_FILE):
+        state = _read()
+        fn(state)
+        STATE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = STATE_FILE.with_suffix(f".tmp{os.getpid()}")
+        tmp.write_text(json.dumps(state, indent=2))
+        os.replace(tmp, STATE_FILE)
+    return state
+
+
+def place_sample(src, dest):
+    """place_file() into the training set. True only if `dest` now holds an
+    image it didn't hold before (re-saving the same picture isn't a sample)."""
+    dest = Path(dest)
+    before = sha256_file(dest) if dest.exists() else None
+    return place_file(src, dest) != before
+
+
+def note_new_samples(n=1):
+    """Call when images that weren't in the training set are added (see place_sample)."""
+    def bump(s):
+        s["new_samples"] += n
+    _update(bump)
 
-DATASET_IMG = Path(r"D:\Rushikesh\project\AI Agent\damage-ai-agent\data\dataset\images\train")
 
 def should_retrain(threshold=500):
-    return len(list(DATASET_IMG.glob("*.*"))) >= threshold
+    return _read()["new_samples"] >= threshold
+
+
+def status():
+    return _read()
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    if os.name == "nt":
+        import ctypes
+        k32 = ctypes.windll.kernel32
+        handle = k32.OpenProcess(0x1000, False, int(pid))   # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        k32.GetExitCodeProcess(handle, ctypes.byref(code))
+        k32.CloseHandle(handle)
+        return code.value == 259                             # STILL_ACTIVE
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def job_running():
+    """True while a runner holds the job lock, or a training process it
+    started is still alive (its runner may have died without stopping it)."""
+    with file_lock(JOB_LOCK, blocking=False) as held:
+        if not held:
+            return True
+        active = _read()["active"]
+        return bool(active and _pid_alive(active.get("pid")))
+
+
+def _wait_for_orphan():
+    """A runner killed mid-job leaves its training process behind; wait it out."""
+    active = _read()["active"]
+    if not active:
+        return
+    while _pid_alive(active.get("pid")):
+        time.sleep(5)
+
+    def done(s):
+        s["active"] = None
+        s["history"] = (s["history"] + [dict(active, finished=time.time(), status="unknown",
+                                             note="runner exited before the job")])[-HISTORY_LEN:]
+    _update(done)
+
+
+def run_jobs():
+    """
+    Job runner (own process, see trigger_retrain). Holds data/retrain/job.lock
+    for as long as it runs jobs; exits when nothing is queued.
+    """
+    while True:
+        with file_lock(JOB_LOCK, blocking=False) as held:
+            if not held:
+                return            # another runner will pick up the queued flag
+            _wait_for_orphan()
+            while _read()["queued"]:
+                t0 = time.time()
+
+                def begin(s):
+                    s["queued"] = False
+                    s["active"] = {"runner": os.getpid(), "pid": None, "started": t0,
+                                   "samples": s["new_samples"], "mode": RETRAIN_MODE}
+                samples = _update(begin)["new_samples"]
+
+                try:
+                    cmd = [sys.executable, str(RETRAIN_SCRIPT), "--mode", RETRAIN_MODE, "--profile", RETRAIN_PROFILE]
+                    proc = subprocess.Popen(cmd, cwd=str(PROJECT_ROOT))
+                    _update(lambda s: s["active"].update(pid=proc.pid))
+                    rc = proc.wait()
+                except OSError as e:
+                    print("retrain launch failed:", e)
+                    rc = -1
+
+                def finish(s):
+                    s["active"] = None
+                    if rc == 0:
+                        s["new_samples"] = max(0, s["new_samples"] - samples)
+                    s["history"] = (s["history"] + [{
+                        "started": t0,
+                        "finished": time.time(),
+                        "duration_s": round(time.time() - t0, 1),
+                        "status": "ok" if rc == 0 else "failed",
+                        "returncode": rc,
+                        "samples": samples,
+                        "mode": RETRAIN_MODE,
+                    }])[-HISTORY_LEN:]
+                _update(finish)
+
+        # a trigger that saw the lock held just before we released it
+        if not _read()["queued"]:
+            return
+
+
+def _spawn_runner():
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    if os.name == "nt":
+        detach = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS}
+    else:
+        detach = {"start_new_session": True}
+    with open(RUNNER_LOG, "ab") as log:
+        subprocess.Popen([sys.executable, "-m", "app.retrain_manager", "--run-jobs"],
+                         cwd=str(PROJECT_ROOT), stdout=log, stderr=subprocess.STDOUT,
+                         stdin=subprocess.DEVNULL, **detach)
+
 
 def trigger_retrain():
-    subprocess.Popen(["python", "retraining/retrain.py"])
+    """
+    Start a training job in a detached runner process, or queue one follow-up
+    run if a job is already active. The runner (not the caller) holds the job
+    lock, so restarting Streamlit / agent_service never allows a second
+    concurrent run. Returns "started" or "queued".
+    """
+    _update(lambda s: s.update(queued=True))
+    if job_running():
+        return "queued"
+    _spawn_runner()
+    return "started"
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser()
+    p.add_argument("--run-jobs", action="store_true", help="run queued training jobs (used by trigger_retrain)")
+    args = p.parse_args()
+    if args.run_jobs:
+        run_jobs()
+    else:
+        print(json.dumps(status(), indent=2))
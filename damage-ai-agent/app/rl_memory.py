@@ -2,18 +2,179 @@
 
 # app/rl_memory.py
 import json
+import os
+import threading
 import time
 from pathlib import Path
 
+from app.file_lock import file_lock
+from app.jsonl_writer import append_jsonl, flush, on_commit
+
 RL_DIR = Path(r"D:/Rushikesh/project/AI Agent/damage-ai-agent/data/rl_experience.jsonl")
 RL_DIR.mkdir(parents=True, exist_ok=True)
 
 RL_LOG = RL_DIR / "rl_steps.jsonl"
 
+# Delayed-reward join:
+#   rl_index.jsonl      {"image": id, "offset": byte offset of its step in RL_LOG}
+#   rl_rewards.jsonl    {"offset": step offset, "image": id, "reward": r, ...}
+#                       (latest entry per step wins)
+#   rl_index.meta.json  {"indexed_to": N}: RL_LOG bytes [0, N) have been
+#                       scanned into the index (steps logged before the
+#                       commit hook existed, or by a process without it)
+# Index and rewards are tailed incrementally, so lookups never rescan RL_LOG.
+INDEX_LOG = RL_DIR / "rl_index.jsonl"
+REWARD_LOG = RL_DIR / "rl_rewards.jsonl"
+INDEX_META = RL_DIR / "rl_index.meta.json"
+
+
+def image_id(path) -> str:
+    """File name of an image path, for both Windows and POSIX separators."""
+    return str(path).replace("\\", "/").rsplit("/", 1)[-1]
+
+
+def _step_image(rec):
+    img = (rec.get("info") or {}).get("image") or (rec.get("state") or {}).get("image")
+    return image_id(img) if img else None
+
+
+def _parse(line):
+    """One JSONL record, or None for a corrupt line (torn write, disk error)."""
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
+
+
+class _JsonlTail:
+    """Reads only the lines appended to a JSONL file since the last call.
+    Corrupt lines are skipped."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.pos = 0
+
+    def read_new(self):
+        if not self.path.exists():
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(self.pos)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        self.pos += end
+        records = (_parse(l) for l in data[:end].splitlines() if l.strip())
+        return [r for r in records if r is not None]
+
+
+_lock = threading.Lock()
+_rebuild_lock = threading.Lock()
+_index = {}      # image id -> offset of its latest step in RL_LOG
+_rewards = {}    # step offset -> reward record
+_index_tail = _JsonlTail(INDEX_LOG)
+_reward_tail = _JsonlTail(REWARD_LOG)
+_index_checked = False
+
+
+def _index_put(img, offset):
+    # max(): entries may arrive out of order (rebuild vs. commit hook, other processes)
+    if offset > _index.get(img, -1):
+        _index[img] = offset
+
+
+def _on_rl_commit(offsets):
+    entries = []
+    for offset, rec in offsets:
+        img = _step_image(rec)
+        if img:
+            entries.append({"image": img, "offset": offset})
+    with _lock:
+        for e in entries:
+            _index_put(e["image"], e["offset"])
+    for e in entries:
+        append_jsonl(INDEX_LOG, e)
+
+
+on_commit(RL_LOG, _on_rl_commit)
+
+
+def _read_meta():
+    try:
+        return int(json.loads(INDEX_META.read_text()).get("indexed_to", 0))
+    except (OSError, ValueError):
+        return 0
+
+
+def _rebuild_index():
+    """Index RL_LOG from the persisted marker to its current end.
+    Steps committed through the hook come up again here; indexing them twice is harmless."""
+    with file_lock(INDEX_META):
+        start = _read_meta()
+        if not RL_LOG.exists() or RL_LOG.stat().st_size <= start:
+            return
+        offset = start
+        with open(RL_LOG, "rb") as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break                      # partial line of an in-flight commit
+                try:
+                    img = _step_image(json.loads(line))
+                except ValueError:
+                    img = None
+                if img:
+                    append_jsonl(INDEX_LOG, {"image": img, "offset": offset})
+                offset += len(line)
+        flush(INDEX_LOG)
+        tmp = INDEX_META.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"indexed_to": offset}))
+        os.replace(tmp, INDEX_META)
+
+
+def _ensure_index():
+    """Once per process: catch the index up with RL_LOG (see INDEX_META)."""
+    global _index_checked
+    with _lock:
+        if _index_checked:
+            return
+    with _rebuild_lock:
+        with _lock:
+            if _index_checked:
+                return
+        # outside _lock: append/flush may wait on a writer thread that is in the commit hook
+        _rebuild_index()
+        with _lock:
+            _index_checked = True
+
+
+def _refresh():
+    """Pick up index / reward lines written by other processes."""
+    _ensure_index()
+    flush(INDEX_LOG)
+    flush(REWARD_LOG)
+    with _lock:
+        for r in _index_tail.read_new():
+            _index_put(r["image"], r["offset"])
+        for r in _reward_tail.read_new():
+            offset = r.get("offset")
+            if offset is None:
+                # written before rewards carried an offset: the image's latest step
+                offset = _index.get(r["image"])
+            if offset is not None:
+                _rewards[offset] = r
+
+
+def _join(rec, offset):
+    late = _rewards.get(offset)
+    if late is not None:
+        rec["reward"] = float(late["reward"])
+        rec.setdefault("info", {})["delayed_reward"] = late.get("info", {})
+    return rec
+
 
 def log_rl_step(state, action, reward, info=None):
     """
     Append one RL experience record to data/rl/rl_steps.jsonl
+    (buffered; group-committed by app.jsonl_writer).
     state, action, reward, info should be JSON-serializable.
     """
     rec = {
@@ -23,22 +184,74 @@ def log_rl_step(state, action, reward, info=None):
         "reward": float(reward),
         "info": info or {}
     }
-    with open(RL_LOG, "a", encoding="utf-8") as f:
-        f.write(json.dumps(rec) + "\n")
+    append_jsonl(RL_LOG, rec)
+    return rec
+
+
+def attach_reward(image, reward, info=None):
+    """
+    Attach (or amend) the delayed human reward for the latest step logged for
+    `image`. The reward is tied to that step's offset, so later steps for a
+    re-used file name are unaffected. Returns None if no step is logged for it.
+    """
+    flush(RL_LOG)
+    _refresh()
+    img = image_id(image)
+    with _lock:
+        offset = _index.get(img)
+    if offset is None:
+        return None
+    rec = {
+        "timestamp": time.time(),
+        "offset": offset,
+        "image": img,
+        "reward": float(reward),
+        "info": info or {}
+    }
+    append_jsonl(REWARD_LOG, rec)
+    with _lock:
+        _rewards[offset] = rec
     return rec
 
 
-def read_all(limit=None):
+def get_step(image):
+    """Return the latest RL step logged for `image` (reward joined), or None."""
+    flush(RL_LOG)
+    _refresh()
+    with _lock:
+        offset = _index.get(image_id(image))
+    if offset is None:
+        return None
+    with open(RL_LOG, "rb") as f:
+        f.seek(offset)
+        return _join(json.loads(f.readline()), offset)
+
+
+def read_all(limit=None, joined=True):
     """
     Read all RL records. If limit provided, return last `limit` records.
+    With joined=True, delayed rewards from attach_reward() replace the logged reward.
+    Corrupt lines are skipped.
     """
+    flush(RL_LOG)
     if not RL_LOG.exists():
         return []
-    with open(RL_LOG, "r", encoding="utf-8") as f:
+    with open(RL_LOG, "rb") as f:
         lines = f.readlines()
-    if limit is None:
-        records = [json.loads(l) for l in lines]
-    else:
-        records = [json.loads(l) for l in lines[-limit:]]
-    return records
-
+    offsets, pos = [], 0
+    for l in lines:
+        offsets.append(pos)
+        pos += len(l)
+    records = []
+    for o, l in zip(offsets, lines):
+        if not l.strip():
+            continue
+        r = _parse(l)
+        if r is not None:
+            records.append((o, r))
+    if limit is not None:
+        records = records[-limit:]
+    if joined:
+        _refresh()
+        return [_join(r, o) for o, r in records]
+    return [r for _, r in records]
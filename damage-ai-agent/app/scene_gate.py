@@ -0,0 +1,95 @@
+# app/scene_gate.py
+# ============================================================
+# SCENE-CHANGE GATE FOR LIVE FRAMES
+# A parked container gives near-identical frames for minutes; only
+# frames that differ meaningfully from the LAST ANALYZED frame go
+# through YOLO + VL + logging. Comparing against the last analyzed
+# frame (not the previous one) means slow drift still triggers.
+#
+# Methods (both on a tiny grayscale thumbnail, ~0.1 ms per frame):
+#   "gray"   fraction of 32x32 cells whose brightness moved by more
+#            than PIXEL_DELTA (sensor noise stays below it; a truck
+#            in one corner still counts), in [0, 1]
+#   "dhash"  Hamming distance between 64-bit difference hashes
+#
+# Every `refresh_s` seconds a frame is analyzed regardless; refresh_s=0
+# analyzes every frame (check() still reports the distance). Callers
+# use refresh=None for "no gate at all".
+# ============================================================
+
+import time
+
+import cv2
+import numpy as np
+
+DEFAULT_THRESHOLDS = {"gray": 0.02, "dhash": 6}
+PIXEL_DELTA = 20
+REFRESH_SECONDS = 60.0
+
+
+def refresh_arg(value):
+    """argparse type for --refresh: seconds >= 0, or "off" -> None (no gate)."""
+    if value.lower() in ("off", "none"):
+        return None
+    seconds = float(value)
+    if seconds < 0:
+        raise ValueError(f"refresh must be >= 0 or 'off': {value}")
+    return seconds
+
+
+def _gray(frame, size):
+    g = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(g, size, interpolation=cv2.INTER_AREA)
+
+
+def dhash(frame) -> int:
+    """64-bit difference hash (horizontal gradients of a 9x8 thumbnail)."""
+    g = _gray(frame, (9, 8))
+    bits = (g[:, 1:] > g[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class SceneGate:
+    def __init__(self, method="gray", threshold=None, refresh_s=REFRESH_SECONDS):
+        if method not in DEFAULT_THRESHOLDS:
+            raise ValueError(f"Unknown scene gate method: {method}")
+        self.method = method
+        self.threshold = DEFAULT_THRESHOLDS[method] if threshold is None else threshold
+        self.refresh_s = refresh_s
+        self.stats = {"analyzed": 0, "skipped": 0, "forced": 0}
+        self._ref = None
+        self._ref_time = 0.0
+
+    def _signature(self, frame):
+        if self.method == "dhash":
+            return dhash(frame)
+        return _gray(frame, (32, 32)).astype(np.int16)
+
+    def _distance(self, a, b):
+        if self.method == "dhash":
+            return bin(a ^ b).count("1")
+        return float((np.abs(a - b) > PIXEL_DELTA).mean())
+
+    def check(self, frame, now=None):
+        """(analyze?, reason, distance). Call for every candidate frame."""
+        now = time.monotonic() if now is None else now
+        sig = self._signature(frame)
+        if self._ref is None:
+            reason, dist = "first", None
+        else:
+            dist = self._distance(sig, self._ref)
+            if dist > self.threshold:
+                reason = "changed"
+            elif now - self._ref_time >= self.refresh_s:
+                reason = "refresh"
+                self.stats["forced"] += 1
+            else:
+                self.stats["skipped"] += 1
+                return False, "static", dist
+        self._ref, self._ref_time = sig, now
+        self.stats["analyzed"] += 1
+        return True, reason, dist
+
+    def skip_ratio(self):
+        total = self.stats["analyzed"] + self.stats["skipped"]
+        return self.stats["skipped"] / total if total else 0.0
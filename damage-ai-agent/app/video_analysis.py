@@ -0,0 +1,188 @@
+# app/video_analysis.py
+"""
+Whole-video damage analysis.
+
+- samples the video every `stride` seconds; frames in between are only
+  grab()bed (demuxed, never decoded / converted), so a 10 min clip at
+  a 1 s stride decodes ~600 frames instead of ~15000
+- sampled frames go through detect_damage_batch() in chunks
+- returns a per-timestamp timeline and, per damage label, the frame
+  where YOLO was most confident (saved as JPEG with its boxes)
+- uploads are written to a temp file that is always removed
+  (temp_video), also when decoding fails halfway
+
+Usage:
+    python -m app.video_analysis clip.mp4 --stride 1.0 --batch 16
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import cv2
+
+ROOT = Path(__file__).resolve().parent.parent
+import sys
+sys.path.append(str(ROOT))
+
+from app.model import detect_damage_batch, last_model_version
+
+OUT_DIR = Path(r"D:\Rushikesh\project\AI Agent\damage-ai-agent\data\video_analysis")
+
+STRIDE_SECONDS = 1.0
+BATCH_SIZE = 16
+DEFAULT_FPS = 25.0        # when the container doesn't report one
+
+
+@contextmanager
+def temp_video(data, suffix=".mp4"):
+    """Write `data` (bytes) to a temp file for OpenCV; deleted on exit."""
+    fd, path = tempfile.mkstemp(prefix="damage_video_", suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        yield Path(path)
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def sample_frames(video_path, stride=STRIDE_SECONDS, max_samples=None):
+    """Yield (frame_index, seconds, BGR frame) every `stride` seconds."""
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {video_path}")
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+        step = max(1, round(stride * fps))
+        idx = sampled = 0
+        while True:
+            if idx % step:
+                ok = cap.grab()            # skip without decoding
+            else:
+                ok, frame = cap.read()
+                if ok:
+                    yield idx, idx / fps, frame
+                    sampled += 1
+                    if max_samples and sampled >= max_samples:
+                        break
+            if not ok:
+                break
+            idx += 1
+    finally:
+        cap.release()
+
+
+def video_info(video_path):
+    cap = cv2.VideoCapture(str(video_path))
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+        frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        return {"fps": fps, "frames": frames, "duration": round(frames / fps, 2) if frames else None}
+    finally:
+        cap.release()
+
+
+def _draw(frame, boxes):
+    out = frame.copy()
+    for b in boxes:
+        x1, y1, x2, y2 = b["bbox"]
+        cv2.rectangle(out, (x1, y1), (x2, y2), (0, 0, 255), 2)
+        cv2.putText(out, f"{b['label']} {b['confidence']:.2f}", (x1, max(15, y1 - 5)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
+    return out
+
+
+def analyze_video(video_path, stride=STRIDE_SECONDS, batch_size=BATCH_SIZE, out_dir=None,
+                  max_samples=None, progress=None):
+    """Timeline + best frame per label. `progress(done_s, duration_s)` is called per batch.
+
+    Best frames are written to out_dir (default OUT_DIR/<video stem>) as
+    <label>_<seconds>s.jpg (clean) and <label>_<seconds>s_boxes.jpg.
+    """
+    video_path = Path(video_path)
+    info = video_info(video_path)
+    out_dir = Path(out_dir or OUT_DIR / video_path.stem)
+    timeline, best = [], {}
+    t0 = time.perf_counter()
+
+    def run(batch):
+        results = detect_damage_batch([frame for _, _, frame in batch], batch_size=batch_size)
+        for (idx, sec, frame), (preds, boxes) in zip(batch, results):
+            top = max(preds, key=preds.get) if preds else None
+            timeline.append({"t": round(sec, 2), "frame": idx, "top": top,
+                             "preds": {k: round(v, 4) for k, v in preds.items()},
+                             "num_boxes": len(boxes)})
+            for label, conf in preds.items():
+                if label not in best or conf > best[label]["confidence"]:
+                    best[label] = {"confidence": conf, "t": round(sec, 2), "frame": idx, "_image": frame,
+                                   "boxes": [b for b in boxes if b["label"] == label]}
+        if progress:
+            progress(batch[-1][1], info["duration"])
+
+    batch = []
+    for item in sample_frames(video_path, stride, max_samples):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            run(batch)
+            batch = []
+    if batch:
+        run(batch)
+
+    if best:
+        out_dir.mkdir(parents=True, exist_ok=True)
+    for label, b in best.items():
+        frame = b.pop("_image")
+        stem = f"{label}_{b['t']:.1f}s"
+        b["path"] = str(out_dir / f"{stem}.jpg")
+        b["annotated"] = str(out_dir / f"{stem}_boxes.jpg")
+        cv2.imwrite(b["path"], frame)
+        cv2.imwrite(b["annotated"], _draw(frame, b["boxes"]))
+
+    return {"video": str(video_path), "stride": stride, **info,
+            "sampled": len(timeline), "seconds": round(time.perf_counter() - t0, 2),
+            "model_version": last_model_version(), "timeline": timeline, "best": best}
+
+
+def damage_segments(timeline, gap=None):
+    """Merge consecutive timeline points with the same top label into (label, start, end)."""
+    segments = []
+    for p in timeline:
+        if p["top"] is None:
+            continue
+        last = segments[-1] if segments else None
+        if last and last["label"] == p["top"] and (gap is None or p["t"] - last["end"] <= gap):
+            last["end"] = p["t"]
+            last["max_conf"] = max(last["max_conf"], p["preds"][p["top"]])
+        else:
+            segments.append({"label": p["top"], "start": p["t"], "end": p["t"],
+                             "max_conf": p["preds"][p["top"]]})
+    return segments
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("video")
+    p.add_argument("--stride", type=float, default=STRIDE_SECONDS, help="seconds between analyzed frames")
+    p.add_argument("--batch", type=int, default=BATCH_SIZE)
+    p.add_argument("--max-samples", type=int, default=0)
+    p.add_argument("--out", default=None, help="directory for best frames + timeline.json")
+    args = p.parse_args()
+
+    report = analyze_video(args.video, args.stride, args.batch, args.out, args.max_samples or None)
+    out_dir = Path(args.out or OUT_DIR / Path(args.video).stem)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / "timeline.json").write_text(json.dumps(report, indent=2))
+
+    print(f"🎞  {report['sampled']} frames sampled in {report['seconds']}s "
+          f"({report['duration']}s video, stride {args.stride}s)")
+    for s in damage_segments(report["timeline"], gap=args.stride * 1.5):
+        print(f"  {s['start']:>8.1f}s - {s['end']:>8.1f}s  {s['label']:<12} max {s['max_conf']:.2f}")
+    for label, b in report["best"].items():
+        print(f"  best {label:<12} {b['confidence']:.2f} @ {b['t']}s -> {b['path']}")
+    print(f"Timeline: {out_dir / 'timeline.json'}")
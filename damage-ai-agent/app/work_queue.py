@@ -0,0 +1,275 @@
+# app/work_queue.py
+# ============================================================
+# DURABLE WORK QUEUE (SQLite, WAL)
+# Tracks every incoming image through
+#     pending -> claimed (leased) -> done | failed
+# and records the result of each completed stage of decide_and_act.
+# A crashed worker's lease runs out, the job goes back to pending and
+# the next claimer resumes after the last completed stage: detection
+# and LLM results are reused, side effects already committed (RL log,
+# feedback, audit, move) are not repeated.
+#
+# While a job runs, a heartbeat thread keeps extending its lease, so
+# LEASE_SECONDS only bounds how long a dead worker holds a job.
+#
+# A job given back after a failure (fail() or a reaped lease) waits
+# BACKOFF_SECONDS * 2^(attempts-1), capped at BACKOFF_MAX, before it can
+# be claimed again (`not_before`), so a poison image doesn't spin.
+#
+#     python -m app.work_queue            # counts per state
+#     python -m app.work_queue --reap     # release expired leases now
+# ============================================================
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+DATA_DIR = Path(r"D:\Rushikesh\project\AI Agent\damage-ai-agent\data")
+DB_PATH = DATA_DIR / "work_queue.db"
+
+LEASE_SECONDS = float(os.environ.get("WORK_QUEUE_LEASE", 30))
+MAX_ATTEMPTS = int(os.environ.get("WORK_QUEUE_MAX_ATTEMPTS", 3))
+BACKOFF_SECONDS = float(os.environ.get("WORK_QUEUE_BACKOFF", 5))
+BACKOFF_MAX = 300.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    image       TEXT NOT NULL UNIQUE,
+    state       TEXT NOT NULL DEFAULT 'pending',
+    owner       TEXT,
+    lease_until REAL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    not_before  REAL,
+    error       TEXT,
+    created     REAL NOT NULL,
+    updated     REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state, lease_until);
+CREATE TABLE IF NOT EXISTS stages (
+    job_id  INTEGER NOT NULL,
+    stage   TEXT NOT NULL,
+    result  TEXT,
+    ts      REAL NOT NULL,
+    PRIMARY KEY (job_id, stage)
+);
+"""
+# columns added after the first release (older databases get them on open)
+MIGRATIONS = [
+    ("not_before", "ALTER TABLE jobs ADD COLUMN not_before REAL"),
+]
+
+
+def default_owner(pid=None):
+    """Lease owner id of process `pid` (default: this process)."""
+    return f"{socket.gethostname()}:{pid or os.getpid()}"
+
+
+class LeaseLost(RuntimeError):
+    """The job was reaped and may now belong to someone else."""
+
+
+class Job:
+    def __init__(self, queue, job_id, image, owner, attempts, stages):
+        self.queue = queue
+        self.id = job_id
+        self.image = image
+        self.owner = owner
+        self.attempts = attempts
+        self.stages = stages          # stage -> result (already completed)
+
+    def commit(self, stage, result):
+        """Record a completed stage (first commit wins). Returns the stored result."""
+        stored = self.queue.complete_stage(self.id, self.owner, stage, result)
+        self.stages[stage] = stored
+        return stored
+
+
+class WorkQueue:
+    def __init__(self, path=None, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS,
+                 backoff_seconds=BACKOFF_SECONDS, backoff_max=BACKOFF_MAX):
+        path = Path(path or DB_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max = backoff_max
+
+        self._conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        cols = {r[1] for r in self._conn.execute("PRAGMA table_info(jobs)")}
+        for col, sql in MIGRATIONS:
+            if col not in cols:
+                self._conn.execute(sql)
+        self._db_lock = threading.Lock()
+
+    def _retry_at(self, attempts, now):
+        """Earliest claim time after the `attempts`-th attempt failed."""
+        return now + min(self.backoff_max, self.backoff_seconds * 2 ** max(0, attempts - 1))
+
+    @contextmanager
+    def _tx(self):
+        """BEGIN IMMEDIATE: one writer at a time across processes."""
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # --------------------------------------------------------
+    # Producer
+    # --------------------------------------------------------
+    def enqueue(self, image):
+        """Add `image` as pending. A finished job for the same path is restarted
+        (a new file arrived under that name); an open one is left alone."""
+        image, now = str(image), time.time()
+        with self._tx() as c:
+            row = c.execute("SELECT id, state FROM jobs WHERE image = ?", (image,)).fetchone()
+            if row is None:
+                c.execute("INSERT INTO jobs (image, created, updated) VALUES (?, ?, ?)", (image, now, now))
+                return True
+            if row[1] in ("done", "failed"):
+                c.execute("DELETE FROM stages WHERE job_id = ?", (row[0],))
+                c.execute("UPDATE jobs SET state='pending', owner=NULL, lease_until=NULL, attempts=0, "
+                          "not_before=NULL, error=NULL, updated=? WHERE id=?", (now, row[0]))
+                return True
+            return False
+
+    # --------------------------------------------------------
+    # Consumer
+    # --------------------------------------------------------
+    def claim(self, owner=None):
+        """Lease the oldest runnable job (pending and past its backoff, or claimed
+        with an expired lease)."""
+        owner, now = owner or default_owner(), time.time()
+        with self._tx() as c:
+            row = c.execute(
+                "SELECT id, image, attempts FROM jobs "
+                "WHERE (state='pending' AND (not_before IS NULL OR not_before <= ?)) "
+                "OR (state='claimed' AND lease_until < ? AND attempts < ?) "
+                "ORDER BY id LIMIT 1", (now, now, self.max_attempts)).fetchone()
+            if row is None:
+                return None
+            c.execute("UPDATE jobs SET state='claimed', owner=?, lease_until=?, attempts=attempts+1, updated=? "
+                      "WHERE id=?", (owner, now + self.lease_seconds, now, row[0]))
+            stages = {s: json.loads(r) for s, r in
+                      c.execute("SELECT stage, result FROM stages WHERE job_id = ?", (row[0],))}
+        return Job(self, row[0], row[1], owner, row[2] + 1, stages)
+
+    def _check_owner(self, c, job_id, owner):
+        row = c.execute("SELECT owner, state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or row[0] != owner or row[1] != "claimed":
+            raise LeaseLost(f"job {job_id} is no longer held by {owner}")
+
+    def renew(self, job_id, owner):
+        with self._tx() as c:
+            self._check_owner(c, job_id, owner)
+            c.execute("UPDATE jobs SET lease_until=? WHERE id=?", (time.time() + self.lease_seconds, job_id))
+
+    def complete_stage(self, job_id, owner, stage, result):
+        with self._tx() as c:
+            self._check_owner(c, job_id, owner)
+            c.execute("INSERT OR IGNORE INTO stages (job_id, stage, result, ts) VALUES (?, ?, ?, ?)",
+                      (job_id, stage, json.dumps(result), time.time()))
+            c.execute("UPDATE jobs SET lease_until=?, updated=? WHERE id=?",
+                      (time.time() + self.lease_seconds, time.time(), job_id))
+            stored = c.execute("SELECT result FROM stages WHERE job_id=? AND stage=?", (job_id, stage)).fetchone()
+        return json.loads(stored[0])
+
+    def finish(self, job_id, owner):
+        with self._tx() as c:
+            self._check_owner(c, job_id, owner)
+            c.execute("UPDATE jobs SET state='done', owner=NULL, lease_until=NULL, updated=? WHERE id=?",
+                      (time.time(), job_id))
+
+    def fail(self, job_id, owner, error, retry=True):
+        """Give the job back (or park it as failed after max_attempts / retry=False)."""
+        now = time.time()
+        with self._tx() as c:
+            self._check_owner(c, job_id, owner)
+            attempts = c.execute("SELECT attempts FROM jobs WHERE id=?", (job_id,)).fetchone()[0]
+            state = "failed" if not retry or attempts >= self.max_attempts else "pending"
+            c.execute("UPDATE jobs SET state=?, owner=NULL, lease_until=NULL, not_before=?, error=?, updated=? "
+                      "WHERE id=?", (state, self._retry_at(attempts, now), str(error)[:2000], now, job_id))
+        return state
+
+    @contextmanager
+    def heartbeat(self, job):
+        """Keep `job`'s lease alive while the with-block runs."""
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.lease_seconds / 3):
+                try:
+                    self.renew(job.id, job.owner)
+                except (LeaseLost, sqlite3.Error) as e:
+                    print(f"work_queue heartbeat for job {job.id} failed: {e}")
+
+        t = threading.Thread(target=beat, name=f"lease-{job.id}", daemon=True)
+        t.start()
+        try:
+            yield job
+        finally:
+            stop.set()
+            t.join()
+
+    # --------------------------------------------------------
+    # Supervisor
+    # --------------------------------------------------------
+    def reap(self, owner=None):
+        """Return expired leases (or every lease held by `owner`) to pending.
+        Jobs that already used max_attempts are parked as failed."""
+        now = time.time()
+        cond, args = ("owner = ?", (owner,)) if owner else ("lease_until < ?", (now,))
+        with self._tx() as c:
+            c.execute(f"UPDATE jobs SET state='failed', owner=NULL, lease_until=NULL, "
+                      f"error=COALESCE(error, 'lease expired'), updated=? "
+                      f"WHERE state='claimed' AND attempts >= ? AND {cond}", (now, self.max_attempts, *args))
+            rows = c.execute(f"SELECT id, attempts FROM jobs WHERE state='claimed' AND {cond}", args).fetchall()
+            c.executemany("UPDATE jobs SET state='pending', owner=NULL, lease_until=NULL, not_before=?, updated=? "
+                          "WHERE id=?", [(self._retry_at(attempts, now), now, job_id) for job_id, attempts in rows])
+            return len(rows)
+
+    def counts(self):
+        with self._db_lock:
+            return dict(self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+    def close(self):
+        self._conn.close()
+
+
+_QUEUE = None
+_QUEUE_PID = None
+_QUEUE_LOCK = threading.Lock()
+
+
+def get_queue():
+    """Process-wide queue (re-opened after fork)."""
+    global _QUEUE, _QUEUE_PID
+    with _QUEUE_LOCK:
+        if _QUEUE is None or _QUEUE_PID != os.getpid():
+            _QUEUE = WorkQueue()
+            _QUEUE_PID = os.getpid()
+        return _QUEUE
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser()
+    p.add_argument("--reap", action="store_true", help="release expired leases")
+    args = p.parse_args()
+    q = get_queue()
+    if args.reap:
+        print(f"Released {q.reap()} expired leases")
+    print(json.dumps(q.counts(), indent=2))
@@ -0,0 +1,271 @@
+# benchmarks/pipeline_bench.py
+"""
+End-to-end throughput / latency benchmark for the damage pipeline.
+
+Runs each stage over a fixed image corpus (default: data/incoming) and
+reports p50/p95/p99 latency per stage, images/s for decide_and_act and
+peak RSS. Results are written as JSON so runs can be compared across
+commits.
+
+All writes (RL log, feedback, dataset, audit, ...) are redirected into
+a throw-away work directory; nothing under data/ is touched.
+
+Usage:
+    python -m benchmarks.pipeline_bench --iterations 3 --out bench.json
+    python -m benchmarks.pipeline_bench --compare bench_main.json --out bench.json
+    python -m benchmarks.pipeline_bench --yolo real --llm http   # real backends
+
+For HTTP-level load testing without model weights, start
+benchmarks.stub_llm_server first and run with --llm http.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.stubs import install_yolo_stub, install_llm_stub
+
+IMG_EXTS = {".jpg", ".jpeg", ".png"}
+
+
+# ------------------------------------------------------------
+# Helpers
+# ------------------------------------------------------------
+def percentile(values, q):
+    if not values:
+        return 0.0
+    s = sorted(values)
+    k = (len(s) - 1) * q / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(s) - 1)
+    return s[lo] + (s[hi] - s[lo]) * (k - lo)
+
+
+def summarize(samples_ms):
+    return {
+        "count": len(samples_ms),
+        "mean_ms": round(sum(samples_ms) / len(samples_ms), 3) if samples_ms else 0.0,
+        "p50_ms": round(percentile(samples_ms, 50), 3),
+        "p95_ms": round(percentile(samples_ms, 95), 3),
+        "p99_ms": round(percentile(samples_ms, 99), 3),
+    }
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # KiB on Linux, bytes on macOS
+        return round(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024, 1)
+    except ImportError:
+        try:
+            import psutil
+            return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+        except Exception:
+            return None
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def redirect_data_paths(workdir: Path):
+    """
+    Point every module-level data/ path in app.* / service.* at `workdir`
+    (the modules hard-code absolute project paths).
+    """
+    for name, mod in list(sys.modules.items()):
+        if not (name.startswith("app.") or name.startswith("service.")):
+            continue
+        for attr, val in list(vars(mod).items()):
+            if not isinstance(val, Path):
+                continue
+            s = str(val).replace("\\", "/")
+            if s.startswith("data/") or s == "data":
+                rel = s
+            elif "/data/" in s or s.endswith("/data"):
+                rel = s[s.rindex("/data") + 1:]
+            else:
+                continue
+            new = workdir / rel
+            setattr(mod, attr, new)
+
+    # process-wide singletons that captured the old paths
+    from app import rl_memory, feedback_store, jsonl_writer
+    rl_memory.RL_DIR.mkdir(parents=True, exist_ok=True)
+    rl_memory._index_tail.path = rl_memory.INDEX_LOG
+    rl_memory._reward_tail.path = rl_memory.REWARD_LOG
+    jsonl_writer.on_commit(rl_memory.RL_LOG, rl_memory._on_rl_commit)
+    feedback_store._STORE = feedback_store.FeedbackStore(path=feedback_store.DB_PATH)
+    feedback_store._STORE_PID = os.getpid()
+
+
+ERRORS = {}
+
+
+def timed(samples, fn, *a, default=None, stage=None, **k):
+    """Time one call; a failing stage is counted (ERRORS) rather than aborting the run."""
+    t0 = time.perf_counter()
+    try:
+        out = fn(*a, **k)
+    except Exception as e:
+        ERRORS.setdefault(stage, []).append(repr(e))
+        out = default
+    samples.append((time.perf_counter() - t0) * 1000.0)
+    return out
+
+
+# ------------------------------------------------------------
+# Benchmark
+# ------------------------------------------------------------
+def run(args):
+    corpus = sorted(p for p in Path(args.corpus).iterdir() if p.suffix.lower() in IMG_EXTS)
+    if not corpus:
+        raise SystemExit(f"No images in {args.corpus}")
+
+    workdir = Path(tempfile.mkdtemp(prefix="damage_bench_"))
+    os.chdir(workdir)   # relative data/ paths (agent_service) land here too
+
+    if args.yolo == "stub":
+        install_yolo_stub(args.yolo_latency_ms)
+
+    from app.model import detect_damage
+    from app.agent import agent_decision
+    from app.agent_core import autonomous_agent
+    from app.rl_memory import log_rl_step
+    from app.feedback import save_class_feedback
+    from app.agent_memory import record_confirmation
+    from app import jsonl_writer
+    from service import agent_service
+
+    llm_stub = install_llm_stub(args.llm_latency_ms) if args.llm == "stub" else None
+    redirect_data_paths(workdir)
+    agent_service.INCOMING.mkdir(parents=True, exist_ok=True)
+    agent_service.PROCESSED.mkdir(parents=True, exist_ok=True)
+
+    stages = {k: [] for k in (
+        "detect_damage", "agent_decision", "autonomous_agent",
+        "persist.log_rl_step", "persist.save_class_feedback", "persist.record_confirmation",
+        "decide_and_act",
+    )}
+
+    def one_pass(record):
+        for img in corpus:
+            s = stages if record else {k: [] for k in stages}
+            preds, boxes = timed(s["detect_damage"], detect_damage, str(img), default=({}, []), stage="detect_damage")
+            timed(s["agent_decision"], agent_decision, preds, stage="agent_decision")
+            timed(s["autonomous_agent"], autonomous_agent, str(img), preds, boxes, stage="autonomous_agent")
+            timed(s["persist.log_rl_step"], log_rl_step, {"bench": True}, "ASK_HUMAN", 0.0, {"image": img.name},
+                  stage="persist.log_rl_step")
+            timed(s["persist.save_class_feedback"], save_class_feedback, str(img), "dent", "dent", 0.9,
+                  stage="persist.save_class_feedback")
+            timed(s["persist.record_confirmation"], record_confirmation, "dent", img.name,
+                  stage="persist.record_confirmation")
+
+            # full pipeline on a fresh copy (copy not timed; decide_and_act moves it)
+            work = agent_service.INCOMING / img.name
+            shutil.copyfile(img, work)
+            timed(s["decide_and_act"], agent_service.decide_and_act, work, stage="decide_and_act")
+
+    for _ in range(args.warmup):
+        one_pass(record=False)
+
+    t0 = time.perf_counter()
+    for _ in range(args.iterations):
+        one_pass(record=True)
+    wall = time.perf_counter() - t0
+    jsonl_writer.flush()
+
+    e2e_total_s = sum(stages["decide_and_act"]) / 1000.0
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "corpus": args.corpus,
+            "corpus_size": len(corpus),
+            "iterations": args.iterations,
+            "yolo": args.yolo,
+            "llm": args.llm,
+            "yolo_latency_ms": args.yolo_latency_ms,
+            "llm_latency_ms": args.llm_latency_ms,
+        },
+        "stages": {k: summarize(v) for k, v in stages.items()},
+        "throughput": {
+            "decide_and_act_images_per_s": round(len(stages["decide_and_act"]) / e2e_total_s, 3) if e2e_total_s else None,
+            "wall_s": round(wall, 3),
+        },
+        "peak_rss_mb": peak_rss_mb(),
+        "llm_calls": llm_stub.calls if llm_stub else None,
+        "jsonl_writer": jsonl_writer.stats(),
+        "errors": {k: {"count": len(v), "first": v[0]} for k, v in ERRORS.items()},
+    }
+
+    if not args.keep_workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    else:
+        result["meta"]["workdir"] = str(workdir)
+    return result
+
+
+def print_report(result, baseline=None):
+    print(f"\nCommit {result['meta']['commit'] or '?'}  corpus={result['meta']['corpus_size']} images"
+          f"  x{result['meta']['iterations']}  yolo={result['meta']['yolo']} llm={result['meta']['llm']}")
+    print(f"{'stage':32} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'Δp50':>8}")
+    for name, s in result["stages"].items():
+        delta = ""
+        if baseline and name in baseline.get("stages", {}):
+            b = baseline["stages"][name]["p50_ms"]
+            if b:
+                delta = f"{(s['p50_ms'] - b) / b * 100:+.1f}%"
+        print(f"{name:32} {s['p50_ms']:>10.2f} {s['p95_ms']:>10.2f} {s['p99_ms']:>10.2f} {delta:>8}")
+    print(f"\ndecide_and_act throughput: {result['throughput']['decide_and_act_images_per_s']} images/s")
+    print(f"peak RSS: {result['peak_rss_mb']} MB")
+    for stage, e in result["errors"].items():
+        print(f"⚠️  {stage}: {e['count']} errors (first: {e['first']})")
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--corpus", default=str(ROOT / "data/incoming"))
+    p.add_argument("--iterations", type=int, default=3, help="timed passes over the corpus")
+    p.add_argument("--warmup", type=int, default=1, help="untimed passes first")
+    p.add_argument("--yolo", choices=["stub", "real"], default="stub")
+    p.add_argument("--llm", choices=["stub", "http"], default="stub",
+                   help="http = call the configured llama.cpp endpoints "
+                        "(or benchmarks.stub_llm_server for realistic HTTP latency)")
+    p.add_argument("--yolo-latency-ms", type=float, default=0.0)
+    p.add_argument("--llm-latency-ms", type=float, default=0.0)
+    p.add_argument("--out", help="write machine-readable results here")
+    p.add_argument("--compare", help="previous results JSON to diff against")
+    p.add_argument("--keep-workdir", action="store_true")
+    args = p.parse_args(argv)
+    # run() chdirs into a temp workdir
+    args.corpus = str(Path(args.corpus).resolve())
+    args.out = str(Path(args.out).resolve()) if args.out else None
+    args.compare = str(Path(args.compare).resolve()) if args.compare else None
+
+    result = run(args)
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(result, baseline)
+    if args.out:
+        Path(args.out).write_text(json.dumps(result, indent=2))
+        print(f"Results written to {args.out}")
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+# benchmarks/stub_llm_server.py
+"""
+Stub OpenAI-compatible model server for load testing without weights.
+
+Speaks the subset of the llama.cpp server protocol our clients use
+(app/llm_clients, app/llm_reasoning, ollie-agent):
+
+    POST /v1/chat/completions   (JSON, or SSE when "stream": true)
+    GET  /v1/models
+    GET  /health
+    GET  /stats                 request / error / timeout counters
+
+By default it serves the vision verdicts on :8080 and the thinking
+verdicts on :8081, exactly where the clients look for llama.cpp.
+
+Latency specs (milliseconds):
+    fixed:200            always 200 ms
+    uniform:100:400      uniform between 100 and 400 ms
+    normal:200:50        mean 200, stddev 50 (clamped at 0)
+    lognormal:200:0.5    median 200, sigma 0.5 (long tail)
+
+Usage:
+    python -m benchmarks.stub_llm_server
+    python -m benchmarks.stub_llm_server --latency lognormal:800:0.6 --error-rate 0.02 --timeout-rate 0.01
+    python -m benchmarks.stub_llm_server --verdicts my_verdicts.json --think-port 0   # VL only
+
+--verdicts file: {"vl": [{...}, ...], "think": [{...}, ...]}; each
+answer is one of the dicts, chosen deterministically from the prompt.
+"""
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.stubs import VL_VERDICTS, THINK_VERDICTS, _seed
+
+
+# ------------------------------------------------------------
+# Latency
+# ------------------------------------------------------------
+def parse_latency(spec: str):
+    """Turn a latency spec into a sampler returning seconds."""
+    kind, *params = spec.split(":")
+    p = [float(x) for x in params]
+    if kind == "fixed" and len(p) == 1:
+        return lambda rng: p[0] / 1000.0
+    if kind == "uniform" and len(p) == 2:
+        return lambda rng: rng.uniform(p[0], p[1]) / 1000.0
+    if kind == "normal" and len(p) == 2:
+        return lambda rng: max(0.0, rng.gauss(p[0], p[1])) / 1000.0
+    if kind == "lognormal" and len(p) == 2:
+        return lambda rng: rng.lognormvariate(math.log(max(p[0], 1e-3)), p[1]) / 1000.0
+    raise argparse.ArgumentTypeError(f"Bad latency spec: {spec!r}")
+
+
+# ------------------------------------------------------------
+# Server
+# ------------------------------------------------------------
+class StubConfig:
+    def __init__(self, name, model, verdicts, latency, error_rate=0.0, error_status=500,
+                 timeout_rate=0.0, hang_s=300.0, stream_chunk_ms=10.0, seed=None):
+        self.name = name
+        self.model = model
+        self.verdicts = verdicts
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.timeout_rate = timeout_rate
+        self.hang_s = hang_s
+        self.stream_chunk_ms = stream_chunk_ms
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "timeouts": 0, "streams": 0, "in_flight": 0, "max_in_flight": 0}
+
+    def draw(self):
+        """(latency_s, outcome) for one request; outcome is ok/error/timeout."""
+        with self.rng_lock:
+            latency = self.latency(self.rng)
+            r = self.rng.random()
+        if r < self.timeout_rate:
+            return latency, "timeout"
+        if r < self.timeout_rate + self.error_rate:
+            return latency, "error"
+        return latency, "ok"
+
+    def bump(self, key, n=1):
+        with self.stats_lock:
+            self.stats[key] += n
+            if key == "in_flight":
+                self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    cfg: StubConfig = None
+
+    def log_message(self, fmt, *args):   # keep the console quiet under load
+        pass
+
+    # --------------------------------------------------------
+    def _send_json(self, status, obj):
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [
+                {"id": self.cfg.model, "object": "model", "owned_by": "stub"}]})
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/stats":
+            with self.cfg.stats_lock:
+                self._send_json(200, dict(self.cfg.stats))
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if self.path != "/v1/chat/completions":
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid JSON"}})
+            return
+
+        cfg = self.cfg
+        cfg.bump("requests")
+        cfg.bump("in_flight")
+        try:
+            latency, outcome = cfg.draw()
+            if outcome == "timeout":
+                cfg.bump("timeouts")
+                time.sleep(cfg.hang_s)   # longer than the client's timeout
+                return
+            time.sleep(latency)
+            if outcome == "error":
+                cfg.bump("errors")
+                self._send_json(cfg.error_status, {"error": {"message": "injected error", "type": "server_error"}})
+                return
+
+            key = _seed(json.dumps(body.get("messages", ""), sort_keys=True)[:2000])
+            content = json.dumps(cfg.verdicts[key % len(cfg.verdicts)])
+            if body.get("stream"):
+                cfg.bump("streams")
+                self._stream(content)
+            else:
+                self._send_json(200, self._completion(content))
+            cfg.bump("ok")
+        except (BrokenPipeError, ConnectionResetError):
+            pass   # client gave up (its own timeout)
+        finally:
+            cfg.bump("in_flight", -1)
+
+    # --------------------------------------------------------
+    def _completion(self, content):
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": self.cfg.model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": len(content.split())},
+        }
+
+    def _stream(self, content):
+        """Server-sent events, one chunk per word, like llama.cpp with stream=true."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        cid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        words = content.split(" ")
+        for i, w in enumerate(words):
+            delta = {"content": w if i == len(words) - 1 else w + " "}
+            if i == 0:
+                delta["role"] = "assistant"
+            self._event({"id": cid, "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": self.cfg.model,
+                         "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+            time.sleep(self.cfg.stream_chunk_ms / 1000.0)
+        self._event({"id": cid, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": self.cfg.model,
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _event(self, obj):
+        self.wfile.write(f"data: {json.dumps(obj)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+
+def serve(cfg: StubConfig, host="127.0.0.1", port=8080):
+    """Start a stub server in a daemon thread. Returns the server (shutdown() to stop)."""
+    handler = type(f"StubHandler_{cfg.name}", (StubHandler,), {"cfg": cfg})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, name=f"stub-llm-{cfg.name}", daemon=True).start()
+    return httpd
+
+
+def load_verdicts(path):
+    if not path:
+        return VL_VERDICTS, THINK_VERDICTS
+    data = json.loads(Path(path).read_text())
+    return data.get("vl") or VL_VERDICTS, data.get("think") or THINK_VERDICTS
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--vl-port", type=int, default=8080, help="0 = don't start")
+    p.add_argument("--think-port", type=int, default=8081, help="0 = don't start")
+    p.add_argument("--latency", type=parse_latency, default=parse_latency("fixed:0"), help="e.g. lognormal:800:0.6")
+    p.add_argument("--think-latency", type=parse_latency, help="override --latency for the thinking server")
+    p.add_argument("--error-rate", type=float, default=0.0, help="fraction answered with --error-status")
+    p.add_argument("--error-status", type=int, default=500)
+    p.add_argument("--timeout-rate", type=float, default=0.0, help="fraction that hang for --hang-s")
+    p.add_argument("--hang-s", type=float, default=300.0)
+    p.add_argument("--stream-chunk-ms", type=float, default=10.0, help="delay between SSE chunks")
+    p.add_argument("--verdicts", help="JSON file with canned 'vl' / 'think' answers")
+    p.add_argument("--seed", type=int, default=None)
+    args = p.parse_args(argv)
+
+    vl, think = load_verdicts(args.verdicts)
+    common = dict(error_rate=args.error_rate, error_status=args.error_status, timeout_rate=args.timeout_rate,
+                  hang_s=args.hang_s, stream_chunk_ms=args.stream_chunk_ms, seed=args.seed)
+    servers = []
+    if args.vl_port:
+        servers.append(serve(StubConfig("vl", "Qwen3VL-2B-Instruct", vl, args.latency, **common),
+                             args.host, args.vl_port))
+        print(f"🧪 Stub VL model on http://{args.host}:{args.vl_port}")
+    if args.think_port:
+        servers.append(serve(StubConfig("think", "Qwen3-4B-Thinking", think, args.think_latency or args.latency, **common),
+                             args.host, args.think_port))
+        print(f"🧪 Stub thinking model on http://{args.host}:{args.think_port}")
+    if not servers:
+        raise SystemExit("Nothing to serve (both ports are 0)")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for s in servers:
+            s.shutdown()
+
+
+if __name__ == "__main__":
+    main()
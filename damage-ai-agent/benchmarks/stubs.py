@@ -0,0 +1,131 @@
+# benchmarks/stubs.py
+"""
+Offline stand-ins for the heavy backends, so the pipeline can be
+benchmarked without model weights or llama.cpp servers.
+
+- install_yolo_stub(): registers a fake `ultralytics` module; must run
+  BEFORE app.model is imported.
+- install_llm_stub(): swaps the `requests` module used by the LLM
+  clients for one that answers with canned JSON verdicts.
+
+Both are deterministic per image / prompt and sleep a configurable
+latency to mimic inference time.
+"""
+import hashlib
+import json
+import sys
+import time
+import types
+
+NAMES = {0: "dent", 1: "hole", 2: "rust"}
+
+
+def _seed(key) -> int:
+    return int(hashlib.md5(str(key).encode("utf-8")).hexdigest()[:8], 16)
+
+
+# ------------------------------------------------------------
+# YOLO
+# ------------------------------------------------------------
+class _Box:
+    def __init__(self, cls, conf, xyxy):
+        self.cls = [cls]
+        self.conf = [conf]
+        self.xyxy = [xyxy]
+
+
+class _Result:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class StubYOLO:
+    latency_s = 0.0
+
+    def __init__(self, weights=None, *a, **k):
+        self.weights = weights
+        self.names = dict(NAMES)
+
+    def _predict_one(self, source):
+        seed = _seed(source if isinstance(source, str) else id(source))
+        boxes = []
+        for i in range(seed % 4):
+            s = seed >> (i * 5)
+            x1, y1 = 20 + s % 300, 20 + (s >> 3) % 300
+            boxes.append(_Box(s % 3, 0.3 + (s % 70) / 100.0, [x1, y1, x1 + 80, y1 + 60]))
+        return _Result(boxes)
+
+    def __call__(self, source, *a, **k):
+        batch = source if isinstance(source, list) else [source]
+        time.sleep(self.latency_s * len(batch))
+        return [self._predict_one(s) for s in batch]
+
+
+def install_yolo_stub(latency_ms=0.0):
+    if "app.model" in sys.modules:
+        raise RuntimeError("install_yolo_stub() must run before app.model is imported")
+    StubYOLO.latency_s = latency_ms / 1000.0
+    mod = types.ModuleType("ultralytics")
+    mod.YOLO = StubYOLO
+    sys.modules["ultralytics"] = mod
+
+
+# ------------------------------------------------------------
+# LLMs (OpenAI-compatible /v1/chat/completions)
+# ------------------------------------------------------------
+# numeric confidences (the high/medium/low scores): decide_and_act and
+# explain_simple float() the agent's raw "confidence"
+VL_VERDICTS = [
+    {"damage_present": True, "damage_types": ["dent"], "damage_type": "dent", "confidence": 0.85, "notes": "stub"},
+    {"damage_present": True, "damage_types": ["rust"], "damage_type": "rust", "confidence": 0.5, "notes": "stub"},
+    {"damage_present": False, "damage_types": [], "damage_type": "unknown", "confidence": 0.2, "notes": "stub"},
+]
+THINK_VERDICTS = [
+    {"action": "AUTO_ACCEPT", "reason": "stub"},
+    {"action": "ASK_HUMAN", "reason": "stub"},
+]
+
+
+class _Response:
+    status_code = 200
+
+    def __init__(self, content):
+        self._content = content
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return {"choices": [{"message": {"role": "assistant", "content": self._content}}]}
+
+
+class StubRequests(types.ModuleType):
+    """Drop-in for the subset of `requests` the LLM clients use."""
+
+    def __init__(self, real, latency_ms=0.0):
+        super().__init__("requests")
+        self._real = real
+        self.latency_s = latency_ms / 1000.0
+        self.calls = 0
+        # keep exception classes etc. reachable
+        self.exceptions = real.exceptions
+        self.Timeout = real.Timeout
+        self.RequestException = real.RequestException
+
+    def post(self, url, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency_s)
+        body = kwargs.get("json") or {}
+        key = _seed(json.dumps(body.get("messages", ""), sort_keys=True)[:2000])
+        verdicts = VL_VERDICTS if ":8080" in url else THINK_VERDICTS
+        return _Response(json.dumps(verdicts[key % len(verdicts)]))
+
+
+def install_llm_stub(latency_ms=0.0):
+    """Patch app.llm_clients / app.llm_reasoning. Returns the stub (for call counts)."""
+    import app.llm_clients
+    import app.llm_reasoning
+    stub = StubRequests(app.llm_clients.requests, latency_ms)
+    app.llm_clients.requests = stub
+    app.llm_reasoning.requests = stub
+    return stub
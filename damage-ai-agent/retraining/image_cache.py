@@ -0,0 +1,211 @@
+# retraining/image_cache.py
+# ============================================================
+# PRE-RESIZED TRAINING IMAGE CACHE
+# Every dataset image is decoded once, resized so its long side is
+# IMG_SIZE (uint8 BGR) and stored by content hash:
+#     data/cache/images_640/<ab>/<sha256>.npy
+#     data/cache/images_640.json  manifest: file -> sha256, sha256 -> geometry
+# Only images whose content hash is unknown get decoded, so updates
+# cost O(new samples).
+#
+# export_npy() puts <name>.npy next to each dataset image as a hardlink
+# to the cached array (blob_store.link, copy if the filesystem can't
+# link); `yolo train ... cache=disk` loads those instead of decoding the
+# full-resolution JPEGs (long side == imgsz, so the trainer doesn't
+# resize and normalized YOLO labels stay valid). Copies of an image in
+# the incremental set share the same array.
+#
+# update() prunes images that left the dataset: their manifest entries,
+# cached arrays and sidecars.
+#
+# Usage:
+#     python -m retraining.image_cache
+# ============================================================
+
+import json
+import os
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+PROJECT_ROOT = Path(r"D:/Rushikesh/project/AI Agent/damage-ai-agent")
+sys.path.append(str(PROJECT_ROOT))
+
+from app.blob_store import link, sha256_file
+
+DATASET_DIR = PROJECT_ROOT / "data/dataset"
+CACHE_DIR = PROJECT_ROOT / "data/cache"
+
+IMG_SIZE = 640
+IMG_EXTS = {".jpg", ".jpeg", ".png"}
+
+DATASET_SPLITS = [DATASET_DIR / "images/train", DATASET_DIR / "images/val"]
+
+
+def resize_long_side(img, size=IMG_SIZE):
+    """Resize so the long side == size. Returns (image, geometry)."""
+    h0, w0 = img.shape[:2]
+    r = size / max(h0, w0)
+    w, h = min(size, round(w0 * r)), min(size, round(h0 * r))
+    interp = cv2.INTER_AREA if r < 1 else cv2.INTER_LINEAR
+    return cv2.resize(img, (w, h), interpolation=interp), {"h0": h0, "w0": w0, "h": h, "w": w}
+
+
+def _images(d):
+    return [p for p in Path(d).iterdir() if p.suffix.lower() in IMG_EXTS]
+
+
+class ImageCache:
+    def __init__(self, cache_dir=CACHE_DIR, size=IMG_SIZE):
+        self.size = size
+        self.array_dir = Path(cache_dir) / f"images_{size}"
+        self.manifest_path = Path(cache_dir) / f"images_{size}.json"
+        self.array_dir.mkdir(parents=True, exist_ok=True)
+
+        if self.manifest_path.exists():
+            self.manifest = json.loads(self.manifest_path.read_text())
+        else:
+            self.manifest = {"size": size, "entries": {}, "files": {}}
+        # earlier versions kept a full extra copy in one memmap; entries
+        # without an array are simply re-decoded
+        legacy = Path(cache_dir) / f"images_{size}.u8"
+        if legacy.exists():
+            legacy.unlink()
+            self.manifest.pop("count", None)
+
+    def _save_manifest(self):
+        tmp = self.manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.manifest))
+        os.replace(tmp, self.manifest_path)
+
+    def array_path(self, digest):
+        return self.array_dir / digest[:2] / f"{digest}.npy"
+
+    # --------------------------------------------------------
+    # lookup / insert
+    # --------------------------------------------------------
+    @staticmethod
+    def _file_key(path):
+        # hardlinked views (blob store, incremental set) share inode -> one hash
+        st = os.stat(path)
+        return f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+    def digest_for(self, path):
+        key = self._file_key(path)
+        digest = self.manifest["files"].get(key)
+        if digest is None:
+            digest = sha256_file(path)
+            self.manifest["files"][key] = digest
+        return digest
+
+    def add(self, path):
+        """Cache one image. Returns (digest, decoded?)."""
+        digest = self.digest_for(path)
+        out = self.array_path(digest)
+        if digest in self.manifest["entries"] and out.exists():
+            return digest, False
+
+        img = cv2.imread(str(path))
+        if img is None:
+            raise ValueError(f"Unreadable image: {path}")
+        resized, geom = resize_long_side(img, self.size)
+
+        out.parent.mkdir(parents=True, exist_ok=True)
+        tmp = out.with_name(f".{out.stem}.{os.getpid()}.npy")
+        np.save(tmp, np.ascontiguousarray(resized))
+        os.replace(tmp, out)
+        self.manifest["entries"][digest] = geom
+        return digest, True
+
+    def get(self, digest):
+        """Cached (resized) image."""
+        return np.load(self.array_path(digest))
+
+    # --------------------------------------------------------
+    # dataset integration
+    # --------------------------------------------------------
+    def update(self, dirs=DATASET_SPLITS):
+        """Cache every image in `dirs` and prune what is no longer there.
+        `dirs` must cover the whole dataset (default: train + val)."""
+        decoded = 0
+        live_keys = set()
+        for d in map(Path, dirs):
+            if not d.exists():
+                continue
+            for p in _images(d):
+                try:
+                    digest, new = self.add(p)
+                except ValueError as e:
+                    print(f"⚠️  {e}")
+                    continue
+                decoded += new
+                live_keys.add(self._file_key(p))
+        pruned = self.prune(live_keys, dirs)
+        self._save_manifest()
+        print(f"🗃  Image cache: {len(live_keys)} images, {decoded} newly decoded, {pruned} pruned")
+        return decoded
+
+    def prune(self, live_keys, dirs=DATASET_SPLITS):
+        """Forget files not in `live_keys`, delete arrays no file refers to and
+        sidecars whose image is gone. Returns the number of arrays deleted."""
+        files = self.manifest["files"]
+        for key in set(files) - set(live_keys):
+            del files[key]
+        used = set(files.values())
+        dead = set(self.manifest["entries"]) - used
+        for digest in dead:
+            del self.manifest["entries"][digest]
+            try:
+                self.array_path(digest).unlink()
+            except FileNotFoundError:
+                pass
+        for d in map(Path, dirs):
+            if not d.exists():
+                continue
+            stems = {p.stem for p in _images(d)}
+            for npy in d.glob("*.npy"):
+                if npy.stem not in stems:
+                    npy.unlink()
+        return len(dead)
+
+    def export_npy(self, dirs=DATASET_SPLITS):
+        """Link <image>.npy sidecars (read by `yolo train cache=disk`) to the cached arrays."""
+        written = 0
+        for d in map(Path, dirs):
+            if not d.exists():
+                continue
+            for p in _images(d):
+                digest = self.manifest["files"].get(self._file_key(p))
+                if digest not in self.manifest["entries"]:
+                    continue
+                npy, src = p.with_suffix(".npy"), self.array_path(digest)
+                if _current(npy, src):
+                    continue
+                link(src, npy)
+                written += 1
+        return written
+
+
+def _current(sidecar, src):
+    """`sidecar` already is `src` (hardlink), or a copy made after it."""
+    try:
+        a, b = sidecar.stat(), src.stat()
+    except FileNotFoundError:
+        return False
+    same_inode = (a.st_dev, a.st_ino) == (b.st_dev, b.st_ino)
+    return same_inode or (a.st_size == b.st_size and a.st_mtime_ns >= b.st_mtime_ns)
+
+
+def prepare(dirs=DATASET_SPLITS):
+    """Update the cache and export sidecars for `dirs`. Returns the cache."""
+    cache = ImageCache()
+    cache.update(dirs)
+    n = cache.export_npy(dirs)
+    print(f"🗃  Exported {n} cached arrays")
+    return cache
+
+
+if __name__ == "__main__":
+    prepare()
@@ -1,12 +1,31 @@
 from pathlib import Path
-import shutil
+import sys
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from app.retrain_manager import note_new_samples, place_sample
 
 FB = Path("D:/Rushikesh/project/AI Agent/damage-ai-agent/data/feedback/feedback")
 OUT = Path("D:/Rushikesh/project/AI Agent/damage-ai-agent/data/dataset/images/train")
 OUT.mkdir(parents=True, exist_ok=True)
 
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+# The class folders are the source of truth: they hold hand-curated images
+# that have no feedback-store row, and the store's user_label is the review
+# outcome (auto_accepted, human_corrected, ...), not the damage class.
+total = added = 0
 for cls in ["dent","hole","rust"]:
-    for img in (FB/cls).glob("*.*"):
-        shutil.copy(img, OUT/img.name)
+    copied = new = 0
+    for img in sorted((FB/cls).glob("*.*")):
+        if img.suffix.lower() in IMAGE_EXTS:
+            new += place_sample(img, OUT/img.name)
+            copied += 1
+    print(f"{cls}: {copied} images ({new} new)")
+    total += copied
+    added += new
+
+note_new_samples(added)
 
-print("Dataset ready")
+print(f"Dataset ready ({total} images, {added} new)")
@@ -1,13 +1,18 @@
 # retraining/retrain.py
 from pathlib import Path
+import json
+import random
+import shutil
 import subprocess
 import yaml
 import sys
-from pathlib import Path
 
 PROJECT_ROOT = Path(r"D:/Rushikesh/project/AI Agent/damage-ai-agent")
 sys.path.append(str(PROJECT_ROOT))
 
+from app.blob_store import link
+from app.model_registry import register, promote
+
 
 # --------------------------------------------------
 # ABSOLUTE PROJECT ROOT
@@ -30,6 +35,27 @@ IMG_SIZE = 640
 BATCH = 8          # laptop safe
 DEVICE = "0"       # change to 0 if GPU later
 
+# incremental fine-tuning (default mode)
+INCR_EPOCHS = 5
+INCR_LR0 = 0.001
+REPLAY_RATIO = 2.0     # old samples replayed per new sample
+REPLAY_MAX = 200
+FREEZE_LAYERS = 10     # backbone layers kept frozen (0 = train everything)
+
+PROFILES = {
+    "gpu": {"device": DEVICE, "batch": BATCH, "workers": 8, "imgsz": IMG_SIZE},
+    "cpu": {"device": "cpu", "batch": 4, "workers": 2, "imgsz": IMG_SIZE},
+}
+
+TRAINED_MANIFEST = DATASET_DIR / "trained_manifest.json"   # images already trained on
+INCR_DIR = PROJECT_ROOT / "data/dataset_incremental"
+INCR_YAML = PROJECT_ROOT / "retraining/data_incremental.yaml"
+
+IMG_EXTS = {".jpg", ".jpeg", ".png"}
+
+# decode/resize once into retraining/image_cache.py, train with cache=disk
+USE_IMAGE_CACHE = True
+
 # --------------------------------------------------
 # CREATE data.yaml (ALWAYS SAFE)
 # --------------------------------------------------
@@ -59,39 +85,152 @@ def get_base_model():
     print("🆕 No fine-tuned model found → using yolov8n.pt")
     return "yolov8n.pt"
 
+# --------------------------------------------------
+# HARDWARE PROFILE
+# --------------------------------------------------
+def resolve_profile(name):
+    if name == "auto":
+        try:
+            import torch
+            name = "gpu" if torch.cuda.is_available() else "cpu"
+        except ImportError:
+            name = "cpu"
+    print(f"🖥  Using {name} profile")
+    return PROFILES[name]
+
+# --------------------------------------------------
+# TRAINED-ON MANIFEST
+# --------------------------------------------------
+def train_images():
+    return [p for p in (DATASET_DIR / "images/train").iterdir() if p.suffix.lower() in IMG_EXTS]
+
+def load_trained():
+    if TRAINED_MANIFEST.exists():
+        return set(json.loads(TRAINED_MANIFEST.read_text()))
+    return set()
+
+def save_trained(names):
+    TRAINED_MANIFEST.write_text(json.dumps(sorted(names)))
+
+# --------------------------------------------------
+# INCREMENTAL DATASET (new samples + replay buffer)
+# --------------------------------------------------
+def build_incremental_dataset(new_imgs, old_imgs):
+    """Hardlink new + replayed images/labels into INCR_DIR and write its data yaml."""
+    k = min(len(old_imgs), REPLAY_MAX, int(len(new_imgs) * REPLAY_RATIO))
+    replay = random.sample(old_imgs, k)
+
+    if INCR_DIR.exists():
+        shutil.rmtree(INCR_DIR)
+    img_out = INCR_DIR / "images/train"
+    lbl_out = INCR_DIR / "labels/train"
+    for img in new_imgs + replay:
+        link(img, img_out / img.name)
+        lbl = DATASET_DIR / "labels/train" / f"{img.stem}.txt"
+        if lbl.exists():
+            link(lbl, lbl_out / lbl.name)
+
+    data = {
+        "path": str(INCR_DIR.resolve()),
+        "train": "images/train",
+        "val": str((DATASET_DIR / "images/val").resolve()),
+        "names": {i: name for i, name in enumerate(CLASSES)}
+    }
+    with open(INCR_YAML, "w") as f:
+        yaml.dump(data, f)
+
+    print(f"🧩 Incremental set: {len(new_imgs)} new + {len(replay)} replayed")
+    return INCR_YAML
+
 # --------------------------------------------------
 # TRAIN
 # --------------------------------------------------
-def train():
-    model_path = get_base_model()
+def train(mode="incremental", profile="auto"):
+    hw = resolve_profile(profile)
+    best_model = MODEL_DIR / "best.pt"
+
+    imgs = train_images()
+    trained = load_trained()
+    new_imgs = [p for p in imgs if p.name not in trained]
+    old_imgs = [p for p in imgs if p.name in trained]
+
+    if mode == "incremental" and not best_model.exists():
+        print("ℹ️  No best.pt yet → running full training")
+        mode = "full"
+
+    if mode == "incremental":
+        if not new_imgs:
+            print("✅ No new samples since last training — nothing to do")
+            return False
+        data_yaml = build_incremental_dataset(new_imgs, old_imgs)
+        model_path = str(best_model)
+        extra = [f"epochs={INCR_EPOCHS}", f"lr0={INCR_LR0}", f"freeze={FREEZE_LAYERS}"]
+        split_dirs = [INCR_DIR / "images/train", DATASET_DIR / "images/val"]
+    else:
+        create_data_yaml()
+        data_yaml = DATA_YAML
+        model_path = get_base_model()
+        extra = [f"epochs={EPOCHS}"]
+        split_dirs = [DATASET_DIR / "images/train", DATASET_DIR / "images/val"]
+
+    if USE_IMAGE_CACHE and hw["imgsz"] == IMG_SIZE:
+        from retraining.image_cache import prepare
+        cache = prepare()   # full dataset train + val
+        if mode == "incremental":
+            cache.export_npy(split_dirs)
+        extra.append("cache=disk")
 
     cmd = [
         "yolo", "train",
         f"model={model_path}",
-        f"data={DATA_YAML}",
-        f"epochs={EPOCHS}",
-        f"imgsz={IMG_SIZE}",
-        f"batch={BATCH}",
-        f"device={DEVICE}",
+        f"data={data_yaml}",
+        *extra,
+        f"imgsz={hw['imgsz']}",
+        f"batch={hw['batch']}",
+        f"device={hw['device']}",
+        f"workers={hw['workers']}",
         f"project={PROJECT_ROOT / 'runs/detect'}",
         "name=train",
         "exist_ok=True"
     ]
 
-    print("🚀 Starting YOLO retraining...")
+    print(f"🚀 Starting YOLO retraining ({mode})...")
     subprocess.run(cmd, check=True)
+    save_trained(trained | {p.name for p in imgs})
     print("✅ Training completed")
+    return True
+
+# --------------------------------------------------
+# PUBLISH (model registry → hot reload in app/model.py)
+# --------------------------------------------------
+def publish(auto_promote=True):
+    weights = RUNS_DIR / "best.pt"
+    if not weights.exists():
+        print(f"⚠️  No trained weights at {weights}")
+        return None
+    version = register(weights, note="retrain.py")
+    print(f"📦 Registered model {version}")
+    if auto_promote:
+        promote(version)
+        print(f"🚀 Promoted {version} (running services reload it automatically)")
+    return version
 
 # --------------------------------------------------
 # MAIN
 # --------------------------------------------------
 if __name__ == "__main__":
+    import argparse
     from retraining.split_data import split_train_val
 
+    p = argparse.ArgumentParser()
+    p.add_argument("--mode", choices=["incremental", "full"], default="incremental",
+                   help="incremental: few epochs from best.pt on new samples + replay; full: train on everything")
+    p.add_argument("--profile", choices=["auto", "gpu", "cpu"], default="auto")
+    p.add_argument("--no-promote", action="store_true", help="register the new weights without activating them")
+    args = p.parse_args()
+
     print("🔀 Splitting train / val...")
     split_train_val()
 
-    print("📝 Creating data.yaml...")
-    create_data_yaml()
-
-    train()
+    if train(mode=args.mode, profile=args.profile):
+        publish(auto_promote=not args.no_promote)
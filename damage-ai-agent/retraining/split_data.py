@@ -1,6 +1,11 @@
 # retraining/split_data.py
-import random
-import shutil
+# Deterministic train/val split.
+# Each image's split comes from a stable hash of its file name and is
+# recorded in split_manifest.json, so it never changes once assigned and
+# every run only processes files added since the previous one.
+import hashlib
+import json
+import os
 from pathlib import Path
 
 TRAIN_RATIO = 0.8
@@ -8,23 +13,59 @@ TRAIN_RATIO = 0.8
 BASE = Path("D:/Rushikesh/project/AI Agent/damage-ai-agent/data/dataset")
 IMG_DIR = BASE / "images"
 LBL_DIR = BASE / "labels"
+MANIFEST = BASE / "split_manifest.json"
+
+IMG_EXTS = {".jpg", ".jpeg", ".png"}
+
+
+def assign_split(name: str) -> str:
+    bucket = int(hashlib.sha1(name.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+    return "train" if bucket < TRAIN_RATIO else "val"
+
+
+def load_manifest():
+    if MANIFEST.exists():
+        return json.loads(MANIFEST.read_text())
+    return {}
+
+
+def save_manifest(manifest):
+    tmp = MANIFEST.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=0, sort_keys=True))
+    os.replace(tmp, MANIFEST)
+
 
 def split_train_val():
-    train_imgs = list((IMG_DIR / "train").glob("*.jpg"))
-    random.shuffle(train_imgs)
+    manifest = load_manifest()
+    (IMG_DIR / "val").mkdir(parents=True, exist_ok=True)
+    (LBL_DIR / "val").mkdir(parents=True, exist_ok=True)
 
-    val_count = int(len(train_imgs) * (1 - TRAIN_RATIO))
-    val_imgs = train_imgs[:val_count]
+    new, moved = 0, 0
+    with os.scandir(IMG_DIR / "train") as it:
+        entries = [e for e in it if Path(e.name).suffix.lower() in IMG_EXTS]
 
-    for img_path in val_imgs:
-        label_path = (LBL_DIR / "train" / f"{img_path.stem}.txt")
+    for e in entries:
+        split = manifest.get(e.name)
+        if split is None:
+            split = manifest[e.name] = assign_split(e.name)
+            new += 1
+        if split != "val":
+            continue
 
-        shutil.move(str(img_path), IMG_DIR / "val" / img_path.name)
+        # new val image, or a val image that was re-saved into train
+        img_path = Path(e.path)
+        label_path = LBL_DIR / "train" / f"{img_path.stem}.txt"
 
+        os.replace(img_path, IMG_DIR / "val" / img_path.name)
         if label_path.exists():
-            shutil.move(str(label_path), LBL_DIR / "val" / label_path.name)
+            os.replace(label_path, LBL_DIR / "val" / label_path.name)
+        npy_path = img_path.with_suffix(".npy")   # image_cache sidecar
+        if npy_path.exists():
+            os.replace(npy_path, IMG_DIR / "val" / npy_path.name)
+        moved += 1
 
-    print(f"✅ Split completed: {len(val_imgs)} moved to val")
+    save_manifest(manifest)
+    print(f"✅ Split completed: {new} new images assigned, {moved} moved to val")
 
 if __name__ == "__main__":
     split_train_val()
@@ -1,11 +1,9 @@
 # rl/replay_env.py
-import json
-from pathlib import Path
 import numpy as np
 import gymnasium as gym
 from gymnasium import spaces
 
-RL_LOG = Path(r"D:\Rushikesh\project\AI Agent\damage-ai-agent\data/rl/rl_steps.jsonl")
+from app.rl_memory import read_all
 
 # map actions to discrete indices
 ACTION_MAP = {
@@ -38,30 +36,26 @@ class ReplayStepEnv(gym.Env):
         self._idx = 0
 
     def _load_data(self):
+        # read through rl_memory so delayed human rewards are already joined
         self._steps = []
-        if not RL_LOG.exists():
-            self._steps = []
-            return
-        with open(RL_LOG, "r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    r = json.loads(line)
-                    s = r.get("state", {})
-                    y = s.get("yolo_summary", {})
-                    num_boxes = float(s.get("num_boxes", 0))
-                    obs = [
-                        float(y.get("conf_dent", 0.0)),
-                        float(y.get("conf_hole", 0.0)),
-                        float(y.get("conf_rust", 0.0)),
-                        float(y.get("conf_not_damaged", 0.0)),
-                        float(y.get("mean_conf", 0.0)),
-                        min(1.0, num_boxes / 10.0)  # normalize box count to [0,1] with cap at 10
-                    ]
-                    act = _action_to_index(r.get("action", "OTHER"))
-                    rew = float(r.get("reward", 0.0))
-                    self._steps.append({"obs": np.array(obs, dtype=float), "act": act, "rew": rew})
-                except Exception:
-                    continue
+        for r in read_all():
+            try:
+                s = r.get("state", {})
+                y = s.get("yolo_summary", {})
+                num_boxes = float(s.get("num_boxes", 0))
+                obs = [
+                    float(y.get("conf_dent", 0.0)),
+                    float(y.get("conf_hole", 0.0)),
+                    float(y.get("conf_rust", 0.0)),
+                    float(y.get("conf_not_damaged", 0.0)),
+                    float(y.get("mean_conf", 0.0)),
+                    min(1.0, num_boxes / 10.0)  # normalize box count to [0,1] with cap at 10
+                ]
+                act = _action_to_index(r.get("action", "OTHER"))
+                rew = float(r.get("reward", 0.0))
+                self._steps.append({"obs": np.array(obs, dtype=float), "act": act, "rew": rew})
+            except Exception:
+                continue
 
     def reset(self, *, seed=None, options=None):
         # sequential replay; if index beyond end, loop
@@ -1,4 +1,5 @@
 # service/agent_service.py
+import os
 import time
 from pathlib import Path
 import json
@@ -10,15 +11,23 @@ ROOT = Path(__file__).resolve().parent.parent
 sys.path.append(str(ROOT))
 
 
-from app.model import detect_damage
+from app.model import detect_damage, last_model_version, active_model_version
 from app.agent import agent_decision
 from app.agent_core import autonomous_agent
 from app.auto_accept import auto_accept_save
 from app.feedback import save_class_feedback, log_error
-from app.rl_memory import log_rl_step
+from app.rl_memory import log_rl_step, get_step, RL_LOG
 from app.agent_memory import record_confirmation, record_correction
 from app.failure_predictor import estimate_failure_risk, make_history_summary
 from app.explainer import explain_simple
+from app import metrics
+from app.metrics import stage
+from app.profiling import profiled, install_signal_toggle
+from app.intake import IntakeWatcher
+from app.work_queue import get_queue, LeaseLost
+from app.jsonl_writer import flush as flush_jsonl
+from app.feedback_store import get_store
+from app.phash_index import check_duplicate, remember
 
 INCOMING = Path(r"D:\Rushikesh\project\AI Agent\damage-ai-agent\data\incoming")
 PROCESSED = Path(r"D:\Rushikesh\project\AI Agent\damage-ai-agent\data\processed")
@@ -29,6 +38,9 @@ PROCESSED.mkdir(parents=True, exist_ok=True)
 CLASSES = ["dent", "hole", "rust", "not_damaged"]
 AUTO_ACCEPT_CONF = 0.85  # tune later
 
+# /metrics port for run_loop (0 = off, the default; e.g. 9108)
+METRICS_PORT = int(os.environ.get("DAMAGE_METRICS_PORT", 0))
+
 
 def vectorize_preds(yolo_preds):
     """
@@ -42,15 +54,54 @@ def vectorize_preds(yolo_preds):
     return vec
 
 
-def decide_and_act(image_path: Path):
-    # 1) detect
-    yolo_preds, yolo_boxes = detect_damage(str(image_path))
+def _run_stage(job, name, fn):
+    """Run one stage. With a queued job, a result committed by an earlier
+    (crashed) attempt is reused instead of running `fn` again."""
+    if job is not None and name in job.stages:
+        return job.stages[name]
+    with stage(name):
+        result = fn()
+    if job is not None:
+        result = job.commit(name, result)
+    return result
 
-    # 2) compact decision
-    yolo_decision = agent_decision(yolo_preds)
 
-    # 3) fuller reasoning via agent_core
-    agent_out = autonomous_agent(image_path=str(image_path), yolo_preds=yolo_preds, yolo_boxes=yolo_boxes)
+def decide_and_act(image_path: Path, job=None):
+    with stage("total"), profiled("decide_and_act"):
+        audit = _decide_and_act(Path(image_path), job)
+    metrics.IMAGES_PROCESSED.inc(action=audit["action"])
+    return audit
+
+
+def _decide_and_act(image_path: Path, job=None):
+    # 0) near-duplicate check (pHash index): a copy / re-upload / repeated
+    #    video frame reuses the earlier result and stays out of the dataset
+    dup = _run_stage(job, "dedup", lambda: check_duplicate(image_path, active_model_version()))
+    duplicate = dup["duplicate_of"] is not None
+    reused = dup["result"]
+
+    if reused:
+        det = {"preds": reused["preds"], "boxes": reused["boxes"], "model_version": reused["model_version"]}
+        agent_out = dict(reused["agent_out"])
+    else:
+        # 1) detect
+        def detect():
+            preds, boxes = detect_damage(str(image_path))
+            return {"preds": preds, "boxes": boxes, "model_version": last_model_version()}
+        det = _run_stage(job, "detect", detect)
+
+        # 2) fuller reasoning via agent_core
+        agent_out = _run_stage(job, "agent", lambda: autonomous_agent(
+            image_path=str(image_path), yolo_preds=det["preds"], yolo_boxes=det["boxes"]))
+
+        # (a duplicate whose match came from an older model is indexed too, so
+        #  later copies can reuse this fresh result; it still stays out of the dataset)
+        _run_stage(job, "index", lambda: remember(dup["phash"], image_path, det["model_version"],
+                                                  dict(det, agent_out=agent_out), digest=dup.get("digest")))
+    yolo_preds, yolo_boxes = det["preds"], det["boxes"]
+
+    # 3) compact decision
+    yolo_decision = agent_decision(yolo_preds)
 
     # 4) failure prediction (simple history lookup)
     # If you have historic detection logs for this container/item, load and summarize here.
@@ -75,20 +126,24 @@ def decide_and_act(image_path: Path):
         taken_action = action
 
     # 7) execute action: auto_accept => save to dataset automatically
-    if taken_action == "AUTO_ACCEPT":
-        try:
-            auto_accept_save(
-                image_path=str(image_path),
-                yolo_boxes=yolo_boxes,
-                classes=CLASSES,
-                W=agent_out.get("image_w", None) or 0,
-                H=agent_out.get("image_h", None) or 0,
-                dataset_img=Path("data/dataset/images/train"),
-                dataset_lbl=Path("data/dataset/labels/train"),
-            )
-        except Exception as e:
-            # if save fails, log error but continue
-            log_error(str(image_path), yolo_decision.get("label", "unknown"), f"auto_accept_save_error: {e}")
+    if taken_action == "AUTO_ACCEPT" and not duplicate:
+        def accept():
+            try:
+                auto_accept_save(
+                    image_path=str(image_path),
+                    yolo_boxes=yolo_boxes,
+                    classes=CLASSES,
+                    W=agent_out.get("image_w", None) or 0,
+                    H=agent_out.get("image_h", None) or 0,
+                    dataset_img=Path("data/dataset/images/train"),
+                    dataset_lbl=Path("data/dataset/labels/train"),
+                )
+                return True
+            except Exception as e:
+                # if save fails, log error but continue
+                log_error(str(image_path), yolo_decision.get("label", "unknown"), f"auto_accept_save_error: {e}")
+                return False
+        _run_stage(job, "auto_accept", accept)
 
     # 8) RL reward heuristic (smarter)
     # Default reward: small negative for asking human (inefficient).
@@ -102,57 +157,124 @@ def decide_and_act(image_path: Path):
         reward -= 2.0
 
     # 9) log RL step
-    log_rl_step(
-        state={"yolo_summary": vectorize_preds(yolo_preds), "num_boxes": len(yolo_boxes)},
-        action=taken_action,
-        reward=reward,
-        info={"image": image_path.name, "explanation": explanation, "failure_risk": failure_risk}
-    )
-
-    # 10) create a human-readable audit record (also used as dataset metadata)
-    audit = {
-        "image": image_path.name,
-        "action": taken_action,
-        "yolo_decision": yolo_decision,
-        "agent_out": agent_out,
-        "failure_risk": failure_risk,
-        "explanation": explanation,
-        "time": time.time()
-    }
-
-    # 11) save feedback logs and move file to processed
-    try:
-        save_class_feedback(str(image_path), user_label=taken_action, model_label=yolo_decision.get("label", "unknown"), confidence=conf)
-    except Exception:
-        pass
+    def rl_log():
+        info = {"image": image_path.name, "explanation": explanation, "failure_risk": failure_risk}
+        if job is not None:
+            # a crash between the append and the stage commit leaves the step
+            # logged but the stage open; the retry finds it by its key
+            info["step_key"] = f"{job.id}:rl_log"
+            if job.attempts > 1:
+                logged = get_step(image_path.name)
+                if logged and logged.get("info", {}).get("step_key") == info["step_key"]:
+                    return True
+        log_rl_step(
+            state={"yolo_summary": vectorize_preds(yolo_preds), "num_boxes": len(yolo_boxes)},
+            action=taken_action,
+            reward=reward,
+            info=info
+        )
+        if job is not None:
+            flush_jsonl(RL_LOG)   # on disk before the stage is marked complete
+        return True
+    if not duplicate:   # same state as the original's step; don't count it twice
+        _run_stage(job, "rl_log", rl_log)
+
+    # 10) save feedback logs
+    def feedback():
+        try:
+            save_class_feedback(str(image_path), user_label=taken_action, model_label=yolo_decision.get("label", "unknown"), confidence=conf)
+            if job is not None:
+                get_store().flush()
+        except Exception:
+            pass
+        return True
+    if not duplicate:   # feedback/<label> views feed training too
+        _run_stage(job, "feedback", feedback)
+
+    # 11) create a human-readable audit record (also used as dataset metadata) and save it
+    def write_audit():
+        audit = {
+            "image": image_path.name,
+            "action": taken_action,
+            "yolo_decision": yolo_decision,
+            "agent_out": agent_out,
+            "failure_risk": failure_risk,
+            "explanation": explanation,
+            "model_version": det.get("model_version"),
+            "duplicate_of": dup["duplicate_of"],
+            "phash_distance": dup["distance"],
+            "time": time.time()
+        }
+        audit_dir = Path("data/audit")
+        audit_dir.mkdir(parents=True, exist_ok=True)
+        with open(audit_dir / f"{image_path.stem}.json", "w", encoding="utf-8") as f:
+            json.dump(audit, f, indent=2)
+        return audit
+    audit = _run_stage(job, "audit", write_audit)
+
+    # 12) move processed file
+    def move():
+        dest = PROCESSED / image_path.name
+        if image_path.exists():   # a resumed job may have moved it already
+            shutil.move(str(image_path), str(dest))
+        return str(dest)
+    _run_stage(job, "move", move)
 
-    # save audit json
-    audit_dir = Path("data/audit")
-    audit_dir.mkdir(parents=True, exist_ok=True)
-    with open(audit_dir / f"{image_path.stem}.json", "w", encoding="utf-8") as f:
-        json.dump(audit, f, indent=2)
+    return audit
 
-    # move processed file
-    dest = PROCESSED / image_path.name
-    shutil.move(str(image_path), str(dest))
 
+def process_job(job):
+    """Run decide_and_act for a claimed queue job and settle its state."""
+    queue = job.queue
+    path = Path(job.image)
+    if not path.exists() and not job.stages:
+        queue.fail(job.id, job.owner, "image missing", retry=False)
+        return None
+    try:
+        with queue.heartbeat(job):
+            audit = decide_and_act(path, job=job)
+    except LeaseLost:
+        raise
+    except Exception as exc:
+        state = queue.fail(job.id, job.owner, exc)
+        print(f"Error processing {path} (attempt {job.attempts}, now {state}): {exc}")
+        return None
+    queue.finish(job.id, job.owner)
     return audit
 
 
-def run_loop(poll_interval=1.0):
+def run_loop(poll_interval=1.0, metrics_port=METRICS_PORT):
+    if metrics_port:
+        metrics.INCOMING_BACKLOG.set_function(lambda: metrics.count_files(INCOMING))
+        metrics.start_http_server(metrics_port)
+    install_signal_toggle()
     print("Agent service started — monitoring data/incoming/")
+    queue = get_queue()
+    queue.reap()   # leases left behind by a crashed run
+    # poll_interval only matters for the polling fallback
+    watcher = IntakeWatcher(INCOMING, poll_interval=poll_interval).start()
+    last_reap = time.monotonic()
     while True:
-        files = sorted(INCOMING.glob("*.jpg")) + sorted(INCOMING.glob("*.png"))
-        if not files:
-            time.sleep(poll_interval)
-            continue
-        for f in files:
+        f = watcher.get(timeout=poll_interval)
+        while f is not None:
+            queue.enqueue(f)
+            f = watcher.get(timeout=0)
+
+        job = queue.claim()
+        while job is not None:
             try:
-                audit = decide_and_act(f)
-                print(f"Processed {f.name} -> action: {audit['action']}; risk: {audit['failure_risk']:.2f}")
-            except Exception as exc:
-                print(f"Error processing {f}: {exc}")
-        time.sleep(poll_interval)
+                audit = process_job(job)
+                if audit:
+                    print(f"Processed {Path(job.image).name} -> action: {audit['action']}; risk: {audit['failure_risk']:.2f}")
+            except LeaseLost as exc:
+                print(f"Lost lease on {job.image}: {exc}")
+            job = queue.claim()
+
+        if time.monotonic() - last_reap > queue.lease_seconds:
+            queue.reap()
+            last_reap = time.monotonic()
+
+
 MODE = "SHADOW"  # SHADOW | AUTO
 
 def act_on_decision(agent_output, image_path):
@@ -0,0 +1,205 @@
+# service/worker_pool.py
+# ============================================================
+# SUPERVISED MULTI-PROCESS WORKER POOL FOR agent_service
+# The supervisor owns the intake watcher and enqueues into the durable
+# work queue (app/work_queue.py); N spawned workers each load their own
+# YOLO model (with a bounded torch thread count so workers don't
+# oversubscribe the CPU) and claim jobs from it. A multiprocessing
+# queue is only used as a doorbell, plus an event channel back.
+#
+#   - crashed workers are restarted and their leases released at once;
+#     the job resumes from its last completed stage (a poison image is
+#     parked as failed after WORK_QUEUE_MAX_ATTEMPTS)
+#   - the supervisor reaps expired leases (hung / killed workers)
+#   - Ctrl-C / SIGTERM: stop intake, let workers finish the current
+#     image, then exit
+#
+# Usage:
+#     python -m service.worker_pool --workers 4 --threads 2
+# ============================================================
+
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import signal
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+from app.intake import IntakeWatcher
+from app.work_queue import get_queue, default_owner
+
+# same directory as agent_service.INCOMING (importing that here would load a model)
+INCOMING = Path(r"D:\Rushikesh\project\AI Agent\damage-ai-agent\data\incoming")
+
+WORKERS = int(os.environ.get("DAMAGE_WORKERS", os.cpu_count() or 1))
+SHUTDOWN_GRACE = 60.0   # seconds to finish in-flight images
+
+
+# ------------------------------------------------------------
+# Worker process
+# ------------------------------------------------------------
+def _worker_main(wid, threads, doorbell, stop, events, metrics_port):
+    # before torch is imported (app.model -> ultralytics -> torch)
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)   # the supervisor handles Ctrl-C
+
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    from app import metrics
+    from app.profiling import install_signal_toggle
+    from app.work_queue import LeaseLost
+    from service.agent_service import process_job
+
+    if metrics_port:
+        metrics.start_http_server(metrics_port)
+    install_signal_toggle()
+    events.put(("ready", wid, None, None))
+
+    wq = get_queue()
+    owner = default_owner()
+    while not stop.is_set():
+        job = wq.claim(owner)
+        if job is None:
+            try:
+                doorbell.get(timeout=1.0)
+            except queue.Empty:
+                pass
+            continue
+        try:
+            audit = process_job(job)
+            if audit:
+                events.put(("done", wid, job.image, audit["action"]))
+            else:
+                events.put(("error", wid, job.image, "see worker log"))
+        except LeaseLost as exc:
+            events.put(("error", wid, job.image, str(exc)))
+
+    from app import jsonl_writer
+    jsonl_writer.flush()
+
+
+# ------------------------------------------------------------
+# Supervisor
+# ------------------------------------------------------------
+class WorkerPool:
+    def __init__(self, workers=WORKERS, threads=None, metrics_port=0):
+        self.n = max(1, workers)
+        self.threads = threads or max(1, (os.cpu_count() or 1) // self.n)
+        self.metrics_port = metrics_port
+        self.ctx = mp.get_context("spawn")   # no forked CUDA / torch / thread state
+        self.doorbell = self.ctx.Queue()
+        self.events = self.ctx.Queue()
+        self.stop_event = self.ctx.Event()
+        self.queue = get_queue()
+        self.procs = {}
+        self.stats = {"done": 0, "errors": 0, "restarts": 0}
+        self._stopping = False
+
+    def _spawn(self, wid):
+        port = self.metrics_port + 1 + wid if self.metrics_port else 0
+        p = self.ctx.Process(target=_worker_main, name=f"damage-worker-{wid}",
+                             args=(wid, self.threads, self.doorbell, self.stop_event, self.events, port), daemon=False)
+        p.start()
+        self.procs[wid] = p
+
+    def start(self):
+        for wid in range(self.n):
+            self._spawn(wid)
+        print(f"👷 Worker pool: {self.n} workers x {self.threads} torch threads")
+        return self
+
+    def submit(self, path):
+        if self.queue.enqueue(path):
+            self.doorbell.put("job")
+
+    def _drain_events(self, timeout):
+        try:
+            kind, wid, item, detail = self.events.get(timeout=timeout)
+        except queue.Empty:
+            return
+        if kind in ("done", "error"):
+            if kind == "done":
+                self.stats["done"] += 1
+                print(f"[w{wid}] Processed {Path(item).name} -> action: {detail}")
+            else:
+                self.stats["errors"] += 1
+                print(f"[w{wid}] Error processing {item}: {detail}")
+
+    def _check_workers(self):
+        for wid, p in list(self.procs.items()):
+            if p.is_alive() or self._stopping:
+                continue
+            print(f"⚠️  Worker {wid} died (exit {p.exitcode}); restarting")
+            self.stats["restarts"] += 1
+            # its job goes straight back to pending (resumes from the last stage)
+            if self.queue.reap(owner=default_owner(p.pid)):
+                self.doorbell.put("job")
+            self._spawn(wid)
+
+    def supervise(self, watcher, poll=0.5):
+        """Feed the queue from `watcher` until stop() (signal) is called."""
+        last_reap = 0.0
+        while not self._stopping:
+            if time.monotonic() - last_reap > self.queue.lease_seconds:
+                if self.queue.reap():
+                    self.doorbell.put("job")
+                last_reap = time.monotonic()
+            path = watcher.get(timeout=0)
+            while path is not None:
+                self.submit(path)
+                path = watcher.get(timeout=0)
+            self._drain_events(timeout=poll)
+            self._check_workers()
+
+    def stop(self, *_):
+        self._stopping = True
+
+    def shutdown(self):
+        # workers finish the job in hand; the rest stays pending in the queue
+        self.stop_event.set()
+        for _ in self.procs:
+            self.doorbell.put(None)
+        deadline = time.monotonic() + SHUTDOWN_GRACE
+        for wid, p in self.procs.items():
+            p.join(timeout=max(0.0, deadline - time.monotonic()))
+            if p.is_alive():
+                print(f"⚠️  Worker {wid} did not stop in time; terminating")
+                p.terminate()
+                p.join()
+        while not self.events.empty():
+            self._drain_events(timeout=0.1)
+        print(f"Worker pool stopped: {self.stats}")
+
+
+def run_pool(workers=WORKERS, threads=None, poll_interval=1.0, metrics_port=0):
+    pool = WorkerPool(workers, threads, metrics_port).start()
+    signal.signal(signal.SIGINT, pool.stop)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, pool.stop)
+
+    watcher = IntakeWatcher(INCOMING, poll_interval=poll_interval).start()
+    try:
+        pool.supervise(watcher)
+    finally:
+        watcher.stop()
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--workers", type=int, default=WORKERS)
+    p.add_argument("--threads", type=int, default=None, help="torch threads per worker (default: cores / workers)")
+    p.add_argument("--poll-interval", type=float, default=1.0)
+    p.add_argument("--metrics-port", type=int, default=0, help="worker i serves /metrics on port + 1 + i")
+    args = p.parse_args()
+    run_pool(args.workers, args.threads, args.poll_interval, args.metrics_port)
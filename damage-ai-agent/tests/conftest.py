@@ -0,0 +1,19 @@
+# tests/conftest.py
+# ============================================================
+# Shared test setup.
+# Modules hard-code the Windows project paths (D:\...\data); on other
+# systems those resolve relative to the cwd and some are created at
+# import time, so the suite runs from a scratch directory and every
+# test points the module under test at its own tmp_path.
+# ============================================================
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+os.environ.setdefault("JSONL_FLUSH_INTERVAL", "0")   # write-through: no background flush timing
+os.chdir(tempfile.mkdtemp(prefix="damage-tests-"))
@@ -0,0 +1,59 @@
+# tests/test_analytics.py
+import pytest
+
+from app import analytics
+from app.feedback_store import FeedbackStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Feedback store and stats file in tmp_path; analytics reads this store."""
+    monkeypatch.setattr(analytics, "STATS_FILE", tmp_path / "feedback_stats.json")
+    s = FeedbackStore(tmp_path / "feedback.db", flush_interval=60)
+    monkeypatch.setattr(analytics, "get_store", lambda: s)
+    yield s
+    s.close()
+
+
+def save(store, image, user_label, model_label="dent"):
+    store.add({"image": image, "user_label": user_label, "model_label": model_label})
+
+
+def counters(agg):
+    return {k: agg[k] for k in ("total", "correct", "classes", "last_id")}
+
+
+def test_relabel_replaces_earlier_record(store):
+    save(store, "a.jpg", "dent")
+    save(store, "a.jpg", "rust")                 # same batch
+    save(store, "b.jpg", "dent")
+    store.flush()
+    save(store, "b.jpg", "hole")                 # later batch
+    store.flush()
+    agg = analytics._load()
+    assert counters(agg) == {"total": 2, "correct": 0, "classes": {"rust": 1, "hole": 1}, "last_id": 4}
+    assert counters(agg) == counters(analytics.rebuild())
+
+
+def test_rows_written_without_the_hook_are_counted(store):
+    # e.g. imported by the JSON migration, before any stats file existed
+    with store._conn:
+        store._conn.execute("INSERT INTO feedback (image, user_label, model_label, ts) VALUES ('a.jpg', 'dent', 'dent', 1)")
+    save(store, "a.jpg", "rust")                 # replaces a row that was never counted
+    save(store, "b.jpg", "dent")
+    store.flush()
+    assert counters(analytics._load()) == {"total": 2, "correct": 1, "classes": {"rust": 1, "dent": 1}, "last_id": 3}
+
+    with store._conn:
+        store._conn.execute("INSERT INTO feedback (image, user_label, model_label, ts) VALUES ('c.jpg', 'hole', 'dent', 1)")
+    save(store, "d.jpg", "dent")
+    store.flush()
+    assert analytics._load()["total"] == 4
+
+
+def test_stats_rebuilds_missing_file(store):
+    save(store, "a.jpg", "dent")
+    store.flush()
+    analytics.STATS_FILE.unlink()
+    assert analytics.stats()["total"] == 1
+    assert analytics.STATS_FILE.exists()
@@ -0,0 +1,25 @@
+# tests/test_jsonl_writer.py
+import json
+
+import pytest
+
+from app.jsonl_writer import GroupCommitWriter
+
+
+def test_failing_path_does_not_drop_other_paths(tmp_path):
+    bad = tmp_path / "bad.jsonl"
+    bad.mkdir()                                  # appending to a directory fails
+    ok = tmp_path / "ok.jsonl"
+    w = GroupCommitWriter(flush_interval=0)
+    w._buf = {str(bad): [({"a": 1}, b'{"a": 1}\n')], str(ok): [({"b": 2}, b'{"b": 2}\n')]}
+    w._depth = 2
+
+    with pytest.raises(OSError):
+        w.flush()
+    assert [json.loads(line) for line in ok.read_text().splitlines()] == [{"b": 2}]
+    assert w.stats()["queue_depth"] == 1         # the failed record stays buffered
+
+    bad.rmdir()
+    w.flush()
+    assert json.loads(bad.read_text()) == {"a": 1}
+    assert w.stats()["queue_depth"] == 0
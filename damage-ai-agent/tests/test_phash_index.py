@@ -0,0 +1,93 @@
+# tests/test_phash_index.py
+import random
+
+import cv2
+import numpy as np
+import pytest
+
+from app import phash_index
+from app.phash_index import PHashIndex, hamming
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    idx = PHashIndex(path=tmp_path / "phash.db")
+    monkeypatch.setattr(phash_index, "get_index", lambda: idx)
+    yield idx
+    idx.close()
+
+
+def flip(h, bits, rng):
+    for b in rng.sample(range(64), bits):
+        h ^= 1 << b
+    return h
+
+
+def brute_force(entries, h, max_distance):
+    best = None
+    for row_id, stored in entries:
+        d = hamming(h, stored)
+        if d <= max_distance and (best is None or (d, row_id) < best):
+            best = (d, row_id)
+    return best
+
+
+def test_lookup_matches_brute_force(index):
+    rng = random.Random(7)
+    entries = []
+    for i in range(300):
+        # clusters of near-identical hashes plus unrelated ones
+        h = flip(entries[-1][1], rng.randint(1, 8), rng) if entries and i % 3 else rng.getrandbits(64)
+        entries.append((index.add(h, f"img{i}.jpg", result={"i": i}), h))
+
+    for _ in range(200):
+        h = flip(rng.choice(entries)[1], rng.randint(0, 10), rng) if rng.random() < 0.8 else rng.getrandbits(64)
+        expected = brute_force(entries, h, index.max_distance)
+        got = index.lookup(h)
+        if expected is None:
+            assert got is None
+        else:
+            assert (got["distance"], got["id"]) == expected
+
+
+def write_image(path, seed):
+    img = np.random.default_rng(seed).integers(0, 255, (64, 64, 3), dtype=np.uint8)
+    cv2.imwrite(str(path), cv2.resize(img, (256, 256), interpolation=cv2.INTER_NEAREST))
+    return path
+
+
+def test_same_file_rerun_is_not_its_own_duplicate(index, tmp_path):
+    img = write_image(tmp_path / "a.png", 1)
+    dup = phash_index.check_duplicate(img, "v1")
+    phash_index.remember(dup["phash"], img, "v1", {"ok": True}, digest=dup["digest"])
+    assert phash_index.check_duplicate(img, "v1")["duplicate_of"] is None
+
+
+def test_copy_is_a_duplicate_and_reuses_the_result(index, tmp_path):
+    img = write_image(tmp_path / "a.png", 1)
+    dup = phash_index.check_duplicate(img, "v1")
+    phash_index.remember(dup["phash"], img, "v1", {"ok": True}, digest=dup["digest"])
+    copy = tmp_path / "a - Copy.png"
+    copy.write_bytes(img.read_bytes())
+    again = phash_index.check_duplicate(copy, "v1")
+    assert again["duplicate_of"] == str(img)
+    assert again["result"] == {"ok": True}
+
+
+def test_same_name_in_another_folder_is_matched_and_kept(index, tmp_path):
+    (tmp_path / "x").mkdir()
+    (tmp_path / "y").mkdir()
+    first = write_image(tmp_path / "x" / "cam.png", 1)
+    dup = phash_index.check_duplicate(first, "v1")
+    phash_index.remember(dup["phash"], first, "v1", {"ok": True}, digest=dup["digest"])
+
+    # same name, same picture re-encoded: still a duplicate of the first
+    second = tmp_path / "y" / "cam.png"
+    cv2.imwrite(str(second), cv2.imread(str(first)), [cv2.IMWRITE_PNG_COMPRESSION, 0])
+    assert second.read_bytes() != first.read_bytes()
+    dup2 = phash_index.check_duplicate(second, "v1")
+    assert dup2["duplicate_of"] == str(first)
+
+    # indexing it doesn't drop the original's row
+    phash_index.remember(dup2["phash"], second, "v1", {"ok": True}, digest=dup2["digest"])
+    assert index.count() == 2
@@ -0,0 +1,120 @@
+# tests/test_rl_memory.py
+import json
+
+import pytest
+
+from app import jsonl_writer, rl_memory
+
+
+@pytest.fixture
+def rl(tmp_path, monkeypatch):
+    """rl_memory writing to tmp_path, with fresh in-process state."""
+    monkeypatch.setattr(rl_memory, "RL_DIR", tmp_path)
+    monkeypatch.setattr(rl_memory, "RL_LOG", tmp_path / "rl_steps.jsonl")
+    monkeypatch.setattr(rl_memory, "INDEX_LOG", tmp_path / "rl_index.jsonl")
+    monkeypatch.setattr(rl_memory, "REWARD_LOG", tmp_path / "rl_rewards.jsonl")
+    monkeypatch.setattr(rl_memory, "INDEX_META", tmp_path / "rl_index.meta.json")
+    reset(rl_memory)
+    jsonl_writer.on_commit(rl_memory.RL_LOG, rl_memory._on_rl_commit)
+    return rl_memory
+
+
+def reset(mod):
+    """Forget everything held in memory, as a newly started process would."""
+    mod._index.clear()
+    mod._rewards.clear()
+    mod._index_tail = mod._JsonlTail(mod.INDEX_LOG)
+    mod._reward_tail = mod._JsonlTail(mod.REWARD_LOG)
+    mod._index_checked = False
+
+
+def step(rl, image, action="ASK_HUMAN", reward=0.0):
+    return rl.log_rl_step(state={"n": 1}, action=action, reward=reward, info={"image": image})
+
+
+def test_get_step_returns_latest_step_for_image(rl):
+    step(rl, "a.jpg", action="REJECT")
+    step(rl, "b.jpg")
+    step(rl, "D:\\data\\incoming\\a.jpg", action="AUTO_ACCEPT")
+    assert rl.get_step("a.jpg")["action"] == "AUTO_ACCEPT"
+    assert rl.get_step("missing.jpg") is None
+
+
+def test_reward_joins_only_the_step_it_was_attached_to(rl):
+    step(rl, "image.jpg", action="REJECT")
+    assert rl.attach_reward("image.jpg", -2.0)["reward"] == -2.0
+    step(rl, "image.jpg", action="AUTO_ACCEPT")     # same name uploaded again
+
+    first, second = rl.read_all()
+    assert first["reward"] == -2.0
+    assert second["reward"] == 0.0
+    assert rl.get_step("image.jpg")["reward"] == 0.0
+
+    rl.attach_reward("image.jpg", 1.0)
+    assert [r["reward"] for r in rl.read_all()] == [-2.0, 1.0]
+    assert [r["reward"] for r in rl.read_all(joined=False)] == [0.0, 0.0]
+    assert [r["reward"] for r in rl.read_all(limit=1)] == [1.0]
+
+
+def test_attach_reward_without_a_step_returns_none(rl):
+    assert rl.attach_reward("never-seen.jpg", 1.0) is None
+    assert not rl.REWARD_LOG.exists()
+
+
+def test_rewards_are_visible_to_a_new_process(rl):
+    step(rl, "a.jpg")
+    rl.attach_reward("a.jpg", 1.0)
+    reset(rl)
+    assert rl.get_step("a.jpg")["reward"] == 1.0
+
+
+def test_legacy_steps_are_indexed_after_the_hook_created_the_index(rl):
+    # steps written before the index existed ...
+    with open(rl.RL_LOG, "w") as f:
+        for name in ("old1.jpg", "old2.jpg"):
+            f.write(json.dumps({"state": {}, "action": "REJECT", "reward": 0.0, "info": {"image": name}}) + "\n")
+    # ... then a writer-only process (agent_service) logs a step, creating rl_index.jsonl
+    step(rl, "new.jpg")
+    assert rl.INDEX_LOG.exists()
+
+    reset(rl)
+    assert rl.get_step("old1.jpg")["action"] == "REJECT"
+    assert rl.get_step("old2.jpg") is not None
+    assert rl.get_step("new.jpg") is not None
+    assert json.loads(rl.INDEX_META.read_text())["indexed_to"] == rl.RL_LOG.stat().st_size
+
+
+def test_rebuild_resumes_from_marker(rl):
+    step(rl, "a.jpg")
+    rl.get_step("a.jpg")                 # marker now at end of log
+    marker = json.loads(rl.INDEX_META.read_text())["indexed_to"]
+    with open(rl.RL_LOG, "a") as f:      # appended without the hook (older process)
+        f.write(json.dumps({"state": {}, "action": "REJECT", "reward": 0.0, "info": {"image": "b.jpg"}}) + "\n")
+    reset(rl)
+    index_lines = len(rl.INDEX_LOG.read_text().splitlines())
+    assert rl.get_step("b.jpg")["action"] == "REJECT"
+    # only the new tail was scanned
+    assert len(rl.INDEX_LOG.read_text().splitlines()) == index_lines + 1
+    assert json.loads(rl.INDEX_META.read_text())["indexed_to"] > marker
+
+
+def test_legacy_image_keyed_reward_applies_to_latest_step(rl):
+    step(rl, "a.jpg", action="REJECT")
+    step(rl, "a.jpg", action="AUTO_ACCEPT")
+    with open(rl.REWARD_LOG, "w") as f:
+        f.write(json.dumps({"image": "a.jpg", "reward": 1.0, "info": {}}) + "\n")
+    reset(rl)
+    assert [r["reward"] for r in rl.read_all()] == [0.0, 1.0]
+
+
+def test_corrupt_lines_are_skipped(rl):
+    step(rl, "a.jpg", action="REJECT")
+    rl.attach_reward("a.jpg", 1.0)
+    for path in (rl.RL_LOG, rl.INDEX_LOG, rl.REWARD_LOG):
+        with open(path, "a") as f:
+            f.write('{"torn": \n')
+    step(rl, "b.jpg")
+    reset(rl)
+    assert [r["action"] for r in rl.read_all()] == ["REJECT", "ASK_HUMAN"]
+    assert rl.read_all()[0]["reward"] == 1.0
+    assert rl.get_step("b.jpg") is not None
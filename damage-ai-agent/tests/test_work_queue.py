@@ -0,0 +1,108 @@
+# tests/test_work_queue.py
+import types
+
+import pytest
+
+from app import work_queue
+from app.work_queue import LeaseLost, WorkQueue
+
+
+class Clock:
+    def __init__(self, t=1000.0):
+        self.t = t
+
+    def time(self):
+        return self.t
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(work_queue, "time", types.SimpleNamespace(time=c.time))
+    return c
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    q = WorkQueue(tmp_path / "queue.db", lease_seconds=30, max_attempts=3, backoff_seconds=5, backoff_max=60)
+    yield q
+    q.close()
+
+
+def test_claim_leases_oldest_pending_job_once(queue):
+    assert queue.enqueue("a.jpg") and queue.enqueue("b.jpg")
+    assert not queue.enqueue("a.jpg")            # already open
+    first, second = queue.claim("w1"), queue.claim("w2")
+    assert (first.image, second.image) == ("a.jpg", "b.jpg")
+    assert queue.claim("w3") is None
+    assert queue.counts() == {"claimed": 2}
+
+
+def test_expired_lease_is_reclaimed_with_committed_stages(queue, clock):
+    queue.enqueue("a.jpg")
+    job = queue.claim("w1")
+    assert job.commit("detect", {"preds": {"dent": 0.9}}) == {"preds": {"dent": 0.9}}
+
+    clock.t += 31                                # w1 died; its lease runs out
+    again = queue.claim("w2")
+    assert again.id == job.id and again.attempts == 2
+    assert again.stages == {"detect": {"preds": {"dent": 0.9}}}
+
+    # the first commit of a stage wins; the old owner can't write any more
+    assert again.commit("detect", {"preds": {}}) == {"preds": {"dent": 0.9}}
+    with pytest.raises(LeaseLost):
+        job.commit("agent", {})
+    queue.finish(again.id, "w2")
+    assert queue.counts() == {"done": 1}
+
+
+def test_reap_returns_expired_leases_with_backoff(queue, clock):
+    queue.enqueue("a.jpg")
+    queue.claim("w1")
+    assert queue.reap() == 0                     # lease still valid
+    clock.t += 31
+    assert queue.reap() == 1
+    assert queue.counts() == {"pending": 1}
+    assert queue.claim("w2") is None             # backing off (5 s after attempt 1)
+    clock.t += 5
+    assert queue.claim("w2").image == "a.jpg"
+
+
+def test_reap_by_owner_releases_only_that_workers_jobs(queue):
+    queue.enqueue("a.jpg")
+    queue.enqueue("b.jpg")
+    queue.claim("w1")
+    queue.claim("w2")
+    assert queue.reap(owner="w1") == 1
+    assert queue.counts() == {"pending": 1, "claimed": 1}
+
+
+def test_failures_back_off_exponentially_then_park(queue, clock):
+    queue.enqueue("bad.jpg")
+    for attempt, wait in [(1, 5), (2, 10)]:
+        job = queue.claim("w1")
+        assert job.attempts == attempt
+        assert queue.fail(job.id, "w1", "boom") == "pending"
+        clock.t += wait - 1
+        assert queue.claim("w1") is None
+        clock.t += 1
+    job = queue.claim("w1")
+    assert queue.fail(job.id, "w1", "boom") == "failed"
+    assert queue.counts() == {"failed": 1}
+
+    # a new file under the same name starts over, without backoff
+    assert queue.enqueue("bad.jpg")
+    assert queue.claim("w1").attempts == 1
+
+
+def test_old_database_gets_not_before_column(tmp_path, clock):
+    import sqlite3
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(str(path))
+    conn.executescript(work_queue.SCHEMA.replace("    not_before  REAL,\n", ""))
+    conn.execute("INSERT INTO jobs (image, created, updated) VALUES ('a.jpg', 0, 0)")
+    conn.commit()
+    conn.close()
+    q = WorkQueue(path)
+    assert q.claim("w1").image == "a.jpg"
+    q.close()